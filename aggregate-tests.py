@@ -0,0 +1,80 @@
+import unittest
+from aggregate import Aggregate, HashAggregate, canonical, parse_aggregate
+from records import Record
+
+
+def rows(*values: dict) -> list[Record]:
+    return [Record(v) for v in values]
+
+
+class TestParseAggregate(unittest.TestCase):
+    def test_functions(self):
+        self.assertEqual(parse_aggregate("count(*)"), Aggregate("COUNT", "*"))
+        self.assertEqual(parse_aggregate("Sum(forks_count)").name, "SUM(forks_count)")
+        self.assertIsNone(parse_aggregate("title"))
+        self.assertIsNone(parse_aggregate("lower(title)"))
+
+    def test_star_only_counts(self):
+        with self.assertRaises(RuntimeError):
+            parse_aggregate("SUM(*)")
+
+    def test_canonical(self):
+        self.assertEqual(canonical("count(*)"), "COUNT(*)")
+        self.assertEqual(canonical("state"), "state")
+
+
+class TestHashAggregate(unittest.TestCase):
+    def aggregate(self, group_by: list[str], *names: str) -> HashAggregate:
+        return HashAggregate(group_by, [parse_aggregate(name) for name in names])
+
+    def test_groups(self):
+        aggregate = self.aggregate(["user"], "COUNT(*)", "SUM(n)", "AVG(n)", "MAX(n)")
+        for row in rows(
+            {"user": "a", "n": 1},
+            {"user": "b", "n": 5},
+            {"user": "a", "n": 3},
+            {"user": "a", "n": None},
+        ):
+            aggregate.add(row)
+        self.assertEqual(
+            [row.as_dict() for row in aggregate.rows()],
+            [
+                {"user": "a", "COUNT(*)": 3, "SUM(n)": 4, "AVG(n)": 2.0, "MAX(n)": 3},
+                {"user": "b", "COUNT(*)": 1, "SUM(n)": 5, "AVG(n)": 5.0, "MAX(n)": 5},
+            ],
+        )
+        self.assertEqual(aggregate.rows_in, 4)
+
+    def test_count_column_skips_missing_values(self):
+        aggregate = self.aggregate([], "COUNT(assignee)", "MIN(assignee)")
+        for row in rows({"assignee": "b"}, {"assignee": None}, {"assignee": "a"}):
+            aggregate.add(row)
+        self.assertEqual(
+            aggregate.rows()[0].as_dict(),
+            {"COUNT(assignee)": 2, "MIN(assignee)": "a"},
+        )
+
+    def test_list_values_count_once_per_element(self):
+        aggregate = self.aggregate(["labels"], "COUNT(*)")
+        for row in rows({"labels": ["bug", "ui"]}, {"labels": ["bug"]}, {"labels": []}):
+            aggregate.add(row)
+        self.assertEqual(
+            {row.get("labels"): row.get("COUNT(*)") for row in aggregate.rows()},
+            {"bug": 2, "ui": 1, None: 1},
+        )
+
+    def test_empty_input(self):
+        self.assertEqual(
+            self.aggregate([], "COUNT(*)", "SUM(n)").rows()[0].as_dict(),
+            {"COUNT(*)": 0, "SUM(n)": None},
+        )
+        self.assertEqual(self.aggregate(["user"], "COUNT(*)").rows(), [])
+
+    def test_sum_of_strings_is_an_error(self):
+        aggregate = self.aggregate([], "SUM(title)")
+        with self.assertRaises(RuntimeError):
+            aggregate.add(Record({"title": "crash"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+import re
+from records import Record, Row
+
+
+FUNCTIONS: tuple[str, ...] = ("COUNT", "SUM", "MIN", "MAX", "AVG")
+
+AGGREGATE_RE: re.Pattern = re.compile(r"^(\w+)\((\*|[\w.]+)\)$")
+
+
+# An aggregate in the SELECT list, e.g. COUNT(*) or SUM(forks_count). `name`
+# is the canonical spelling, used as the column name of result rows.
+class Aggregate:
+    __slots__ = ("function", "column", "name")
+
+    def __init__(self, function: str, column: str):
+        self.function: str = function
+        self.column: str = column
+        self.name: str = f"{function}({column})"
+
+    def __eq__(self, other):
+        if not isinstance(other, Aggregate):
+            return NotImplemented
+        return self.name == other.name
+
+    def __repr__(self):
+        return f"Aggregate({self.name})"
+
+
+def parse_aggregate(text: str) -> Aggregate | None:
+    match: re.Match | None = AGGREGATE_RE.match(text)
+    if match is None or match.group(1).upper() not in FUNCTIONS:
+        return None
+    function: str = match.group(1).upper()
+    if match.group(2) == "*" and function != "COUNT":
+        raise RuntimeError(f"Only COUNT can take *, got {text}")
+    return Aggregate(function, match.group(2))
+
+
+# `count(*)` and `COUNT(*)` name the same result column
+def canonical(text: str) -> str:
+    aggregate: Aggregate | None = parse_aggregate(text)
+    return aggregate.name if aggregate is not None else text
+
+
+class _Count:
+    __slots__ = ("count",)
+
+    def __init__(self):
+        self.count: int = 0
+
+    def add(self, value):
+        self.count += 1
+
+    def result(self):
+        return self.count
+
+
+class _Sum:
+    __slots__ = ("total", "count")
+
+    def __init__(self):
+        self.total: int | float = 0
+        self.count: int = 0
+
+    def add(self, value):
+        if type(value) not in (int, float) or type(value) is bool:
+            raise RuntimeError(f"Can't add up non-numeric value {value!r}")
+        self.total += value
+        self.count += 1
+
+    def result(self):
+        return self.total if self.count else None
+
+
+class _Avg(_Sum):
+    __slots__ = ()
+
+    def result(self):
+        return self.total / self.count if self.count else None
+
+
+class _Min:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = None
+
+    def add(self, value):
+        try:
+            if self.value is None or value < self.value:
+                self.value = value
+        except TypeError as e:
+            raise RuntimeError(f"Can't compare values of different types: {e}")
+
+    def result(self):
+        return self.value
+
+
+class _Max(_Min):
+    __slots__ = ()
+
+    def add(self, value):
+        try:
+            if self.value is None or value > self.value:
+                self.value = value
+        except TypeError as e:
+            raise RuntimeError(f"Can't compare values of different types: {e}")
+
+
+ACCUMULATORS: dict[str, type] = {
+    "COUNT": _Count,
+    "SUM": _Sum,
+    "AVG": _Avg,
+    "MIN": _Min,
+    "MAX": _Max,
+}
+
+
+# Streaming GROUP BY: rows are folded into their group's accumulators as they
+# are selected and dropped, so memory grows with the number of groups only.
+# A list value (e.g. labels) puts the row in one group per element.
+class HashAggregate:
+    def __init__(self, group_by: list[str], aggregates: list[Aggregate]):
+        self.group_by: list[str] = group_by
+        self.aggregates: list[Aggregate] = aggregates
+        self.groups: dict[tuple, list] = {}
+        self.rows_in: int = 0
+
+    def _accumulators(self) -> list:
+        return [ACCUMULATORS[a.function]() for a in self.aggregates]
+
+    def _keys(self, record: Row) -> list[tuple]:
+        keys: list[tuple] = [()]
+        for column in self.group_by:
+            value = record.get(column)
+            if type(value) is list:
+                values: list = value or [None]
+                keys = [key + (v,) for key in keys for v in values]
+            else:
+                keys = [key + (value,) for key in keys]
+        return keys
+
+    def add(self, record: Row):
+        self.rows_in += 1
+        values: list = [
+            None if a.column == "*" else record.get(a.column) for a in self.aggregates
+        ]
+        for key in self._keys(record):
+            accumulators: list | None = self.groups.get(key)
+            if accumulators is None:
+                accumulators = self.groups[key] = self._accumulators()
+            for aggregate, accumulator, value in zip(
+                self.aggregates, accumulators, values
+            ):
+                if aggregate.column == "*" or value is not None:
+                    accumulator.add(value)
+
+    # One row per group, in the order groups were first seen. Without GROUP BY
+    # there is always exactly one row, even over no input.
+    def rows(self) -> list[Record]:
+        groups: dict[tuple, list] = self.groups
+        if not self.group_by and not groups:
+            groups = {(): self._accumulators()}
+        return [
+            Record(
+                {
+                    **dict(zip(self.group_by, key)),
+                    **{
+                        a.name: acc.result()
+                        for a, acc in zip(self.aggregates, accumulators)
+                    },
+                }
+            )
+            for key, accumulators in groups.items()
+        ]
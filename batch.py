@@ -0,0 +1,161 @@
+from collections.abc import Callable
+from compiler import COMPARISONS, Constant, compare_values, like, like_regex
+from expression import (
+    BinaryExpression,
+    Expression,
+    ExpressionType,
+    LiteralExpression,
+    UnaryExpression,
+)
+from records import Row
+from tokenizer import TokenType
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python list evaluation
+    np = None
+
+
+# A compiled batch expression: takes a page of records, returns one value per record
+BatchCompiled = Callable[[list[Row]], list]
+
+# numpy dtype kind of each literal type that can be compared vectorized
+KINDS: dict[type, str] = {int: "i", str: "U", bool: "b"}
+
+
+def _column(name: str) -> BatchCompiled:
+    return lambda records: [record.get(name) for record in records]
+
+
+def _compare_constant(values: list, fn: Callable, value, swapped: bool):
+    value_type: type = type(value)
+    # map/set run in C, much cheaper than a per-element Python check
+    if len(values) > 0 and set(map(type, values)) != {value_type}:
+        # list columns or a type error, settled element by element
+        if swapped:
+            return [compare_values(fn, value, v) for v in values]
+        return [compare_values(fn, v, value) for v in values]
+    if np is not None and value_type in KINDS and len(values) > 0:
+        array = np.asarray(values)
+        if array.ndim == 1 and array.dtype.kind == KINDS[value_type]:
+            return fn(value, array) if swapped else fn(array, value)
+    if swapped:
+        return [fn(value, v) for v in values]
+    return [fn(v, value) for v in values]
+
+
+def _compare(left: list, right: list, fn: Callable) -> list:
+    return [compare_values(fn, l, r) for l, r in zip(left, right)]
+
+
+def _negate(values):
+    if np is not None and isinstance(values, np.ndarray):
+        return np.logical_not(values)
+    return [not v for v in values]
+
+
+def selected_indices(mask) -> list[int]:
+    if np is not None and isinstance(mask, np.ndarray):
+        return np.flatnonzero(mask).tolist()
+    return [i for i, keep in enumerate(mask) if keep]
+
+
+# Evaluate `right` only on the rows `left` leaves undecided, like the row
+# path's short-circuit, and scatter the results back into one mask
+def _logical(left: BatchCompiled, right: BatchCompiled, is_and: bool) -> BatchCompiled:
+    def evaluate(records: list[Row]) -> list:
+        mask = left(records)
+        if np is not None and isinstance(mask, np.ndarray):
+            mask = mask.astype(bool)
+            pending: list[int] = np.flatnonzero(mask == is_and).tolist()
+        else:
+            mask = [bool(v) for v in mask]
+            pending = [i for i, keep in enumerate(mask) if keep == is_and]
+        if pending:
+            decided = right([records[i] for i in pending])
+            for i, v in zip(pending, decided):
+                mask[i] = bool(v)
+        return mask
+
+    return evaluate
+
+
+def _compile(expr: Expression) -> Constant | BatchCompiled:
+    if isinstance(expr, LiteralExpression):
+        if expr.type != ExpressionType.CPH:
+            return Constant(expr.value)
+        return _column(expr.value)
+
+    if isinstance(expr, UnaryExpression):
+        right = _compile(expr.right)
+        if expr.operator != TokenType.NOT:
+            return Constant(None)
+        if isinstance(right, Constant):
+            return Constant(not right.value)
+        return lambda records: _negate(right(records))
+
+    if not isinstance(expr, BinaryExpression):
+        raise RuntimeError(f"Can't compile expression: {expr}")
+
+    left = _compile(expr.left)
+    right = _compile(expr.right)
+    op: TokenType = expr.operator
+
+    if op in (TokenType.AND, TokenType.OR):
+        if isinstance(left, Constant) and isinstance(right, Constant):
+            return Constant(
+                (left.value and right.value)
+                if op == TokenType.AND
+                else (left.value or right.value)
+            )
+        if isinstance(left, Constant):
+            left, right = right, left
+        if isinstance(right, Constant):
+            if bool(right.value) == (op == TokenType.AND):
+                return left
+            return Constant(right.value)
+        return _logical(left, right, op == TokenType.AND)
+
+    if op == TokenType.LIKE:
+        return _compile_like(left, right)
+
+    fn: Callable | None = COMPARISONS.get(op)
+    if fn is None:
+        return Constant(None)
+    if isinstance(left, Constant) and isinstance(right, Constant):
+        return Constant(compare_values(fn, left.value, right.value))
+    if isinstance(right, Constant):
+        value = right.value
+        return lambda records: _compare_constant(left(records), fn, value, False)
+    if isinstance(left, Constant):
+        value = left.value
+        return lambda records: _compare_constant(right(records), fn, value, True)
+    return lambda records: _compare(left(records), right(records), fn)
+
+
+def _compile_like(
+    left: Constant | BatchCompiled, right: Constant | BatchCompiled
+) -> Constant | BatchCompiled:
+    if isinstance(left, Constant) and isinstance(right, Constant):
+        return Constant(like(left.value, like_regex(right.value)))
+    if isinstance(right, Constant):
+        regex = like_regex(right.value)
+        return lambda records: [like(v, regex) for v in left(records)]
+    if isinstance(left, Constant):
+        return lambda records: [like(left.value, like_regex(p)) for p in right(records)]
+    return lambda records: [
+        like(v, like_regex(p)) for v, p in zip(left(records), right(records))
+    ]
+
+
+# Compile an expression tree into a function evaluating a whole page of
+# records at once into a selection mask. Comparisons against literals run
+# vectorized through numpy when it is installed.
+def compile_batch(expr: Expression | None) -> BatchCompiled | None:
+    if expr is None:
+        return None
+    compiled = _compile(expr)
+    if isinstance(compiled, Constant):
+        value = compiled.value
+        return lambda records: [value] * len(records)
+    return compiled
@@ -0,0 +1,491 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime, timezone
+from stubapi import Issue, StubAPI, load_recordings, synthetic_repos
+
+
+logger = logging.getLogger(__name__)
+
+
+# Version of the results file layout, bumped when fields change meaning
+SCHEMA: int = 1
+
+OWNER: str = "bench"
+
+# Seconds a cold one-shot query may take, see `startup`
+STARTUP_TARGET: float = 1.0
+
+HERE: str = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (query, backend, execution); {repo} is the first synthetic
+# repository, {owner} their owner and {all} a LIMIT reading every row
+QUERIES: dict[str, tuple[str, str, str]] = {
+    "scan": ("SELECT number, title FROM {repo}.issues LIMIT {all}", "rest", "row"),
+    "scan_graphql": (
+        "SELECT number, title FROM {repo}.issues LIMIT {all}",
+        "graphql",
+        "row",
+    ),
+    "pushdown": (
+        "SELECT number FROM {repo}.issues "
+        "WHERE state = 'closed' AND user = 'alice' LIMIT 100",
+        "rest",
+        "row",
+    ),
+    "local_filter": (
+        "SELECT number, title FROM {repo}.issues "
+        "WHERE title LIKE '%memory%' AND number > 10 LIMIT 100",
+        "rest",
+        "row",
+    ),
+    "local_filter_batch": (
+        "SELECT number, title FROM {repo}.issues "
+        "WHERE title LIKE '%memory%' AND number > 10 LIMIT 100",
+        "rest",
+        "batch",
+    ),
+    "text_search": (
+        "SELECT number, title FROM {repo}.issues "
+        "WHERE title LIKE 'crash login %' LIMIT {all}",
+        "rest",
+        "row",
+    ),
+    "sorted": (
+        "SELECT number, updated_at FROM {repo}.issues "
+        "ORDER BY updated_at DESC LIMIT 10",
+        "rest",
+        "row",
+    ),
+    "group_by": (
+        "SELECT user, COUNT(*) FROM {repo}.issues GROUP BY user",
+        "rest",
+        "row",
+    ),
+    "count": ("SELECT COUNT(*) FROM {repo}.issues", "rest", "row"),
+    "details": (
+        "SELECT number, closed_by FROM {repo}.issues "
+        "WHERE state = 'closed' LIMIT 50",
+        "rest",
+        "row",
+    ),
+    "fanout": (
+        "SELECT repo, COUNT(*) FROM {owner}.*.issues GROUP BY repo",
+        "rest",
+        "row",
+    ),
+}
+
+TOKENIZER_QUERY: str = (
+    "SELECT number, title, user FROM owner.repo.issues WHERE state = 'open' "
+    "AND (user = 'alice' OR labels = 'bug') AND number > 100 "
+    "ORDER BY created_at DESC LIMIT 50"
+)
+EVAL_WHERE: str = "state = 'open' AND number > 100 AND title LIKE '%memory%'"
+EVAL_ROWS: int = 10_000
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Calls of `step` per second, run repeatedly for about `seconds`; each call
+# handles `size` units (queries, rows)
+def throughput(step: Callable[[], object], size: int, seconds: float) -> dict:
+    calls: int = 0
+    start: float = time.perf_counter()
+    elapsed: float = 0.0
+    while calls == 0 or elapsed < seconds:
+        step()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return {"calls": calls, "seconds": elapsed, "per_second": calls * size / elapsed}
+
+
+# What `expression.LiteralExpression.eval` reads a column from
+class RowContext:
+    def __init__(self):
+        self.record = None
+
+    def get_value(self, key: str):
+        return self.record.get(key)
+
+
+def micro_benchmarks(seconds: float) -> list[dict]:
+    from batch import compile_batch
+    from compiler import compile_expression
+    from parser import Parser
+    from plans import build_plan
+    from records import Record
+    from tokenizer import Tokenizer
+
+    tokenizer: Tokenizer = Tokenizer()
+    tokenizer.tokenize(TOKENIZER_QUERY)
+    where_tokenizer: Tokenizer = Tokenizer(EVAL_WHERE)
+    parser: Parser = Parser()
+    while where_tokenizer.has_next():
+        parser.add_token(where_tokenizer.next_token())
+    where = parser.parse()
+    records: list[Record] = [
+        Record(
+            {
+                "number": issue.number,
+                "state": issue.state,
+                "title": issue.title,
+                "user": issue.user,
+            }
+        )
+        for issue in map(Issue, range(1, EVAL_ROWS + 1))
+    ]
+    row: RowContext = RowContext()
+
+    def evaluate():
+        for record in records:
+            row.record = record
+            where.eval(row)
+
+    compiled = compile_expression(where)
+    batch = compile_batch(where)
+    cases: list[tuple[str, str, Callable[[], object], int]] = [
+        ("tokenizer", "queries/s", lambda: Tokenizer().tokenize(TOKENIZER_QUERY), 1),
+        ("parser", "queries/s", lambda: build_plan(TOKENIZER_QUERY), 1),
+        ("expression_eval", "rows/s", evaluate, len(records)),
+        ("compiled_eval", "rows/s", lambda: list(map(compiled, records)), len(records)),
+        ("batch_eval", "rows/s", lambda: batch(records), len(records)),
+    ]
+    results: list[dict] = []
+    for name, unit, step, size in cases:
+        result: dict = throughput(step, size, seconds)
+        results.append({"name": name, "unit": unit, **result})
+        logger.info(f"{name}: {result['per_second']:,.0f} {unit}")
+    results[0]["tokens"] = len(tokenizer.tokens)
+    return results
+
+
+# Runs queries end to end, from the query text to the rendered result table,
+# against the stub API with empty response and object caches
+class QueryRunner:
+    def __init__(self, stub: StubAPI):
+        import context
+        from gitql import GitQL
+
+        self.stub: StubAPI = stub
+        self.cache = context.response_cache()
+        self.gitql: GitQL = GitQL()
+
+    def run(self, query: str, backend: str, execution: str) -> dict:
+        gitql = self.gitql
+        gitql.backend, gitql.execution = backend, execution
+        gitql.reset()
+        self.cache.clear()
+        gitql.session.objects.clear()
+        before: dict = self.stub.stats.snapshot()
+        start: float = time.perf_counter()
+        try:
+            gitql.execute(query)
+            gitql.ctx.load_details(gitql.ctx.query_results)
+            table = gitql.result_table()
+            str(table)
+            rows: int = len(table.rows)
+        finally:
+            seconds: float = time.perf_counter() - start
+            scanned: int = gitql.ctx.current_read
+            gitql.reset()
+        after: dict = self.stub.stats.snapshot()
+        return {
+            "seconds": seconds,
+            "rows": rows,
+            "rows_scanned": scanned,
+            "requests": after["requests"] - before["requests"],
+            "bytes": after["bytes"] - before["bytes"],
+            "rate_limited": after["rate_limited"] - before["rate_limited"],
+        }
+
+    # Largest traced Python allocation while the query ran, in a run of its own
+    # since tracing slows everything down
+    def peak_memory(self, query: str, backend: str, execution: str) -> int:
+        tracemalloc.start()
+        try:
+            self.run(query, backend, execution)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def benchmark_query(
+    runner: QueryRunner,
+    name: str,
+    query: str,
+    backend: str,
+    execution: str,
+    repeat: int,
+    warmup: int,
+    memory: bool,
+) -> dict:
+    for _ in range(warmup):
+        runner.run(query, backend, execution)
+    runs: list[dict] = [runner.run(query, backend, execution) for _ in range(repeat)]
+    latencies: list[float] = [run["seconds"] for run in runs]
+    median: float = statistics.median(latencies)
+    result: dict = {
+        "name": name,
+        "query": query,
+        "backend": backend,
+        "execution": execution,
+        "runs": repeat,
+        "latency_seconds": {
+            "min": min(latencies),
+            "median": median,
+            "mean": statistics.fmean(latencies),
+            "max": max(latencies),
+        },
+        "rows": runs[-1]["rows"],
+        "rows_scanned": runs[-1]["rows_scanned"],
+        "rows_scanned_per_second": runs[-1]["rows_scanned"] / median if median else 0,
+        "requests": statistics.median(run["requests"] for run in runs),
+        "bytes": statistics.median(run["bytes"] for run in runs),
+        "rate_limited": sum(run["rate_limited"] for run in runs),
+        "peak_memory_bytes": (
+            runner.peak_memory(query, backend, execution) if memory else None
+        ),
+    }
+    logger.info(
+        f"{name}: {median * 1000:.1f} ms, {result['requests']:g} requests, "
+        f"{result['rows']} rows"
+    )
+    return result
+
+
+# Cold starts, each in a fresh interpreter with an empty response cache: the
+# import of gitql, and a one-shot `gitql.py -e` query against the stub
+def startup(stub: StubAPI, repeat: int) -> dict[str, float]:
+    query: str = f"SELECT number, title FROM {OWNER}.repo1.issues LIMIT 10"
+    commands: dict[str, list[str]] = {
+        "import_seconds": [sys.executable, "-c", "import gitql"],
+        "one_shot_seconds": [
+            sys.executable,
+            os.path.join(HERE, "gitql.py"),
+            "-e",
+            query,
+        ],
+    }
+    env: dict[str, str] = dict(
+        os.environ,
+        PYTHONPATH=HERE,
+        GITQL_API_URL=stub.url,
+        GITQL_TOKENS="benchmark",
+    )
+    result: dict[str, float] = {}
+    for name, command in commands.items():
+        seconds: list[float] = []
+        for _ in range(repeat):
+            with tempfile.TemporaryDirectory(prefix="gitql-startup-") as cwd:
+                env["GITQL_CACHE_DIR"] = cwd
+                start: float = time.perf_counter()
+                subprocess.run(
+                    command, cwd=cwd, env=env, check=True, capture_output=True
+                )
+                seconds.append(time.perf_counter() - start)
+        result[name] = statistics.median(seconds)
+        logger.info(f"startup {name}: {result[name] * 1000:.1f} ms")
+    return result
+
+
+# Changes from `baseline` worse than `threshold` (a fraction): slower median
+# latency or lower throughput, and any increase in requests
+def regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    found: list[str] = []
+    before: dict[str, dict] = {q["name"]: q for q in baseline.get("queries", [])}
+    for query in results["queries"]:
+        old: dict | None = before.get(query["name"])
+        if old is None:
+            continue
+        ratio: float = query["latency_seconds"]["median"] / max(
+            old["latency_seconds"]["median"], 1e-9
+        )
+        if ratio > 1 + threshold:
+            found.append(f"{query['name']}: median latency {ratio - 1:+.1%}")
+        if query["requests"] > old["requests"]:
+            change: str = f"{old['requests']:g} -> {query['requests']:g}"
+            found.append(f"{query['name']}: requests {change}")
+    old_micro: dict[str, dict] = {m["name"]: m for m in baseline.get("micro", [])}
+    for micro in results["micro"]:
+        old = old_micro.get(micro["name"])
+        if old is None:
+            continue
+        ratio = micro["per_second"] / max(old["per_second"], 1e-9)
+        if ratio < 1 - threshold:
+            found.append(f"{micro['name']}: throughput {ratio - 1:+.1%}")
+    old_startup: dict[str, float] = baseline.get("startup", {})
+    for name, seconds in results.get("startup", {}).items():
+        if name not in old_startup:
+            continue
+        ratio = seconds / max(old_startup[name], 1e-9)
+        if ratio > 1 + threshold:
+            found.append(f"startup {name}: {ratio - 1:+.1%}")
+    return found
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark GitQL against a local GitHub API stand-in"
+    )
+    parser.add_argument("--issues", type=int, default=5000, help="issues per repo")
+    parser.add_argument("--repos", type=int, default=3, help="synthetic repos")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added to every response"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="random extra latency, up to"
+    )
+    parser.add_argument(
+        "--rate-limit", type=int, help="requests per token, resource and window"
+    )
+    parser.add_argument(
+        "--window", type=float, default=3600.0, help="rate limit window in seconds"
+    )
+    parser.add_argument("--replay", help="JSON lines of recorded responses to serve")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs first")
+    parser.add_argument(
+        "--query",
+        action="append",
+        choices=sorted(QUERIES),
+        help="only run these queries (repeatable)",
+    )
+    parser.add_argument(
+        "--micro-seconds",
+        type=float,
+        default=0.5,
+        help="seconds per micro benchmark, 0 to skip them",
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="skip the peak memory runs"
+    )
+    parser.add_argument(
+        "--startup-repeat",
+        type=int,
+        default=5,
+        help="cold starts timed, 0 to skip them",
+    )
+    parser.add_argument(
+        "--startup-target",
+        type=float,
+        default=STARTUP_TARGET,
+        help="seconds a cold one-shot query may take",
+    )
+    parser.add_argument("--output", default="-", help="results file, - for stdout")
+    parser.add_argument("--compare", help="results file of a baseline run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown tolerated by --compare, as a fraction",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    stub: StubAPI = StubAPI(
+        synthetic_repos(OWNER, args.repos, args.issues),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        window=args.window,
+        recordings=load_recordings(args.replay) if args.replay else None,
+    ).start()
+    # context reads these when first imported, by QueryRunner
+    os.environ["GITQL_API_URL"] = stub.url
+    os.environ["GITQL_TOKENS"] = "benchmark"
+    os.environ.setdefault("GITQL_CACHE_DIR", tempfile.mkdtemp(prefix="gitql-bench-"))
+    runner: QueryRunner = QueryRunner(stub)
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s - %(message)s")
+    logger.setLevel(logging.INFO)
+
+    results: dict = {
+        "schema": SCHEMA,
+        "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "issues": args.issues,
+            "repos": args.repos,
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "rate_limit": args.rate_limit,
+            "window": args.window,
+            "replay": args.replay,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+        },
+        "micro": micro_benchmarks(args.micro_seconds) if args.micro_seconds else [],
+        "startup": startup(stub, args.startup_repeat) if args.startup_repeat else {},
+        "queries": [],
+    }
+    repo: str = f"{OWNER}.repo1"
+    try:
+        for name in args.query or QUERIES:
+            query, backend, execution = QUERIES[name]
+            results["queries"].append(
+                benchmark_query(
+                    runner,
+                    name,
+                    query.format(repo=repo, owner=OWNER, all=args.issues * args.repos),
+                    backend,
+                    execution,
+                    args.repeat,
+                    args.warmup,
+                    not args.no_memory,
+                )
+            )
+    finally:
+        stub.stop()
+
+    text: str = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(text)
+    else:
+        with open(args.output, "w") as out:
+            out.write(text + "\n")
+    failed: bool = False
+    one_shot: float | None = results["startup"].get("one_shot_seconds")
+    if one_shot is not None and one_shot > args.startup_target:
+        logger.warning(
+            f"Cold one-shot query took {one_shot:.2f}s, "
+            f"over the {args.startup_target:g}s target"
+        )
+        failed = True
+    if args.compare:
+        with open(args.compare) as f:
+            baseline: dict = json.load(f)
+        if baseline.get("config") != results["config"]:
+            logger.warning("The baseline ran with a different configuration")
+        found: list[str] = regressions(results, baseline, args.threshold)
+        for line in found:
+            logger.warning(f"Regression: {line}")
+        failed = failed or bool(found)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from github import Github
+import transport
+from cache import ResponseCache
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    requests: list[tuple[str, str | None]] = []
+
+    def do_GET(self):
+        StubHandler.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body: bytes = json.dumps(
+            {"login": "octocat", "url": f"http://{self.headers['Host']}{self.path}"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ResponseCache(":memory:")
+
+    def test_round_trip(self):
+        key: str = self.cache.key("/repos/a/b/issues?state=all", "token x")
+        self.cache.put(key, "/repos/a/b/issues?state=all", 200, {"etag": '"1"'}, "[]")
+        entry = self.cache.get(key)
+        self.assertEqual(entry.body, "[]")
+        self.assertEqual(entry.etag, '"1"')
+        self.assertTrue(entry.is_fresh())
+
+    def test_key_depends_on_credentials(self):
+        self.assertNotEqual(
+            self.cache.key("/users/a", "token x"), self.cache.key("/users/a", "token y")
+        )
+
+    def test_endpoint_ttls(self):
+        self.assertEqual(self.cache.ttl_for("/repos/a/b"), 3600)
+        self.assertEqual(self.cache.ttl_for("/repos/a/b/issues?page=2"), 60)
+        self.assertEqual(self.cache.ttl_for("/repos/a/b/commits/" + "a" * 40), 604800)
+        self.assertEqual(self.cache.ttl_for("/rate_limit"), 0)
+
+    def test_unvalidated_uncacheable_response_is_skipped(self):
+        self.cache.put("k", "/rate_limit", 200, {}, "{}")
+        self.assertIsNone(self.cache.get("k"))
+
+    def test_lru_eviction(self):
+        self.cache.max_bytes = 250
+        for i in range(3):
+            self.cache.put(f"k{i}", "/users/a", 200, {"etag": "e"}, "x" * 100)
+            time.sleep(0.01)
+        self.assertIsNone(self.cache.get("k0"))
+        self.assertIsNotNone(self.cache.get("k2"))
+        self.assertLessEqual(self.cache.size(), 250)
+
+    def test_recent_hits_survive_eviction(self):
+        self.cache.max_bytes = 250
+        for i in range(2):
+            self.cache.put(f"k{i}", "/users/a", 200, {"etag": "e"}, "x" * 100)
+            time.sleep(0.01)
+        # held back until the next store has to evict
+        self.cache.get("k0")
+        self.cache.put("k2", "/users/a", 200, {"etag": "e"}, "x" * 100)
+        self.assertIsNotNone(self.cache.get("k0"))
+        self.assertIsNone(self.cache.get("k1"))
+
+    def test_size_is_kept_across_replacements_and_reopening(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "responses.db")
+            cache = ResponseCache(path)
+            for _ in range(2):
+                cache.put("k", "/users/a", 200, {"etag": "e"}, "x" * 100)
+            self.assertEqual(cache.size(), 101)
+            self.assertEqual(ResponseCache(path).size(), 101)
+
+
+class TestCachingConnection(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        StubHandler.requests.clear()
+        self.cache = ResponseCache(":memory:")
+        transport.install(self.cache)
+        host, port = self.server.server_address
+        self.git = Github(base_url=f"http://{host}:{port}", retry=None)
+
+    def test_fresh_entries_skip_the_network(self):
+        self.git.get_user("octocat").login
+        self.git.get_user("octocat").login
+        self.assertEqual(len(StubHandler.requests), 1)
+        self.assertEqual(self.cache.counters()["hits"], 1)
+
+    def test_stale_entries_are_revalidated(self):
+        self.git.get_user("octocat").login
+        self.cache.db.execute("UPDATE responses SET stored_at = 0")
+        self.assertEqual(self.git.get_user("octocat").login, "octocat")
+        self.assertEqual(StubHandler.requests[-1], ("/users/octocat", '"v1"'))
+        self.assertEqual(self.cache.counters()["revalidations"], 1)
+
+    def test_traffic(self):
+        traffic = transport.Traffic()
+        transport.install(self.cache, None, traffic)
+        self.git.get_user("octocat").login
+        self.git.get_user("octocat").login
+        self.cache.db.execute("UPDATE responses SET stored_at = 0")
+        self.git.get_user("octocat").login
+        details: dict[str, int] = traffic.counters()["details"]
+        self.assertEqual(details["requests"], 2)
+        self.assertEqual(details["cache_hits"], 1)
+        self.assertEqual(details["revalidations"], 1)
+        self.assertEqual(details["charged"], 1)
+        self.assertGreater(details["bytes"], 0)
+        self.assertEqual(traffic.counters()["pages"]["requests"], 0)
+
+    def test_request_kind(self):
+        self.assertEqual(transport.request_kind("/repos/a/b/issues?page=2"), "pages")
+        self.assertEqual(transport.request_kind("/search/issues?q=x"), "pages")
+        self.assertEqual(transport.request_kind("/users/a/repos"), "pages")
+        self.assertEqual(transport.request_kind("/repos/a/b/issues/7"), "details")
+        self.assertEqual(transport.request_kind("/repos/a/b"), "details")
+
+    def test_endpoint(self):
+        self.assertEqual(
+            transport.endpoint("/repos/a/b/issues?page=2"),
+            "/repos/{owner}/{repo}/issues",
+        )
+        self.assertEqual(
+            transport.endpoint("/repos/a/b/pulls/12/files"),
+            "/repos/{owner}/{repo}/pulls/{number}/files",
+        )
+        self.assertEqual(
+            transport.endpoint("/repos/a/b/commits/" + "0f" * 20),
+            "/repos/{owner}/{repo}/commits/{sha}",
+        )
+        self.assertEqual(transport.endpoint("/orgs/x/repos"), "/orgs/{name}/repos")
+        self.assertEqual(transport.endpoint("/graphql"), "/graphql")
+
+
+if __name__ == "__main__":
+    unittest.main()
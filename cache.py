@@ -0,0 +1,217 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from hashlib import sha256
+
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds a cached response is served without asking GitHub at all. Past that
+# it is revalidated with a conditional request, and GitHub doesn't count 304s
+# against the rate limit. The first matching pattern wins.
+ENDPOINT_TTLS: list[tuple[str, int]] = [
+    (r"^/search/", 60),
+    (r"^/repos/[^/]+/[^/]+/commits/[0-9a-f]{40}$", 7 * 24 * 3600),
+    (r"^/repos/[^/]+/[^/]+/(issues|pulls|commits)", 60),
+    (r"^/repos/[^/]+/[^/]+/(milestones|labels|languages)", 600),
+    (r"^/repos/[^/]+/[^/]+$", 3600),
+    (r"^/users/", 3600),
+]
+
+DEFAULT_MAX_BYTES: int = 256 * 1024 * 1024
+
+# Hits whose access times are held back and written in one statement
+ACCESS_BATCH: int = 100
+
+
+class CacheEntry:
+    def __init__(
+        self,
+        status: int,
+        headers: dict[str, str],
+        body: str,
+        etag: str | None,
+        last_modified: str | None,
+        stored_at: float,
+        ttl: int,
+    ):
+        self.status: int = status
+        self.headers: dict[str, str] = headers
+        self.body: str = body
+        self.etag: str | None = etag
+        self.last_modified: str | None = last_modified
+        self.stored_at: float = stored_at
+        self.ttl: int = ttl
+
+    def is_fresh(self) -> bool:
+        return time.time() - self.stored_at < self.ttl
+
+
+# SQLite-backed store of GET responses keyed by URL (which carries the query
+# parameters) and the credentials used to fetch them. The total size is kept
+# in memory and access times are written in batches, so neither a hit nor a
+# store scans the table.
+class ResponseCache:
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path: str = path
+        self.max_bytes: int = max_bytes
+        # request outcomes, counted from the prefetch threads too
+        self.outcomes: dict[str, int] = {"hits": 0, "revalidations": 0, "misses": 0}
+        # key -> last access time not written yet
+        self.accessed: dict[str, float] = {}
+        self.lock: threading.Lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)"
+        )
+        self.db.commit()
+        self.total: int = self.db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    @staticmethod
+    def key(url: str, authorization: str | None) -> str:
+        credentials: str = sha256((authorization or "").encode()).hexdigest()[:16]
+        return f"{credentials} {url}"
+
+    @staticmethod
+    def ttl_for(path: str) -> int:
+        path = path.split("?", 1)[0]
+        for pattern, ttl in ENDPOINT_TTLS:
+            if re.search(pattern, path):
+                return ttl
+        return 0
+
+    def get(self, key: str) -> CacheEntry | None:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT url, status, headers, body, etag, last_modified, stored_at "
+                "FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.accessed[key] = time.time()
+            if len(self.accessed) >= ACCESS_BATCH:
+                self._write_accesses()
+                self.db.commit()
+        url, status, headers, body, etag, last_modified, stored_at = row
+        return CacheEntry(
+            status,
+            json.loads(headers),
+            body,
+            etag,
+            last_modified,
+            stored_at,
+            self.ttl_for(url),
+        )
+
+    def put(self, key: str, url: str, status: int, headers: dict[str, str], body: str):
+        etag: str | None = headers.get("etag")
+        last_modified: str | None = headers.get("last-modified")
+        if etag is None and last_modified is None and self.ttl_for(url) == 0:
+            return  # nothing to revalidate with and never fresh
+        now: float = time.time()
+        size: int = len(body) + len(key)
+        with self.lock:
+            replaced: tuple | None = self.db.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self.accessed.pop(key, None)
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    url,
+                    status,
+                    json.dumps(headers),
+                    body,
+                    etag,
+                    last_modified,
+                    size,
+                    now,
+                    now,
+                ),
+            )
+            self.total += size - (replaced[0] if replaced is not None else 0)
+            self._evict()
+            self.db.commit()
+
+    # Mark a revalidated (304) entry as fresh again
+    def refresh(self, key: str):
+        now: float = time.time()
+        with self.lock:
+            self.accessed.pop(key, None)
+            self.db.execute(
+                "UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, key),
+            )
+            self.db.commit()
+
+    # Write the held back access times; the caller holds the lock and commits
+    def _write_accesses(self):
+        self.db.executemany(
+            "UPDATE responses SET accessed_at = ? WHERE key = ?",
+            [(accessed_at, key) for key, accessed_at in self.accessed.items()],
+        )
+        self.accessed.clear()
+
+    # Drop the least recently used entries until the total fits; the caller
+    # holds the lock
+    def _evict(self):
+        if self.total <= self.max_bytes:
+            return
+        self._write_accesses()
+        evicted: list[tuple[str]] = []
+        for key, size in self.db.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ):
+            if self.total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self.total -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        logger.debug(f"Evicted cached responses down to {self.total} bytes")
+
+    def size(self) -> int:
+        with self.lock:
+            return self.total
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.commit()
+            self.accessed.clear()
+            self.total = 0
+
+    # Count a request's outcome: "hits", "revalidations" or "misses"
+    def count(self, outcome: str):
+        with self.lock:
+            self.outcomes[outcome] += 1
+
+    def counters(self) -> dict[str, int]:
+        with self.lock:
+            return dict(self.outcomes)
@@ -0,0 +1,133 @@
+import unittest
+from batch import compile_batch, selected_indices
+from compiler import compile_expression
+from parser import Parser
+from records import Record
+from tokenizer import Tokenizer
+
+
+def parse(where: str):
+    tokenizer: Tokenizer = Tokenizer(where)
+    parser: Parser = Parser()
+    while tokenizer.has_next():
+        parser.add_token(tokenizer.next_token())
+    return parser.parse()
+
+
+def compile_where(where: str):
+    return compile_expression(parse(where))
+
+
+class TestCompiler(unittest.TestCase):
+    def setUp(self):
+        self.record = Record(
+            {"state": "open", "number": 42, "title": "crash"},
+            {"closed_by": self.load_closed_by},
+        )
+        self.loads: int = 0
+
+    def load_closed_by(self):
+        self.loads += 1
+        return "octocat"
+
+    def test_comparisons(self):
+        self.assertTrue(compile_where("number > 10")(self.record))
+        self.assertTrue(compile_where("10 < number")(self.record))
+        self.assertFalse(compile_where("number <= 41")(self.record))
+        self.assertTrue(compile_where("state = 'open'")(self.record))
+
+    def test_logical_operators(self):
+        self.assertTrue(compile_where("state = 'open' AND number >= 42")(self.record))
+        self.assertTrue(compile_where("state = 'closed' OR title = 'crash'")(self.record))
+        self.assertTrue(compile_where("NOT state = 'closed'")(self.record))
+
+    def test_and_short_circuits(self):
+        predicate = compile_where("state = 'closed' AND closed_by = 'octocat'")
+        self.assertFalse(predicate(self.record))
+        self.assertEqual(self.loads, 0)
+
+    def test_or_short_circuits(self):
+        predicate = compile_where("state = 'open' OR closed_by = 'octocat'")
+        self.assertTrue(predicate(self.record))
+        self.assertEqual(self.loads, 0)
+
+    def test_constant_folding(self):
+        self.assertTrue(compile_where("1 = 1")(self.record))
+        predicate = compile_where("1 = 2 AND closed_by = 'octocat'")
+        self.assertFalse(predicate(self.record))
+        self.assertEqual(self.loads, 0)
+        self.assertTrue(compile_where("1 = 1 AND state = 'open'")(self.record))
+
+    def test_type_mismatch(self):
+        with self.assertRaises(RuntimeError):
+            compile_where("number = 'x'")(self.record)
+
+    def test_like(self):
+        self.assertTrue(compile_where("title LIKE 'cr%'")(self.record))
+        self.assertTrue(compile_where("title LIKE '%RAS_'")(self.record))
+        self.assertFalse(compile_where("title LIKE 'cr'")(self.record))
+        self.assertFalse(compile_where("number LIKE '4%'")(self.record))
+        labels = Record({"labels": ["bug", "ui"]})
+        self.assertTrue(compile_where("labels LIKE 'u%'")(labels))
+        with self.assertRaises(RuntimeError):
+            compile_where("title LIKE 1")(self.record)
+
+    def test_list_equality(self):
+        labels = Record({"labels": ["bug", "ui"]})
+        self.assertTrue(compile_where("labels = 'ui'")(labels))
+        self.assertTrue(compile_where("'bug' = labels")(labels))
+        self.assertFalse(compile_where("labels = 'docs'")(labels))
+        with self.assertRaises(RuntimeError):
+            compile_where("labels > 'ui'")(labels)
+
+    def test_missing_expression(self):
+        self.assertIsNone(compile_expression(None))
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.loads: int = 0
+        self.page = [
+            Record(
+                {
+                    "state": "open" if i % 2 else "closed",
+                    "number": i,
+                    "labels": ["odd" if i % 2 else "even"],
+                },
+                {"closed_by": self.load_closed_by},
+            )
+            for i in range(10)
+        ]
+
+    def load_closed_by(self):
+        self.loads += 1
+        return "octocat"
+
+    def test_matches_row_evaluation(self):
+        for where in [
+            "state = 'open' AND number > 4",
+            "state = 'closed' OR 3 >= number",
+            "NOT number < 7",
+            "1 = 1 AND state = 'open'",
+            "1 = 2 OR number = 3",
+            "state LIKE '%pe%' AND number > 2",
+            "labels = 'even' AND number > 2",
+        ]:
+            predicate = compile_where(where)
+            expected = [i for i, r in enumerate(self.page) if predicate(r)]
+            self.assertEqual(
+                selected_indices(compile_batch(parse(where))(self.page)), expected
+            )
+
+    def test_and_only_evaluates_survivors(self):
+        mask = compile_batch(parse("number > 7 AND closed_by = 'octocat'"))(self.page)
+        self.assertEqual(selected_indices(mask), [8, 9])
+        self.assertEqual(self.loads, 2)
+
+    def test_type_mismatch(self):
+        with self.assertRaises(RuntimeError):
+            compile_batch(parse("state = 1"))(self.page)
+
+
+if __name__ == "__main__":
+    unittest.main()
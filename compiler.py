@@ -0,0 +1,178 @@
+import operator
+import re
+from collections.abc import Callable
+from functools import lru_cache
+from expression import (
+    BinaryExpression,
+    Expression,
+    ExpressionType,
+    LiteralExpression,
+    UnaryExpression,
+)
+from records import Row
+from tokenizer import TokenType
+
+
+# A compiled predicate or value: takes the current record, returns the value
+Compiled = Callable[[Row], object]
+
+COMPARISONS: dict[TokenType, Callable] = {
+    TokenType.GREATER: operator.gt,
+    TokenType.LESS: operator.lt,
+    TokenType.GEQ: operator.ge,
+    TokenType.LEQ: operator.le,
+    TokenType.EQUAL: operator.eq,
+    TokenType.PLUS: operator.add,
+    TokenType.MINUS: operator.sub,
+    TokenType.ASTERISK: operator.mul,
+}
+
+
+class Constant:
+    def __init__(self, value):
+        self.value = value
+
+
+def raise_type_error():
+    raise RuntimeError("both operands must be of type int")
+
+
+# Operands of different types only compare when one is a list (e.g. labels)
+# and the operator is =: the list equals each of its elements, like the API's
+# label filter
+def compare_values(fn: Callable, l, r):
+    if type(l) != type(r):
+        if fn is operator.eq and type(l) is list:
+            return r in l
+        if fn is operator.eq and type(r) is list:
+            return l in r
+        raise_type_error()
+    return fn(l, r)
+
+
+# SQL LIKE pattern -> regex: % matches any run of characters and _ any one.
+# Case-insensitive, like SQLite's LIKE and GitHub's search.
+@lru_cache(maxsize=128)
+def like_regex(pattern) -> re.Pattern:
+    if type(pattern) is not str:
+        raise RuntimeError("LIKE pattern must be a string")
+    return re.compile(
+        "".join(
+            ".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern
+        ),
+        re.IGNORECASE | re.DOTALL,
+    )
+
+
+# A list (e.g. labels) matches when any of its elements does; anything but a
+# string never matches
+def like(value, regex: re.Pattern) -> bool:
+    if type(value) is list:
+        return any(like(v, regex) for v in value)
+    return type(value) is str and regex.fullmatch(value) is not None
+
+
+# Fold constant subtrees; returns either a Constant or a compiled closure
+def _compile(expr: Expression) -> Constant | Compiled:
+    if isinstance(expr, LiteralExpression):
+        if expr.type != ExpressionType.CPH:
+            return Constant(expr.value)
+        column: str = expr.value
+        return lambda record: record.get(column)
+
+    if isinstance(expr, UnaryExpression):
+        right = _compile(expr.right)
+        if expr.operator != TokenType.NOT:
+            return Constant(None)
+        if isinstance(right, Constant):
+            return Constant(not right.value)
+        return lambda record: not right(record)
+
+    if isinstance(expr, BinaryExpression):
+        return _compile_binary(expr)
+
+    raise RuntimeError(f"Can't compile expression: {expr}")
+
+
+def _compile_binary(expr: BinaryExpression) -> Constant | Compiled:
+    left = _compile(expr.left)
+    right = _compile(expr.right)
+    op: TokenType = expr.operator
+
+    if op in (TokenType.AND, TokenType.OR):
+        # short-circuit, and drop constant operands that don't decide the result
+        if isinstance(left, Constant) and isinstance(right, Constant):
+            return Constant(
+                (left.value and right.value)
+                if op == TokenType.AND
+                else (left.value or right.value)
+            )
+        if isinstance(left, Constant):
+            left, right = right, left
+        if isinstance(right, Constant):
+            if op == TokenType.AND:
+                return left if right.value else Constant(right.value)
+            return Constant(right.value) if right.value else left
+        if op == TokenType.AND:
+            return lambda record: left(record) and right(record)
+        return lambda record: left(record) or right(record)
+
+    if op == TokenType.LIKE:
+        return _compile_like(left, right)
+
+    fn: Callable | None = COMPARISONS.get(op)
+    if fn is None:
+        return Constant(None)
+
+    if isinstance(left, Constant) and isinstance(right, Constant):
+        return Constant(compare_values(fn, left.value, right.value))
+
+    # specialize the common `column <op> literal` shapes
+    if isinstance(right, Constant):
+        value = right.value
+        value_type: type = type(value)
+
+        def compare_right(record: Row):
+            l = left(record)
+            if type(l) != value_type:
+                return compare_values(fn, l, value)
+            return fn(l, value)
+
+        return compare_right
+
+    if isinstance(left, Constant):
+        value = left.value
+        value_type: type = type(value)
+
+        def compare_left(record: Row):
+            r = right(record)
+            if type(r) != value_type:
+                return compare_values(fn, value, r)
+            return fn(value, r)
+
+        return compare_left
+
+    return lambda record: compare_values(fn, left(record), right(record))
+
+
+def _compile_like(left: Constant | Compiled, right: Constant | Compiled):
+    if isinstance(right, Constant):
+        regex: re.Pattern = like_regex(right.value)
+        if isinstance(left, Constant):
+            return Constant(like(left.value, regex))
+        return lambda record: like(left(record), regex)
+    if isinstance(left, Constant):
+        return lambda record: like(left.value, like_regex(right(record)))
+    return lambda record: like(left(record), like_regex(right(record)))
+
+
+# Compile an expression tree once into a closure evaluated per record.
+# Returns None for a missing expression so callers can skip evaluation.
+def compile_expression(expr: Expression | None) -> Compiled | None:
+    if expr is None:
+        return None
+    compiled = _compile(expr)
+    if isinstance(compiled, Constant):
+        value = compiled.value
+        return lambda record: value
+    return compiled
@@ -1,52 +1,301 @@
 import logging
+from collections.abc import Callable
 from functools import lru_cache
-from github import NamedUser, Repository, Github, UnknownObjectException, Auth
-from globals import inner_entities
-from enum import Enum
+from github import (
+    NamedUser,
+    Repository,
+    Github,
+    GithubException,
+    UnknownObjectException,
+    Auth,
+    Consts,
+)
+from github.Issue import Issue
+from github.Milestone import Milestone
+from github.PaginatedList import PaginatedList
+from globals import inner_entities, SourceType
+from cache import ResponseCache, DEFAULT_MAX_BYTES
+import transport
+from transport import Traffic
+from explain import OperatorStats, QueryProfile
+from ratelimit import Scheduler
+from prefetch import Prefetcher
+from fetcher import FetchEngine
+from fanout import FanOutCursor, is_pattern, match_repos, parse_sources
+from join import JoinCursor
+from records import Loader, Row, SlottedRecord, record_type
+from sorting import TopK
+from cursor import PageCursor
+from mirror import Mirror, MirrorCursor
+from session import ObjectCache, Session
+import mirror as mirrors
+import graphql
+from graphql import GraphQLCursor
+from search import EPOCH, SearchCursor
 from tokenizer import Token
+from telemetry import rows_scanned, tracer
 import os
-from datetime import datetime
+import time
+from functools import partial
+from datetime import datetime, timedelta, timezone
 
 
-# Replace GH_TOKEN with your GitHub token
-auth: Auth = Auth.Token(os.getenv("GH_TOKEN"))
+# Replace GH_TOKEN with your GitHub token, or list several comma-separated in
+# GITQL_TOKENS to spread requests over all of their rate limits
+TOKENS: list[str] = [
+    token.strip()
+    for token in os.getenv("GITQL_TOKENS", os.getenv("GH_TOKEN", "")).split(",")
+    if token.strip()
+]
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("context.log"),  # Log to a file
-        logging.StreamHandler(),  # Log to the console
-    ],
-)
+# Logging is configured by the entry point, see `gitql.main`
 logger = logging.getLogger(__name__)
 
+CACHE_DIR: str = os.getenv("GITQL_CACHE_DIR", os.path.expanduser("~/.cache/gitql"))
+
+# Paces and authorizes every API request across the token pool
+scheduler: Scheduler = Scheduler(TOKENS)
+
+# Requests sent and served from the cache by kind, see `Context.traffic_usage`
+traffic: Traffic = Traffic()
+
+
+# On-disk cache of API responses shared by every Context in the process.
+# Opened, and PyGithub's connections routed through it, by the first Context,
+# so that importing this module touches no files.
+@lru_cache
+def response_cache() -> ResponseCache:
+    cache: ResponseCache = ResponseCache(
+        os.path.join(CACHE_DIR, "responses.sqlite"),
+        int(os.getenv("GITQL_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+    )
+    transport.install(cache, scheduler, traffic)
+    return cache
+
+
+# Runs per-row detail calls concurrently, see `Context.load_details`. Its
+# event loop thread is started by the first Context.
+@lru_cache
+def fetch_engine() -> FetchEngine:
+    return FetchEngine(int(os.getenv("GITQL_FETCH_CONCURRENCY", 8)))
+
+
+# Repositories of a fan-out source read at once, e.g. `FROM myorg.*.issues`
+FANOUT_WORKERS: int = int(os.getenv("GITQL_FANOUT_WORKERS", 8))
+
+
+# Local copy of synced repositories, see `Context.sync`; opened on first use
+@lru_cache
+def mirror() -> Mirror:
+    return Mirror(os.path.join(CACHE_DIR, "mirror.sqlite"))
+
+
+# Largest page size the REST API allows
+PER_PAGE: int = 100
+
+# Keep-alive connections kept open to the API host. Detail calls and fan-out
+# workers each hold one while their request is in flight.
+POOL_SIZE: int = int(
+    os.getenv(
+        "GITQL_POOL_SIZE",
+        int(os.getenv("GITQL_FETCH_CONCURRENCY", 8)) + FANOUT_WORKERS,
+    )
+)
+
+# Seconds repositories, users and milestones resolved by a session are reused
+# for (0 resolves them again for every query), and how many are kept
+OBJECT_TTL: float = float(os.getenv("GITQL_OBJECT_TTL", 300))
+MAX_OBJECTS: int = 1024
+
+# Point at a GitHub Enterprise instance or a local stub server
+API_URL: str = os.getenv("GITQL_API_URL", Consts.DEFAULT_BASE_URL)
+
+BACKENDS: list[str] = ["rest", "graphql"]
+
+
+# Columns that cost an extra API call per row
+EXPENSIVE_COLUMNS: dict[SourceType, set[str]] = {
+    SourceType.ISSUES: {"closed_by"},
+    SourceType.COMMITS: {"files"},
+    SourceType.PULL_REQUESTS: {"changed_files", "merged_by"},
+    SourceType.USER_REPOS: {"languages"},
+}
+
+
+# Columns of each source's records, detail columns last. `repo` is only set
+# on rows of fan-out sources.
+COLUMNS: dict[SourceType, list[str]] = {
+    SourceType.ISSUES: [
+        "repo",
+        "id",
+        "number",
+        "title",
+        "body",
+        "state",
+        "milestone",
+        "labels",
+        "user",
+        "assignee",
+        "created_at",
+        "updated_at",
+        "closed_at",
+        "closed_by",
+    ],
+    SourceType.COMMITS: ["repo", "sha", "author", "date", "files"],
+    SourceType.PULL_REQUESTS: [
+        "repo",
+        "id",
+        "number",
+        "title",
+        "state",
+        "milestone",
+        "user",
+        "base",
+        "head",
+        "created_at",
+        "updated_at",
+        "merged",
+        "merged_at",
+        "changed_files",
+        "merged_by",
+    ],
+    SourceType.USER_REPOS: [
+        "id",
+        "name",
+        "open_issues_count",
+        "private",
+        "created_at",
+        "description",
+        "forks_count",
+        "full_name",
+        "topics",
+        "languages",
+    ],
+}
+
+# Low-cardinality columns whose strings are shared between rows
+INTERNED: set[str] = {
+    "state",
+    "milestone",
+    "labels",
+    "user",
+    "assignee",
+    "closed_by",
+    "author",
+    "base",
+    "head",
+    "merged",
+    "merged_by",
+    "topics",
+}
+
+RECORD_TYPES: dict[SourceType, type[SlottedRecord]] = {
+    source_type: record_type(
+        f"{source_type.name.title().replace('_', '')}Record", columns, INTERNED
+    )
+    for source_type, columns in COLUMNS.items()
+}
 
-class SourceType(Enum):
-    USER = 0
-    REPO = 1
-    ISSUES = 2
-    PULL_REQUESTS = 3
-    COMMITS = 4
-    USER_REPOS = 5
+
+# Source kinds a fan-out source can read from each repository
+REPO_SOURCES: dict[str, SourceType] = {
+    "issues": SourceType.ISSUES,
+    "pull_requests": SourceType.PULL_REQUESTS,
+    "commits": SourceType.COMMITS,
+}
+
+
+# Column a row can be fetched by on its own, see `Context.lookup`
+LOOKUP_KEYS: dict[SourceType, str] = {
+    SourceType.ISSUES: "number",
+    SourceType.PULL_REQUESTS: "number",
+    SourceType.COMMITS: "sha",
+    SourceType.USER_REPOS: "full_name",
+}
+
+
+# Column value from the object its detail request returned
+def detail_value(column: str, obj):
+    match column:
+        case "closed_by":
+            return obj.closed_by.login if obj.closed_by != None else "N/A"
+        case "changed_files":
+            return obj.changed_files
+        case "merged_by":
+            return obj.merged_by.login if obj.merged_by != None else "None"
+        case "files":
+            return [file.filename for file in obj.files]
+        case "languages":
+            return obj
+    raise RuntimeError(f"Unknown detail column: {column}")
+
+
+# The GitHub client and object cache of a session, see `Session`
+def open_session() -> Session:
+    # opened before the client, whose requests go through it
+    response_cache()
+    # retries are left to the scheduler, which can rotate to another token
+    git: Github = Github(
+        auth=Auth.Token(TOKENS[0]) if TOKENS else None,
+        base_url=API_URL,
+        per_page=PER_PAGE,
+        retry=None,
+        # the scheduler paces requests; PyGithub's own throttle would
+        # serialize them 0.25s apart (1s for GraphQL POSTs)
+        seconds_between_requests=None,
+        seconds_between_writes=None,
+        pool_size=POOL_SIZE,
+    )
+    return Session(git, ObjectCache(OBJECT_TTL, MAX_OBJECTS))
 
 
 class Context:
-    def __init__(self):
+    def __init__(self, session: Session):
         self.user: str = None
         self.repo: str = None
         self.source: str = ""
         self.source_type: SourceType = None
         self.selected_columns: list[str] = []
-        self.git_records: list[dict] = []
-        self.query_results: list[dict] = []
+        self.git_records: list[Row] = []
+        self.query_results: list[Row] = []
         self.limit: int = 1
-        self.max_limit: int = 1
         self.current_read: int = 0
         self.current_row: int = 0
-        self.git: Github = Github(auth=auth)
+        self.session: Session = session
+        self.git: Github = session.git
         self.total_populates: int = 0
+        self.api_filters: dict = {}
+        self.cache_counters: dict[str, int] = response_cache().counters()
+        self.rate_counters: dict[str, float] = scheduler.counters()
+        self.fetch_counters: dict[str, int] = fetch_engine().counters()
+        self.traffic_counters: dict[str, dict[str, int]] = traffic.counters()
+        self.rate_budgets: dict[str, tuple[int, int]] = scheduler.usage()
+        # operator timings of EXPLAIN ANALYZE, None otherwise
+        self.profile: QueryProfile | None = None
+        self.backend: str = "rest"
+        self.cursor: PageCursor | GraphQLCursor | FanOutCursor | None = None
+        self.prefetcher: Prefetcher | None = None
+        self.prefetch_depth: int = int(os.getenv("GITQL_PREFETCH_DEPTH", 2))
+        self.exhausted: bool = False
+        self.projection: set[str] | None = None
+        self.sorter: TopK | None = None
+        self.mirror: bool = False
+        self.mirror_max_age: float | None = None
+        self.mirrored: bool = False
+        self.loader: Loader | None = None
+        self.sink: Callable[[Row], None] | None = None
+        # writes out what the sink buffered, before waiting on a page
+        self.flush_sink: Callable[[], None] | None = None
+        self.selected: int = 0
+        # owner/name of every repository of a fan-out source
+        self.repos: list[str] = []
+        self.merge_order: list[tuple[Callable, bool]] | None = None
+        # issue search read instead of the listing, see `set_search`
+        self.search: list[str] | None = None
+        # created range the search starts from, None where unbounded
+        self.search_created: tuple[datetime | None, datetime | None] = (None, None)
+        # joined rows of a JOIN query, read instead of a source
+        self.join: JoinCursor | None = None
 
     def _can_select(self, s: str) -> bool:
         return s in inner_entities.get(self.source)
@@ -56,18 +305,73 @@ class Context:
             self.repopulate()
         return self.git_records[self.current_row].get(key)
 
+    def current_record(self) -> Row:
+        return self.git_records[self.current_row]
+
+    # Records of the current page not evaluated yet
+    def current_page(self) -> list[Row]:
+        return self.git_records[self.current_row :]
+
+    # Rows the query can still use; unbounded while sorting
+    def wanted(self) -> int | float:
+        if self.sorter is not None:
+            return float("inf")
+        return self.limit - self.selected
+
+    def satisfied(self) -> bool:
+        return self.sorter is None and self.selected >= self.limit
+
+    def _keep(self, record: Row):
+        if self.sorter is not None:
+            if self.profile is None:
+                self.sorter.push(record)
+            else:
+                with self.profile.timed("sort") as stats:
+                    self.sorter.push(record)
+                    stats.rows_in += 1
+            return
+        self._emit(record)
+        if self.satisfied():
+            self.close()
+
+    # Hand a result row to the sink as soon as it is selected, or keep it
+    def _emit(self, record: Row):
+        self.selected += 1
+        if self.sink is not None:
+            self.sink(record)
+        else:
+            self.query_results.append(record)
+
+    # Bulk counterpart of select_current/advance: keep `selected` from the
+    # current page and move on to the next one
+    def select_page(self, selected: list[Row]):
+        if self.sorter is None:
+            selected = selected[: self.wanted()]
+            self.load_details(selected)
+        for record in selected:
+            self._keep(record)
+        self.current_row = len(self.git_records)
+        if not self.satisfied():
+            self.repopulate()
+
     def select_current(self):
-        self.query_results.append(self.git_records[self.current_row])
+        self._keep(self.git_records[self.current_row])
         self.advance()
 
     def advance(self):
         self.current_row += 1
-        if (
-            self.current_row >= len(self.git_records)
-            and len(self.query_results) < self.limit
-        ):
+        if self.current_row >= len(self.git_records) and not self.satisfied():
             self.repopulate()
 
+    # Records of the next page, for a caller reading the source itself
+    # instead of selecting rows (see join.JoinSide)
+    def read_page(self) -> list[Row]:
+        if self.current_row >= len(self.git_records):
+            self.repopulate()
+        page: list[Row] = self.current_page()
+        self.current_row = len(self.git_records)
+        return page
+
     def repopulate(self):
         logger.debug("Repopulating git records")
         self.git_records.clear()
@@ -78,17 +382,175 @@ class Context:
         if self.limit is None:
             logger.error("Limit is not set.")
             raise RuntimeError("Limit is not set.")
-        return len(self.query_results) >= self.limit
+        return self.satisfied() or (
+            self.exhausted and self.current_row >= len(self.git_records)
+        )
+
+    # ORDER BY that can't be served by the API: every row goes through the
+    # sorter and the results are only known once the source is exhausted
+    def set_sorter(self, sorter: TopK):
+        logger.info("Sorting results locally")
+        self.sorter = sorter
+
+    def finish(self):
+        if self.sorter is not None:
+            results: list[Row] = self.sorter.result()
+            if self.profile is not None:
+                self.profile.operator("sort").rows_out = len(results)
+            self.load_details(results)
+            for record in results:
+                self._emit(record)
+
+    # Stream selected rows to `sink` instead of collecting them in
+    # query_results, so memory doesn't grow with the result. `flush` runs
+    # whenever the scan is about to wait for a page, so rows the sink
+    # buffered don't wait for the fetch too.
+    def set_sink(
+        self,
+        sink: Callable[[Row], None],
+        flush: Callable[[], None] | None = None,
+    ):
+        self.sink = sink
+        self.flush_sink = flush
 
     def set_limit(self, limit: int):
         logger.info(f"Setting query limit to {limit}")
         self.limit = limit
 
-    def set_max_limit(self, limit: int):
-        logger.info(f"Setting max limit to {limit}")
-        self.max_limit = limit
+    def set_backend(self, backend: str):
+        if backend not in BACKENDS:
+            logger.error(f"Unknown backend: {backend}")
+            raise RuntimeError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+        logger.info(f"Setting backend to {backend}")
+        self.backend = backend
+
+    # Read synced repositories from the local mirror; with `max_age` the
+    # mirror is refreshed first when its last sync is older than that
+    def set_mirror(self, enabled: bool, max_age: float | None = None):
+        logger.info(f"Setting mirror to {enabled} with max age {max_age}")
+        self.mirror = enabled
+        self.mirror_max_age = max_age
+
+    def use_mirror(self) -> bool:
+        return (
+            self.mirror
+            and not self.repos
+            and self.source_type in mirrors.KEYS
+            and mirror().synced_at(f"{self.user}/{self.repo}", self.source_type)
+            is not None
+        )
+
+    # Mirror `repo_str` locally, or fetch what changed since its last sync.
+    # Returns the number of rows written per source.
+    def sync(
+        self, repo_str: str, source_types: list[SourceType] | None = None
+    ) -> dict[SourceType, int]:
+        repo: Repository = self.get_repo(repo_str)
+        written: dict[SourceType, int] = {}
+        for source_type in source_types or list(mirrors.KEYS):
+            written[source_type] = mirror().sync(
+                repo,
+                source_type,
+                lambda item, source_type=source_type: self._rest_record(
+                    source_type, item
+                ).as_dict(),
+            )
+        return written
+
+    def set_prefetch_depth(self, depth: int):
+        logger.info(f"Setting prefetch depth to {depth}")
+        self.prefetch_depth = depth
+
+    # Response cache activity since this context was created
+    def cache_usage(self) -> dict[str, int]:
+        return {
+            name: count - self.cache_counters[name]
+            for name, count in response_cache().counters().items()
+        }
+
+    def fetch_concurrency(self) -> int:
+        return fetch_engine().concurrency
+
+    # Detail calls made and served by an identical call already in flight
+    def fetch_usage(self) -> dict[str, int]:
+        return {
+            name: count - self.fetch_counters[name]
+            for name, count in fetch_engine().counters().items()
+        }
+
+    # Requests since creation by kind, see transport.Traffic
+    def traffic_usage(self) -> dict[str, dict[str, int]]:
+        return {
+            kind: {
+                name: count - self.traffic_counters[kind][name]
+                for name, count in counts.items()
+            }
+            for kind, counts in traffic.counters().items()
+        }
+
+    # Rate limit points used since creation per API resource, as the
+    # budgets reported by GitHub went down
+    def quota_usage(self) -> dict[str, int]:
+        used: dict[str, int] = {}
+        for resource, (remaining, limit) in scheduler.usage().items():
+            before, _ = self.rate_budgets.get(resource, (limit, limit))
+            used[resource] = max(before - remaining, 0)
+        return used
+
+    def set_profile(self, profile: QueryProfile | None):
+        self.profile = profile
+
+    # Remaining and total budget per API resource across the token pool, with
+    # the retries and seconds spent waiting on rate limits since creation
+    def rate_usage(self) -> dict:
+        return {
+            "budgets": scheduler.usage(),
+            "tokens": len(scheduler.tokens),
+            **{
+                name: count - self.rate_counters[name]
+                for name, count in scheduler.counters().items()
+            },
+        }
+
+    # Columns the query references; None means every column (SELECT *)
+    def set_projection(self, columns: set[str] | None):
+        logger.info(f"Setting projected columns to {columns}")
+        self.projection = columns
+
+    # Sort keys of an ORDER BY the API serves natively: each repository of a
+    # fan-out source is listed in that order, and the listings are merged
+    def set_merge_order(self, keys: list[tuple[Callable, bool]]):
+        self.merge_order = keys
+
+    # Read the issues an issue search with `terms` returns instead of the
+    # whole listing; the search narrows the rows, the predicate still decides.
+    # `start` and `end` bound the created range it is read over.
+    def set_search(
+        self,
+        terms: list[str],
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ):
+        logger.info(f"Reading issue search results for {terms}")
+        self.search = terms
+        self.search_created = (start, end)
+
+    # Read the rows of a JOIN instead of a source
+    def set_join(self, join: JoinCursor):
+        logger.info(f"Joining with a {type(join).__name__}")
+        self.join = join
+
+    def set_filters(self, filters: dict):
+        logger.info(f"Setting API filters to {filters}")
+        self.api_filters = filters
 
     def set_sources(self, source_token: Token):
+        fanout: tuple[list[tuple[str, str]], str] | None = parse_sources(
+            source_token.value
+        )
+        if fanout is not None:
+            self.set_fanout_sources(*fanout)
+            return
         source_tree: list[str] = source_token.value.split(".")
         if len(source_tree) == 2:
             if source_tree[1] == "repos":
@@ -122,124 +584,559 @@ class Context:
                 if not self._can_select(col):
                     raise RuntimeError(f"can't select {col} from {self.source}")
 
+    # Query the same source in several repositories: listed ones must exist,
+    # patterns match the owner's repositories
+    def set_fanout_sources(self, repos: list[tuple[str, str]], kind: str):
+        source_type: SourceType | None = REPO_SOURCES.get(kind)
+        if source_type is None:
+            logger.error(f"Unknown source type: {kind}")
+            raise RuntimeError("Unknown source")
+        self.source_type = source_type
+        self.repos = []
+        for owner, name in repos:
+            if not is_pattern(name):
+                repo_str: str = f"{owner}/{name}"
+                try:
+                    self.get_repo(repo_str)
+                except UnknownObjectException:
+                    logger.error(f"Invalid repository: {repo_str}")
+                    raise
+                names: list[str] = [name]
+            else:
+                names = match_repos(
+                    [repo.name for repo in self.get_user(owner).get_repos()], name
+                )
+            for matched in names:
+                if f"{owner}/{matched}" not in self.repos:
+                    self.repos.append(f"{owner}/{matched}")
+        logger.info(f"Fanning out over {len(self.repos)} repositories")
+
     def add_selected_column(self, column: str):
         self.selected_columns.append(column)
 
-    @lru_cache(maxsize=128)
     def get_repo(self, repo_str: str) -> Repository:
-        logger.info(f"Fetching repository: {repo_str}")
-        return self.git.get_repo(repo_str)
+        return self.session.get_repo(repo_str)
 
-    @lru_cache(maxsize=128)
     def get_user(self, username: str) -> NamedUser:
-        logger.info(f"Fetching user: {username}")
-        return self.git.get_user(username)
+        return self.session.get_user(username)
 
-    def populate(self):
-        self.total_populates += 1
-        logger.debug(f"Populating data for source type: {self.source_type}")
+    def get_milestone(self, repo_str: str, title: str) -> Milestone | None:
+        return self.session.get_milestone(repo_str, title)
+
+    # Keyword arguments for the listing call of the current source, or None
+    # when a pushed-down filter can't match anything
+    def listing_params(self, repo: Repository) -> dict | None:
+        params: dict = dict(self.api_filters)
+        if self.source_type in (SourceType.ISSUES, SourceType.PULL_REQUESTS):
+            params.setdefault("state", "all")
+        if "milestone" in params:
+            milestone = self.get_milestone(repo.full_name, params["milestone"])
+            if milestone is None:
+                logger.info(f"Unknown milestone: {params['milestone']}")
+                return None
+            params["milestone"] = milestone
+        return params
+
+    # The paginated listing for the current source, or None when a pushed-down
+    # filter can't match anything. `repo_str` picks one repository of a
+    # fan-out source.
+    def open_listing(self, repo_str: str | None = None) -> PaginatedList | None:
+        match self.source_type:
+            case SourceType.ISSUES | SourceType.PULL_REQUESTS | SourceType.COMMITS:
+                repo = self.get_repo(repo_str or f"{self.user}/{self.repo}")
+                params: dict | None = self.listing_params(repo)
+                if params is None:
+                    return None
+                if self.source_type == SourceType.ISSUES:
+                    return repo.get_issues(**params)
+                elif self.source_type == SourceType.COMMITS:
+                    return repo.get_commits(**params)
+                return repo.get_pulls(**params)
+            case SourceType.USER_REPOS:
+                return self.get_user(self.user).get_repos(**self.api_filters)
+            case _:
+                logger.error("Unknown source type encountered.")
+                raise RuntimeError("Unknown source type")
+
+    # GraphQL counterpart of open_listing: one query per page of 100 nodes
+    # asking only for the projected columns
+    def open_graphql_cursor(self, repo_str: str | None = None) -> GraphQLCursor | None:
+        owner, name = self.user, self.repo
+        params: dict = dict(self.api_filters)
+        if self.source_type != SourceType.USER_REPOS:
+            repo_str = repo_str or f"{self.user}/{self.repo}"
+            owner, name = repo_str.split("/")
+            params = self.listing_params(self.get_repo(repo_str))
+            if params is None:
+                return None
+        variables: dict = graphql.build_variables(
+            self.source_type,
+            owner,
+            name,
+            params,
+            lambda login: self.get_user(login).node_id,
+        )
+        return GraphQLCursor(
+            self.git.requester,
+            self.source_type,
+            variables,
+            self.projection,
+            params.get("head"),
+            params.get("labels"),
+        )
+
+    # Cursor over the current source's API listing, or over `repo_str`'s for
+    # one repository of a fan-out source
+    def open_api_cursor(
+        self, repo_str: str | None = None
+    ) -> PageCursor | GraphQLCursor | None:
+        if self.backend == "graphql":
+            return self.open_graphql_cursor(repo_str)
+        listing: PaginatedList | None = self.open_listing(repo_str)
+        return PageCursor(listing) if listing is not None else None
+
+    # Read every repository of a fan-out source on the worker pool, merged in
+    # ORDER BY order when the listings come sorted
+    def open_fanout_cursor(self) -> FanOutCursor:
+        return FanOutCursor(
+            self.repos,
+            self.open_api_cursor,
+            self._fanout_record,
+            FANOUT_WORKERS,
+            self.prefetch_depth,
+            PER_PAGE,
+            self.merge_order,
+        )
+
+    # COUNT(*) of the current source's listing from a single request: asked
+    # for one row per page, the API's Link header `last` page is the count
+    def listing_count(self) -> int:
+        listing: PaginatedList | None = self.open_listing()
+        if listing is None:
+            return 0
+        logger.info("Counting rows from the listing's last page number")
+        return listing.totalCount
+
+    # COUNT(*) of the repository's issues or pulls matching search qualifiers,
+    # from the search API's total_count. None when the search timed out and
+    # the count may be short.
+    def search_count(self, qualifiers: list[str]) -> int | None:
+        query: str = " ".join([f"repo:{self.user}/{self.repo}", *qualifiers])
+        logger.info(f"Counting rows with search query: {query}")
+        _, data = self.git.requester.requestJsonAndCheck(
+            "GET", "/search/issues", parameters={"q": query, "per_page": 1}
+        )
+        if data.get("incomplete_results"):
+            logger.warning("Search results are incomplete, counting rows instead")
+            return None
+        return data["total_count"]
+
+    def mirror_count(self) -> int:
+        return mirror().count(f"{self.user}/{self.repo}", self.source_type)
+
+    # Rows of the current source from a single request, ignoring the local
+    # predicate; None for fan-out sources
+    def estimate_rows(self) -> int | None:
+        if self.repos:
+            return None
+        if self.use_mirror():
+            return self.mirror_count()
+        return self.listing_count()
+
+    # Column rows of the current source can be fetched by with `lookup`, or
+    # None when they have to be listed
+    def lookup_key(self) -> str | None:
+        if self.repos or self.use_mirror():
+            return None
+        return LOOKUP_KEYS.get(self.source_type)
+
+    # The API object of the current source's row with lookup key `key`, or
+    # None when there is none
+    def _lookup_item(self, key):
+        repo_str: str = f"{self.user}/{self.repo}"
         try:
             match self.source_type:
-                case SourceType.ISSUES | SourceType.PULL_REQUESTS | SourceType.COMMITS:
-                    repo = self.get_repo(f"{self.user}/{self.repo}")
-                    if self.source_type == SourceType.ISSUES:
-                        for issue in repo.get_issues(state="all")[
-                            self.current_read : self.current_read + self.max_limit
-                        ]:
-                            logger.debug(f"Processing issue ID: {issue.id}")
-                            self.git_records.append(
-                                {
-                                    "id": issue.id,
-                                    "number": issue.number,
-                                    "title": issue.title,
-                                    "state": issue.state,
-                                    "milestone": issue.milestone,
-                                    "labels": issue.labels,
-                                    "user": issue.user.login,
-                                    "created_at": issue.created_at.strftime(
-                                        "%Y-%m-%d %H:%M:%S"
-                                    ),
-                                    "closed_at": (
-                                        issue.closed_at.strftime("%Y-%m-%d %H:%M:%S")
-                                        if issue.state == "closed"
-                                        else "N/A"
-                                    ),
-                                    "closed_by": (
-                                        issue.closed_by.login
-                                        if issue.closed_by != None
-                                        else "N/A"
-                                    ),
-                                }
-                            )
-                            self.current_read += 1
-                    elif self.source_type == SourceType.COMMITS:
-                        for commit in repo.get_commits()[
-                            self.current_read : self.current_read + self.max_limit
-                        ]:
-                            logger.debug(f"Processing commit SHA: {commit.sha}")
-                            self.git_records.append(
-                                {
-                                    "sha": commit.sha,
-                                    "author": commit.author.login,
-                                    "files": commit.files,
-                                }
-                            )
-                            self.current_read += 1
-                    elif self.source_type == SourceType.PULL_REQUESTS:
-                        for pr in repo.get_pulls(state="all")[
-                            self.current_read : self.current_read + self.max_limit
-                        ]:
-                            logger.debug(f"Processing pull request ID: {pr.id}")
-                            self.git_records.append(
-                                {
-                                    "id": pr.id,
-                                    "number": pr.number,
-                                    "title": pr.title,
-                                    "state": pr.state,
-                                    "milestone": pr.milestone,
-                                    "user": pr.user.login,
-                                    "changed_files": pr.changed_files,
-                                    "created_at": pr.created_at.strftime(
-                                        "%Y-%m-%d %H:%M:%S"
-                                    ),
-                                    "merged": "true" if pr.merged else "false",
-                                    "merged_at": (
-                                        (pr.merged_at.strftime("%Y-%m-%d %H:%M:%S"))
-                                        if pr.merged
-                                        else "N/A"
-                                    ),
-                                    "merged_by": (
-                                        pr.merged_by.login if pr.merged else "None"
-                                    ),
-                                }
-                            )
-                            self.current_read += 1
+                case SourceType.ISSUES:
+                    if type(key) is int:
+                        return self.get_repo(repo_str).get_issue(key)
+                case SourceType.PULL_REQUESTS:
+                    if type(key) is int:
+                        return self.get_repo(repo_str).get_pull(key)
+                case SourceType.COMMITS:
+                    if type(key) is str:
+                        return self.get_repo(repo_str).get_commit(key)
                 case SourceType.USER_REPOS:
-                    user = self.get_user(self.user)
-                    for repo in user.get_repos()[
-                        self.current_read : self.current_read + self.max_limit
-                    ]:
-                        logger.debug(f"Processing repository ID: {repo.id}")
-                        self.git_records.append(
-                            {
-                                "id": repo.id,
-                                "name": repo.name,
-                                "open_issues_count": repo.open_issues_count,
-                                "private": repo.private,
-                                "created_at": repo.created_at.strftime(
-                                    "%Y-%m-%d %H:%M:%S"
-                                ),
-                                "description": repo.description,
-                                "forks_count": repo.forks_count,
-                                "full_name": repo.full_name,
-                                "languages": repo.get_languages(),
-                                "topics": repo.topics,
-                            }
-                        )
-                        self.current_read += 1
-                case _:
-                    logger.error("Unknown source type encountered.")
-                    raise RuntimeError("Unknown source type")
+                    # only the user's own repositories are listed
+                    if type(key) is str and key.partition("/")[0] == self.user:
+                        return self.git.get_repo(key)
+        except UnknownObjectException:
+            return None
+        except GithubException as e:
+            # an invalid SHA is rejected rather than not found
+            if e.status == 422:
+                return None
+            raise
+        return None
+
+    # Fetch rows of the current source by lookup key, with up to
+    # GITQL_FETCH_CONCURRENCY calls in flight. Keys matching no row are left
+    # out of the result.
+    def lookup(self, keys: list) -> dict:
+        if self.loader is None:
+            self.loader = self.make_loader()
+        logger.debug(f"Looking up {len(keys)} rows by {self.lookup_key()}")
+        repo_str: str = f"{self.user}/{self.repo}"
+        objects: list = fetch_engine().gather(
+            [
+                (
+                    ("lookup", self.source_type.name, repo_str, key),
+                    partial(self._lookup_item, key),
+                )
+                for key in keys
+            ]
+        )
+        return {
+            key: self._rest_record(self.source_type, obj)
+            for key, obj in zip(keys, objects)
+            if obj is not None
+        }
+
+    def open_mirror_cursor(self) -> MirrorCursor:
+        repo_str: str = f"{self.user}/{self.repo}"
+        synced_at: float = mirror().synced_at(repo_str, self.source_type)
+        if (
+            self.mirror_max_age is not None
+            and time.time() - synced_at > self.mirror_max_age
+        ):
+            logger.info(f"Mirror of {repo_str} is stale, syncing changes")
+            self.sync(repo_str, [self.source_type])
+        self.mirrored = True
+        return mirror().cursor(repo_str, self.source_type)
+
+    # One page of issue search results for `query`, with the total number of
+    # results the search matches
+    def search_page(self, query: str, page: int) -> tuple[int, list[Issue]]:
+        headers, data = self.git.requester.requestJsonAndCheck(
+            "GET",
+            "/search/issues",
+            parameters={
+                "q": query,
+                "sort": "created",
+                "order": self.api_filters.get("direction", "desc"),
+                "per_page": PER_PAGE,
+                "page": page,
+            },
+        )
+        if data.get("incomplete_results"):
+            logger.warning(f"Search timed out, results may be missing: {query}")
+        return data["total_count"], [
+            Issue(self.git.requester, headers, item, completed=False)
+            for item in data["items"]
+        ]
+
+    def open_search_cursor(self) -> SearchCursor:
+        query: str = " ".join([f"repo:{self.user}/{self.repo}", *self.search])
+        start, end = self.search_created
+        return SearchCursor(
+            self.search_page,
+            query,
+            start or EPOCH,
+            end or datetime.now(timezone.utc) + timedelta(days=1),
+            self.api_filters.get("direction") == "asc",
+        )
+
+    def make_record(self, item) -> SlottedRecord:
+        if self.search is not None:
+            return self._issue_record(item)
+        if self.mirrored:
+            return self._mirror_record(item)
+        if self.backend == "graphql":
+            return self._graphql_record(item)
+        return self._rest_record(self.source_type, item)
+
+    def _rest_record(self, source_type: SourceType, item) -> SlottedRecord:
+        match source_type:
+            case SourceType.ISSUES:
+                return self._issue_record(item)
+            case SourceType.COMMITS:
+                return self._commit_record(item)
+            case SourceType.PULL_REQUESTS:
+                return self._pull_record(item)
+            case SourceType.USER_REPOS:
+                return self._repo_record(item)
+            case _:
+                logger.error("Unknown source type encountered.")
+                raise RuntimeError("Unknown source type")
+
+    # Detail columns the query references, fetched on first access
+    def make_loader(self) -> Loader:
+        expensive: set[str] = EXPENSIVE_COLUMNS.get(self.source_type, set())
+        if self.projection is not None:
+            expensive = expensive & self.projection
+        return Loader(self.load_detail, expensive)
+
+    # Detail columns are only returned by the item's detail endpoint; rows
+    # keep just the number or SHA needed to request it, and fan-out rows their
+    # repository. Returns the request as (key, fetch), the key naming the
+    # endpoint so columns read from the same object share one call.
+    def detail_request(
+        self, record: SlottedRecord, column: str
+    ) -> tuple[tuple, Callable[[], object]]:
+        repo_str: str = record.get("repo") or f"{self.user}/{self.repo}"
+        fetch: Callable[[], object]
+        match column:
+            case "closed_by":
+                number: int = record.get("number")
+                fetch = lambda: self.get_repo(repo_str).get_issue(number)
+                return ("issue", repo_str, number), fetch
+            case "changed_files" | "merged_by":
+                number = record.get("number")
+                fetch = lambda: self.get_repo(repo_str).get_pull(number)
+                return ("pull", repo_str, number), fetch
+            case "files":
+                sha: str = record.get("sha")
+                fetch = lambda: self.get_repo(repo_str).get_commit(sha)
+                return ("commit", repo_str, sha), fetch
+            case "languages":
+                full_name: str = record.get("full_name")
+                fetch = lambda: self.git.get_repo(full_name, lazy=True).get_languages()
+                return ("languages", full_name), fetch
+        raise RuntimeError(f"Unknown detail column: {column}")
+
+    def load_detail(self, record: SlottedRecord, column: str):
+        key, fetch = self.detail_request(record, column)
+        return detail_value(column, fetch_engine().fetch(key, fetch))
+
+    # Whether `record` has detail columns left to load, among `columns` if given
+    def needs_details(self, record: Row, columns: set[str] | None) -> bool:
+        if self.join is not None:
+            return self.join.needs_details(record, columns)
+        if self.loader is None:
+            return False
+        wanted: frozenset[str] = self.loader.columns
+        if columns is not None:
+            wanted = wanted & columns
+        return not all(record.is_loaded(column) for column in wanted)
+
+    # Fetch the detail columns of `records` not loaded yet, restricted to
+    # `columns` when given, with up to GITQL_FETCH_CONCURRENCY calls in flight
+    def load_details(
+        self, records: list[Row], columns: set[str] | None = None
+    ):
+        if self.profile is None:
+            with tracer.span("load_details", rows=len(records)):
+                self._load_details(records, columns)
+            return
+        # only rounds that made calls count, join sides' included
+        before: dict[str, int] = fetch_engine().counters()
+        start: float = time.perf_counter()
+        with tracer.span("load_details", rows=len(records)):
+            self._load_details(records, columns)
+        made: dict[str, int] = {
+            name: count - before[name]
+            for name, count in fetch_engine().counters().items()
+        }
+        if any(made.values()):
+            stats: OperatorStats = self.profile.operator("details")
+            stats.seconds += time.perf_counter() - start
+            stats.rows_in += len(records)
+            stats.rows_out += len(records)
+            for name, count in made.items():
+                stats.counts[name] = stats.counts.get(name, 0) + count
+
+    def _load_details(
+        self, records: list[Row], columns: set[str] | None = None
+    ):
+        if self.join is not None:
+            self.join.load_details(records, columns)
+            return
+        if self.loader is None or len(records) == 0:
+            return
+        wanted: frozenset[str] = self.loader.columns
+        if columns is not None:
+            wanted = wanted & columns
+        missing: list[tuple[SlottedRecord, str]] = [
+            (record, column)
+            for record in records
+            for column in wanted
+            if column in record and not record.is_loaded(column)
+        ]
+        if len(missing) == 0:
+            return
+        logger.debug("Loading %s detail columns concurrently", len(missing))
+        objects: list = fetch_engine().gather(
+            [self.detail_request(record, column) for record, column in missing]
+        )
+        for (record, column), obj in zip(missing, objects):
+            record.set(column, detail_value(column, obj))
+
+    def _issue_record(self, issue) -> SlottedRecord:
+        logger.debug("Processing issue ID: %s", issue.id)
+        return RECORD_TYPES[SourceType.ISSUES](
+            {
+                "id": issue.id,
+                "number": issue.number,
+                "title": issue.title,
+                "body": issue.body,
+                "state": issue.state,
+                "milestone": (
+                    issue.milestone.title if issue.milestone != None else "N/A"
+                ),
+                "labels": [label.name for label in issue.labels],
+                "user": issue.user.login,
+                "assignee": (
+                    issue.assignee.login if issue.assignee != None else "N/A"
+                ),
+                "created_at": issue.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "updated_at": issue.updated_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "closed_at": (
+                    issue.closed_at.strftime("%Y-%m-%d %H:%M:%S")
+                    if issue.state == "closed"
+                    else "N/A"
+                ),
+            },
+            self.loader,
+        )
+
+    def _commit_record(self, commit) -> SlottedRecord:
+        logger.debug("Processing commit SHA: %s", commit.sha)
+        return RECORD_TYPES[SourceType.COMMITS](
+            {
+                "sha": commit.sha,
+                "author": commit.author.login if commit.author != None else "N/A",
+                "date": commit.commit.author.date.strftime("%Y-%m-%d %H:%M:%S"),
+            },
+            self.loader,
+        )
+
+    def _pull_record(self, pr) -> SlottedRecord:
+        logger.debug("Processing pull request ID: %s", pr.id)
+        return RECORD_TYPES[SourceType.PULL_REQUESTS](
+            {
+                "id": pr.id,
+                "number": pr.number,
+                "title": pr.title,
+                "state": pr.state,
+                "milestone": (pr.milestone.title if pr.milestone != None else "N/A"),
+                "user": pr.user.login,
+                "base": pr.base.ref,
+                "head": pr.head.label,
+                "created_at": pr.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "updated_at": pr.updated_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "merged": "true" if pr.merged_at != None else "false",
+                "merged_at": (
+                    pr.merged_at.strftime("%Y-%m-%d %H:%M:%S")
+                    if pr.merged_at != None
+                    else "N/A"
+                ),
+            },
+            self.loader,
+        )
+
+    def _repo_record(self, repo) -> SlottedRecord:
+        logger.debug("Processing repository ID: %s", repo.id)
+        return RECORD_TYPES[SourceType.USER_REPOS](
+            {
+                "id": repo.id,
+                "name": repo.name,
+                "open_issues_count": repo.open_issues_count,
+                "private": repo.private,
+                "created_at": repo.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                "description": repo.description,
+                "forks_count": repo.forks_count,
+                "full_name": repo.full_name,
+                "topics": repo.topics,
+            },
+            self.loader,
+        )
+
+    # GraphQL nodes carry every projected column except commit files, which
+    # the GraphQL commit object doesn't have
+    def _graphql_record(self, node: dict) -> SlottedRecord:
+        return RECORD_TYPES[self.source_type](self.cursor.values(node), self.loader)
+
+    # Rows of a fan-out source carry the repository they were listed from
+    def _fanout_record(self, repo_str: str, cursor, item) -> SlottedRecord:
+        if self.backend == "graphql":
+            record = RECORD_TYPES[self.source_type](cursor.values(item), self.loader)
+        else:
+            record = self._rest_record(self.source_type, item)
+        record.set("repo", repo_str)
+        return record
+
+    # Mirrored rows keep the listing columns; detail columns are fetched on
+    # first access, like for records built from the API
+    def _mirror_record(self, values: dict) -> SlottedRecord:
+        return RECORD_TYPES[self.source_type](values, self.loader)
+
+    # Fetch the next API page and build its records; runs on the prefetch thread
+    def fetch_page(self, page: int) -> list[Row]:
+        logger.debug("Fetching page %s for source type: %s", page, self.source_type)
+        if self.repos or self.join is not None:
+            # fan-out workers and joins already built the records
+            return self.cursor.next_page()
+        return [self.make_record(item) for item in self.cursor.next_page()]
+
+    def populate(self):
+        read: int = self.current_read
+        source: str = self.source_type.name if self.source_type else "join"
+        with tracer.span("populate", source=source) as span:
+            if self.profile is None:
+                self._populate()
+            else:
+                with self.profile.timed("scan") as stats:
+                    self._populate()
+                    stats.rows_out = self.current_read
+                    stats.counts["pages"] = self.pages_fetched()
+            span.set("rows", self.current_read - read)
+
+    def _populate(self):
+        self.total_populates += 1
+        logger.debug("Populating data for source type: %s", self.source_type)
+        if self.exhausted:
+            return
+        try:
+            if self.prefetcher is None:
+                # fan-out workers build records as soon as the cursor opens
+                self.loader = self.make_loader()
+                if self.join is not None:
+                    self.cursor = self.join
+                elif self.repos:
+                    self.cursor = self.open_fanout_cursor()
+                elif self.search is not None:
+                    self.cursor = self.open_search_cursor()
+                elif self.use_mirror():
+                    self.cursor = self.open_mirror_cursor()
+                else:
+                    self.cursor = self.open_api_cursor()
+                if self.cursor is None:
+                    self.exhausted = True
+                    return
+                # pages follow each other's Link header or end cursor, so one
+                # worker reads ahead
+                self.prefetcher = Prefetcher(
+                    self.fetch_page, self.prefetch_depth, workers=1
+                )
+            if self.flush_sink is not None and not self.prefetcher.ready():
+                self.flush_sink()
+            page: list[Row] = self.prefetcher.next()
         except Exception as e:
             logger.exception(f"Error while populating records: {e}")
             raise
+        if self.prefetcher.exhausted and not self.prefetcher.pending:
+            self.exhausted = True
+        self.git_records.extend(page)
+        self.current_read += len(page)
+        rows_scanned.inc(len(page))
+
+    def pages_fetched(self) -> int:
+        return self.cursor.pages if self.cursor is not None else 0
+
+    # Stop background fetching once the query no longer needs rows
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+        if isinstance(self.cursor, FanOutCursor):
+            self.cursor.close()
+        if self.join is not None:
+            self.join.close()
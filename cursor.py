@@ -0,0 +1,30 @@
+import logging
+import threading
+from github.PaginatedList import PaginatedList
+
+
+logger = logging.getLogger(__name__)
+
+
+# Persistent position in a paginated listing. The listing keeps the Link header
+# `next` URL of the last page it fetched, so every request continues where the
+# previous one stopped and each page is fetched exactly once.
+class PageCursor:
+    def __init__(self, listing: PaginatedList):
+        self.listing: PaginatedList = listing
+        self.pages: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def has_next(self) -> bool:
+        return self.listing._couldGrow()
+
+    def next_page(self) -> list:
+        with self.lock:
+            if not self.has_next():
+                return []
+            # _fetchNextPage (unlike iterating the listing) doesn't keep
+            # previously fetched pages alive
+            page: list = self.listing._fetchNextPage()
+            self.pages += 1
+            logger.debug(f"Fetched page {self.pages} with {len(page)} items")
+            return page
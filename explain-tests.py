@@ -0,0 +1,75 @@
+import unittest
+from explain import QueryProfile
+from records import Record
+
+
+def rows(count: int) -> list[Record]:
+    return [Record({"number": n}) for n in range(count)]
+
+
+class TestQueryProfile(unittest.TestCase):
+    def test_plan_only(self):
+        profile = QueryProfile(False)
+        profile.note("filter", "number > 1")
+        profile.note("scan", "a.b.issues")
+        profile.note("scan", "Read from rest listing")
+        profile.operator("filter").rows_in = 10
+        self.assertEqual(
+            profile.lines(),
+            [
+                "-> Scan: a.b.issues",
+                "     Read from rest listing",
+                "-> Filter: number > 1",
+            ],
+        )
+
+    def test_predicates_are_counted(self):
+        profile = QueryProfile(True)
+        predicate = profile.predicate("filter", lambda r: r.get("number") > 1)
+        self.assertEqual([r.get("number") for r in rows(4) if predicate(r)], [2, 3])
+        batch = profile.batch_predicate(
+            "detail_filter", lambda records: [r.get("number") % 2 for r in records]
+        )
+        self.assertEqual(batch(rows(4)), [0, 1, 0, 1])
+        self.assertIsNone(profile.predicate("filter", None))
+        filtered = profile.operator("filter")
+        self.assertEqual((filtered.rows_in, filtered.rows_out), (4, 2))
+        self.assertEqual(profile.operator("detail_filter").rows_out, 2)
+
+    def test_sink_and_timing(self):
+        profile = QueryProfile(True)
+        kept: list[Record] = []
+        sink = profile.sink("output", kept.append)
+        for row in rows(3):
+            sink(row)
+        with profile.timed("scan") as stats:
+            stats.rows_out = 3
+            stats.counts["pages"] = 1
+        self.assertEqual(len(kept), 3)
+        self.assertEqual(profile.operator("output").rows_in, 3)
+        self.assertGreaterEqual(profile.operator("scan").seconds, 0)
+
+    def test_traffic_goes_to_its_operator(self):
+        profile = QueryProfile(True)
+        profile.note("scan", "a.b.issues")
+        counts = {
+            "requests": 2,
+            "bytes": 2048,
+            "cache_hits": 1,
+            "revalidations": 0,
+            "charged": 2,
+        }
+        profile.add_traffic({"pages": counts, "details": dict.fromkeys(counts, 0)})
+        lines: list[str] = profile.lines()
+        self.assertEqual(lines[0], "-> Scan: a.b.issues")
+        self.assertTrue(lines[1].strip().startswith("actual time"))
+        self.assertEqual(
+            lines[2].strip(),
+            "HTTP: 2 requests, 2.0 KiB, 1 cache hits, 0 revalidated, "
+            "2 charged to the rate limit",
+        )
+        self.assertEqual(len(lines), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import logging
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from records import Row
+
+
+logger = logging.getLogger(__name__)
+
+
+# compiler.Compiled and batch.BatchCompiled; importing those would be
+# circular, as context imports this module
+Predicate = Callable[[Row], object]
+BatchPredicate = Callable[[list[Row]], list]
+
+
+# Operators rows flow through, in order, with their EXPLAIN labels
+OPERATORS: dict[str, str] = {
+    "scan": "Scan",
+    "details": "Detail Fetch",
+    "filter": "Filter",
+    "detail_filter": "Detail Filter",
+    "aggregate": "Aggregate",
+    "sort": "Sort",
+    "limit": "Limit",
+    "output": "Output",
+}
+
+# Operator the requests of each transport.request_kind are charged to
+TRAFFIC_OPERATORS: dict[str, str] = {"pages": "scan", "details": "details"}
+
+INDENT: str = "     "
+
+
+class OperatorStats:
+    def __init__(self):
+        self.seconds: float = 0.0
+        self.rows_in: int = 0
+        self.rows_out: int = 0
+        # other counts worth reporting, e.g. pages read
+        self.counts: dict[str, int] = {}
+        # transport.Traffic counters of the requests the operator made
+        self.traffic: dict[str, int] | None = None
+
+
+# What EXPLAIN shows of a query: how each operator runs, noted while the
+# query is planned, and with ANALYZE what each one cost while it ran. Time
+# is wall time spent in the operator on the query's thread, so a page read
+# ahead in the background only counts for as long as the scan waited on it.
+class QueryProfile:
+    def __init__(self, analyze: bool):
+        self.analyze: bool = analyze
+        self.notes: dict[str, list[str]] = {}
+        self.stats: dict[str, OperatorStats] = {}
+
+    def note(self, operator: str, text: str):
+        self.notes.setdefault(operator, []).append(text)
+
+    def operator(self, name: str) -> OperatorStats:
+        return self.stats.setdefault(name, OperatorStats())
+
+    @contextmanager
+    def timed(self, name: str) -> Iterator[OperatorStats]:
+        stats: OperatorStats = self.operator(name)
+        start: float = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds += time.perf_counter() - start
+
+    # `predicate` counting the rows it sees and passes
+    def predicate(self, name: str, predicate: Predicate | None) -> Predicate | None:
+        if predicate is None:
+            return None
+        stats: OperatorStats = self.operator(name)
+
+        def evaluate(record: Row):
+            start: float = time.perf_counter()
+            result = predicate(record)
+            stats.seconds += time.perf_counter() - start
+            stats.rows_in += 1
+            stats.rows_out += bool(result)
+            return result
+
+        return evaluate
+
+    def batch_predicate(
+        self, name: str, predicate: BatchPredicate | None
+    ) -> BatchPredicate | None:
+        if predicate is None:
+            return None
+        stats: OperatorStats = self.operator(name)
+
+        def evaluate(records: list[Row]):
+            start: float = time.perf_counter()
+            mask = predicate(records)
+            stats.seconds += time.perf_counter() - start
+            stats.rows_in += len(records)
+            stats.rows_out += sum(map(bool, mask))
+            return mask
+
+        return evaluate
+
+    # `sink` counting the rows handed to it
+    def sink(
+        self, name: str, sink: Callable[[Row], None]
+    ) -> Callable[[Row], None]:
+        stats: OperatorStats = self.operator(name)
+
+        def consume(record: Row):
+            start: float = time.perf_counter()
+            sink(record)
+            stats.seconds += time.perf_counter() - start
+            stats.rows_in += 1
+
+        return consume
+
+    # Charge the requests of each kind to their operator
+    def add_traffic(self, traffic: dict[str, dict[str, int]]):
+        for kind, counts in traffic.items():
+            if any(counts.values()):
+                self.operator(TRAFFIC_OPERATORS[kind]).traffic = counts
+
+    def lines(self) -> list[str]:
+        lines: list[str] = []
+        for name, label in OPERATORS.items():
+            notes: list[str] = self.notes.get(name, [])
+            stats: OperatorStats | None = self.stats.get(name) if self.analyze else None
+            if not notes and stats is None:
+                continue
+            lines.append(f"-> {label}: {notes[0]}" if notes else f"-> {label}")
+            lines.extend(INDENT + note for note in notes[1:])
+            if stats is not None:
+                lines.append(INDENT + _actual(stats))
+                if stats.traffic is not None:
+                    lines.append(INDENT + _http(stats.traffic))
+        return lines
+
+
+def _actual(stats: OperatorStats) -> str:
+    parts: list[str] = [f"actual time {stats.seconds:.3f}s"]
+    if stats.rows_in:
+        parts.append(f"rows in {stats.rows_in}")
+    parts.append(f"rows out {stats.rows_out}")
+    parts.extend(f"{name} {count}" for name, count in stats.counts.items())
+    return ", ".join(parts)
+
+
+def _http(traffic: dict[str, int]) -> str:
+    return (
+        f"HTTP: {traffic['requests']} requests, "
+        f"{traffic['bytes'] / 1024:.1f} KiB, "
+        f"{traffic['cache_hits']} cache hits, "
+        f"{traffic['revalidations']} revalidated, "
+        f"{traffic['charged']} charged to the rate limit"
+    )
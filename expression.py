@@ -7,6 +7,7 @@ class ExpressionType(Enum):
     STR = 0
     INT = 1
     CPH = 2
+    PARAM = 3  # Prepared statement parameter, replaced by a literal before evaluation
 
 
 class Expression:
@@ -46,6 +47,12 @@ class BinaryExpression(Expression):
         self.right = right
 
     def eval(self, ctx: Context):
+        if self.operator in (TokenType.AND, TokenType.OR):
+            # the right operand only runs when the left doesn't decide
+            l = self.left.eval(ctx)
+            if bool(l) == (self.operator == TokenType.OR):
+                return l
+            return self.right.eval(ctx)
         l: int = self.left.eval(ctx)
         r: int = self.right.eval(ctx)
         if type(l) != type(r):
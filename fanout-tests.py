@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+from fanout import FanOutCursor, match_repos, parse_sources
+
+
+# Stand-in for a repository listing, `rows` in pages of `size`
+class FakeCursor:
+    def __init__(self, rows: list, size: int, delay: float = 0.0):
+        self.rows: list = rows
+        self.size: int = size
+        self.delay: float = delay
+        self.pages: int = 0
+
+    def has_next(self) -> bool:
+        return self.pages * self.size < len(self.rows)
+
+    def next_page(self) -> list:
+        time.sleep(self.delay)
+        page: list = self.rows[self.pages * self.size : (self.pages + 1) * self.size]
+        self.pages += 1
+        return page
+
+
+def make_record(repo: str, cursor, item) -> dict:
+    return {"repo": repo, "n": item}
+
+
+class TestParseSources(unittest.TestCase):
+    def test_single_source_is_not_fanned_out(self):
+        self.assertIsNone(parse_sources("owner.repo.issues"))
+        self.assertIsNone(parse_sources("owner.repos"))
+
+    def test_glob(self):
+        self.assertEqual(
+            parse_sources("myorg.*.issues"), ([("myorg", "*")], "issues")
+        )
+
+    def test_list(self):
+        self.assertEqual(
+            parse_sources("(a.x,a.y).pull_requests"),
+            ([("a", "x"), ("a", "y")], "pull_requests"),
+        )
+
+    def test_invalid_list(self):
+        with self.assertRaises(RuntimeError):
+            parse_sources("(a.x,y).issues")
+        with self.assertRaises(RuntimeError):
+            parse_sources("(a.x,a.y)")
+
+    def test_match_repos(self):
+        names = ["gitql", "gitql-docs", "website"]
+        self.assertEqual(match_repos(names, "gitql*"), ["gitql", "gitql-docs"])
+
+
+class TestFanOutCursor(unittest.TestCase):
+    def open(self, listings: dict, order=None, workers: int = 4, delay=0.0):
+        cursor = FanOutCursor(
+            list(listings),
+            lambda repo: FakeCursor(listings[repo], 3, delay),
+            make_record,
+            workers,
+            depth=2,
+            page_size=3,
+            order=order,
+        )
+        self.addCleanup(cursor.close)
+        return cursor
+
+    def drain(self, cursor: FanOutCursor) -> list:
+        rows: list = []
+        while True:
+            page: list = cursor.next_page()
+            rows.extend(page)
+            if len(page) < 3:
+                return rows
+
+    def test_reads_every_repository(self):
+        cursor = self.open({"a/x": list(range(7)), "a/y": list(range(4)), "a/z": []})
+        rows = self.drain(cursor)
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(
+            sorted(row["n"] for row in rows if row["repo"] == "a/x"), list(range(7))
+        )
+        self.assertEqual(cursor.pages, 3 + 2 + 1)
+
+    def test_only_the_last_page_is_short(self):
+        cursor = self.open({"a/x": [1, 2], "a/y": [3, 4], "a/z": [5, 6]})
+        self.assertGreaterEqual(len(cursor.next_page()), 3)
+
+    def test_sorted_listings_are_merged(self):
+        cursor = self.open(
+            {"a/x": [9, 6, 2, 1], "a/y": [8, 7, 3], "a/z": [5, 4]},
+            order=[(lambda row: row["n"], True)],
+        )
+        rows = self.drain(cursor)
+        self.assertEqual([row["n"] for row in rows], [9, 8, 7, 6, 5, 4, 3, 2, 1])
+
+    def test_repositories_are_read_in_parallel(self):
+        listings = {f"a/{i}": [i] for i in range(8)}
+        start: float = time.monotonic()
+        rows = self.drain(self.open(listings, workers=8, delay=0.05))
+        self.assertEqual(len(rows), 8)
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_close_stops_reading(self):
+        cursor = self.open({"a/x": list(range(300))}, delay=0.01)
+        cursor.next_page()
+        cursor.close()
+        pages: int = cursor.pages
+        time.sleep(0.05)
+        self.assertLessEqual(cursor.pages, pages + 1)
+        self.assertEqual(cursor.next_page(), [])
+
+    def test_errors_reach_the_consumer(self):
+        def open_cursor(repo: str):
+            raise RuntimeError("boom")
+
+        cursor = FanOutCursor(["a/x"], open_cursor, make_record, 1, 1, 3)
+        self.addCleanup(cursor.close)
+        with self.assertRaises(RuntimeError):
+            cursor.next_page()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,203 @@
+import logging
+import threading
+from collections import deque
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+from itertools import islice
+from records import Row
+from sorting import SortKey, merge_sorted
+
+
+logger = logging.getLogger(__name__)
+
+
+# Characters that make a repository name a pattern
+GLOB_CHARS: str = "*?["
+
+
+# `owner.*.kind`, `owner.prefix-*.kind` or `(a.x, a.y).kind` -> the
+# (owner, name pattern) pairs and the source kind, or None for a single
+# `owner.repo.kind` source
+def parse_sources(source: str) -> tuple[list[tuple[str, str]], str] | None:
+    if source.startswith("("):
+        end: int = source.find(")")
+        if end == -1 or not source[end + 1 :].startswith("."):
+            raise RuntimeError(f"Invalid source list: {source}")
+        items: list[str] = [
+            item.strip() for item in source[1:end].split(",") if item.strip()
+        ]
+        kind: str = source[end + 2 :]
+    else:
+        parts: list[str] = source.split(".")
+        if len(parts) != 3 or not is_pattern(parts[1]):
+            return None
+        items, kind = [f"{parts[0]}.{parts[1]}"], parts[2]
+    repos: list[tuple[str, str]] = []
+    for item in items:
+        parts = item.split(".")
+        if len(parts) != 2 or not all(parts):
+            raise RuntimeError(f"Expected owner.repo in source list, got {item}")
+        repos.append((parts[0], parts[1]))
+    if len(repos) == 0:
+        raise RuntimeError(f"Empty source list: {source}")
+    return repos, kind
+
+
+def is_pattern(name: str) -> bool:
+    return any(char in name for char in GLOB_CHARS)
+
+
+# Names of `owner`'s repositories matching `pattern`, in listing order
+def match_repos(names: list[str], pattern: str) -> list[str]:
+    return [name for name in names if fnmatch(name, pattern)]
+
+
+# One repository's pages of a fan-out query, fetched a page at a time on the
+# shared pool and buffered up to the fan-out depth
+class _Stream:
+    __slots__ = ("name", "cursor", "pages", "fetching", "exhausted", "error")
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.cursor = None
+        self.pages: deque[list[Row]] = deque()
+        self.fetching: bool = False
+        self.exhausted: bool = False
+        self.error: Exception | None = None
+
+
+# Cursor over the same source in several repositories. Each repository's
+# listing is read on a shared worker pool, at most `depth` pages ahead of the
+# consumer. Pages are handed out as they arrive or, with `order`, merged
+# k-way from listings the API already sorted. Closing it stops the workers,
+# so a satisfied LIMIT doesn't wait for the remaining repositories.
+class FanOutCursor:
+    def __init__(
+        self,
+        repos: list[str],
+        open_cursor: Callable[[str], object],
+        make_record: Callable[[str, object, object], Row],
+        workers: int,
+        depth: int,
+        page_size: int,
+        order: list[tuple[SortKey, bool]] | None = None,
+    ):
+        self.open_cursor: Callable[[str], object] = open_cursor
+        self.make_record: Callable[[str, object, object], Row] = make_record
+        self.depth: int = max(depth, 1)
+        self.page_size: int = page_size
+        self.streams: list[_Stream] = [_Stream(repo) for repo in repos]
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max(workers, 1), thread_name_prefix="gitql-fanout"
+        )
+        self.changed: threading.Condition = threading.Condition()
+        # streams in the order their pages arrived, when not merging
+        self.arrivals: deque[_Stream] = deque()
+        self.closed: bool = False
+        self.merged: Iterator[Row] | None = None
+        if order:
+            self.merged = merge_sorted([self._drain(s) for s in self.streams], order)
+        with self.changed:
+            for stream in self.streams:
+                self._schedule(stream)
+
+    @property
+    def pages(self) -> int:
+        return sum(s.cursor.pages for s in self.streams if s.cursor is not None)
+
+    def has_next(self) -> bool:
+        return not self.closed and not all(
+            s.exhausted and not s.pages for s in self.streams
+        )
+
+    # Start fetching the stream's next page unless enough are buffered;
+    # called with `changed` held
+    def _schedule(self, stream: _Stream):
+        if (
+            self.closed
+            or stream.fetching
+            or stream.exhausted
+            or len(stream.pages) >= self.depth
+        ):
+            return
+        stream.fetching = True
+        self.executor.submit(self._fetch, stream)
+
+    def _fetch(self, stream: _Stream):
+        records: list[Row] = []
+        exhausted: bool = False
+        error: Exception | None = None
+        try:
+            if stream.cursor is None:
+                stream.cursor = self.open_cursor(stream.name)
+            if stream.cursor is None:
+                exhausted = True
+            else:
+                items: list = stream.cursor.next_page()
+                records = [
+                    self.make_record(stream.name, stream.cursor, item)
+                    for item in items
+                ]
+                exhausted = not stream.cursor.has_next()
+        except Exception as e:
+            logger.exception(f"Error while fetching {stream.name}: {e}")
+            error = e
+        with self.changed:
+            stream.fetching = False
+            stream.error = error
+            stream.exhausted = exhausted or error is not None
+            if records:
+                stream.pages.append(records)
+                if self.merged is None:
+                    self.arrivals.append(stream)
+            self._schedule(stream)
+            self.changed.notify_all()
+
+    def _raise_errors(self):
+        for stream in self.streams:
+            if stream.error is not None:
+                raise stream.error
+
+    # Records of one stream in listing order, waiting for pages as needed
+    def _drain(self, stream: _Stream) -> Iterator[Row]:
+        while True:
+            with self.changed:
+                while not stream.pages and not stream.exhausted and not self.closed:
+                    self.changed.wait()
+                if stream.error is not None:
+                    raise stream.error
+                if self.closed or not stream.pages:
+                    return
+                page: list[Row] = stream.pages.popleft()
+                self._schedule(stream)
+            yield from page
+
+    # At least `page_size` records unless the listings are done, so a short
+    # page still means the last one
+    def next_page(self) -> list[Row]:
+        if self.merged is not None:
+            return list(islice(self.merged, self.page_size))
+        records: list[Row] = []
+        with self.changed:
+            while len(records) < self.page_size:
+                self._raise_errors()
+                if self.closed:
+                    break
+                if self.arrivals:
+                    stream: _Stream = self.arrivals.popleft()
+                    records.extend(stream.pages.popleft())
+                    self._schedule(stream)
+                elif all(s.exhausted for s in self.streams):
+                    break
+                else:
+                    self.changed.wait()
+        return records
+
+    def close(self):
+        with self.changed:
+            if self.closed:
+                return
+            self.closed = True
+            self.changed.notify_all()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,60 @@
+import threading
+import time
+import unittest
+from fetcher import FetchEngine
+
+
+class TestFetchEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = FetchEngine(4)
+
+    def tearDown(self):
+        self.engine.close()
+
+    def test_results_keep_call_order(self):
+        calls = [(i, lambda i=i: i * i) for i in range(10)]
+        self.assertEqual(self.engine.gather(calls), [i * i for i in range(10)])
+
+    def test_calls_run_concurrently_up_to_the_limit(self):
+        running: list[int] = [0, 0]
+        lock: threading.Lock = threading.Lock()
+
+        def fetch():
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        start: float = time.monotonic()
+        self.engine.gather([(i, fetch) for i in range(8)])
+        self.assertEqual(running[1], 4)
+        # two rounds of four instead of eight calls in a row
+        self.assertLess(time.monotonic() - start, 0.3)
+
+    def test_identical_keys_are_coalesced(self):
+        calls: list[int] = []
+
+        def fetch():
+            calls.append(1)
+            time.sleep(0.02)
+            return "pull"
+
+        results: list = self.engine.gather([(("pull", 1), fetch)] * 3)
+        self.assertEqual(results, ["pull"] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.engine.counters(), {"calls": 1, "coalesced": 2})
+
+    def test_errors_are_raised_to_the_caller(self):
+        def fetch():
+            raise RuntimeError("boom")
+
+        with self.assertRaises(RuntimeError):
+            self.engine.fetch("k", fetch)
+        # the failed call isn't kept around
+        self.assertEqual(self.engine.fetch("k", lambda: 1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
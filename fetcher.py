@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+# Runs blocking API calls on an asyncio event loop in a background thread,
+# at most `concurrency` in flight at once. Calls with the same key while one
+# is in flight share its result instead of requesting the same URL again.
+class FetchEngine:
+    def __init__(self, concurrency: int):
+        self.concurrency: int = max(concurrency, 1)
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        # PyGithub is synchronous: each call holds a worker thread, and the
+        # semaphore on the loop keeps the rest queued
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="gitql-fetch"
+        )
+        self.semaphore: asyncio.Semaphore = asyncio.Semaphore(self.concurrency)
+        self.in_flight: dict[Hashable, asyncio.Future] = {}
+        self.calls: int = 0
+        self.coalesced: int = 0
+        self.thread: threading.Thread = threading.Thread(
+            target=self.loop.run_forever, name="gitql-fetch-loop", daemon=True
+        )
+        self.thread.start()
+
+    async def _call(self, fetch: Callable[[], object]):
+        async with self.semaphore:
+            self.calls += 1
+            return await self.loop.run_in_executor(self.executor, fetch)
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], object]):
+        future: asyncio.Future | None = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._call(fetch))
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shielded so one caller giving up doesn't cancel the others' call
+        return await asyncio.shield(future)
+
+    # Run `(key, fetch)` calls concurrently and return their results in order.
+    # The first exception raised by a call is raised here.
+    def gather(self, calls: list[tuple[Hashable, Callable[[], object]]]) -> list:
+        if len(calls) == 0:
+            return []
+
+        async def run() -> list:
+            return await asyncio.gather(*[self._fetch(k, f) for k, f in calls])
+
+        return asyncio.run_coroutine_threadsafe(run(), self.loop).result()
+
+    def fetch(self, key: Hashable, fetch: Callable[[], object]):
+        return self.gather([(key, fetch)])[0]
+
+    def counters(self) -> dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced}
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.executor.shutdown(wait=False, cancel_futures=True)
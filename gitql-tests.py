@@ -0,0 +1,208 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from gitql import split_statements
+from stubapi import Issue, StubAPI, synthetic_repos
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestSplitStatements(unittest.TestCase):
+    def test_script(self):
+        script = """-- nightly report
+\\backend graphql
+SELECT number, title
+FROM bench.repo1.issues
+LIMIT 5;
+
+SELECT COUNT(*) FROM bench.repo1.issues
+\\output csv counts.csv
+SELECT number FROM bench.repo1.issues WHERE title = 'a;b'"""
+        self.assertEqual(
+            split_statements(script),
+            [
+                "\\backend graphql",
+                "SELECT number, title\nFROM bench.repo1.issues\nLIMIT 5;",
+                "SELECT COUNT(*) FROM bench.repo1.issues",
+                "\\output csv counts.csv",
+                "SELECT number FROM bench.repo1.issues WHERE title = 'a;b'",
+            ],
+        )
+
+    def test_blank_lines_end_queries(self):
+        self.assertEqual(
+            split_statements("\n\nSELECT a FROM x\n\n\\plans\n"),
+            ["SELECT a FROM x", "\\plans"],
+        )
+
+
+# gitql.py run in a fresh interpreter and an empty directory, against the stub
+class TestEntryPoint(unittest.TestCase):
+    def setUp(self):
+        self.api = StubAPI(synthetic_repos("bench", 1, 20)).start()
+        self.cwd = tempfile.TemporaryDirectory()
+        self.env = dict(
+            os.environ,
+            PYTHONPATH=HERE,
+            GITQL_API_URL=self.api.url,
+            GITQL_CACHE_DIR=os.path.join(self.cwd.name, "cache"),
+        )
+        self.env.pop("GH_TOKEN", None)
+        self.env.pop("GITQL_TOKENS", None)
+
+    def tearDown(self):
+        self.api.stop()
+        self.cwd.cleanup()
+
+    def run_python(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, *args],
+            cwd=self.cwd.name,
+            env=self.env,
+            capture_output=True,
+            text=True,
+        )
+
+    def test_import_has_no_side_effects(self):
+        result = self.run_python(
+            "-c",
+            "import sys, gitql; print(sorted({m.split('.')[0] for m in sys.modules}"
+            " & {'prompt_toolkit', 'pygments', 'beautifultable'}))",
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "[]")
+        self.assertEqual(os.listdir(self.cwd.name), [])
+
+    def test_execute(self):
+        result = self.run_python(
+            os.path.join(HERE, "gitql.py"),
+            "-e",
+            "\\output csv",
+            "-e",
+            "SELECT number FROM bench.repo1.issues LIMIT 3",
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("number\n20\n19\n18\n", result.stdout)
+
+    def test_order_by_without_limit_sorts_every_row(self):
+        result = self.run_python(
+            os.path.join(HERE, "gitql.py"),
+            "-e",
+            "\\output csv",
+            "-e",
+            "SELECT number FROM bench.repo1.issues ORDER BY number",
+            "-e",
+            "SELECT user, COUNT(*) FROM bench.repo1.issues GROUP BY user ORDER BY user",
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        rows = "".join(f"{n}\n" for n in range(1, 21))
+        self.assertIn("number\n" + rows, result.stdout)
+        users = sorted({Issue(n).user for n in range(1, 21)})
+        counts = "".join(
+            f"{u},{sum(Issue(n).user == u for n in range(1, 21))}\n" for u in users
+        )
+        self.assertIn("user,COUNT(*)\n" + counts, result.stdout)
+
+    def test_explain_shows_the_rows_sorted(self):
+        query = "EXPLAIN SELECT number FROM bench.repo1.issues ORDER BY title"
+        result = self.run_python(
+            os.path.join(HERE, "gitql.py"), "-e", query, "-e", f"{query} LIMIT 5"
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("-> Sort: in memory, all rows by title\n", result.stdout)
+        self.assertIn("-> Sort: in memory, top 5 by title\n", result.stdout)
+
+    def test_join(self):
+        result = self.run_python(
+            os.path.join(HERE, "gitql.py"),
+            "-e",
+            "\\output csv",
+            "-e",
+            "SELECT p.number, i.title FROM bench.repo1.pull_requests AS p "
+            "JOIN bench.repo1.issues AS i ON p.number = i.number LIMIT 3",
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        rows = "".join(f"{n},{Issue(n).title}\n" for n in (5, 4, 3))
+        self.assertIn("p.number,i.title\n" + rows, result.stdout)
+
+    def test_mirror_matches_list_columns(self):
+        query = "SELECT number FROM bench.repo1.issues WHERE labels = 'bug' LIMIT 50"
+        expected = [n for n in range(20, 0, -1) if "bug" in Issue(n).labels]
+        for execution in ("row", "batch"):
+            result = self.run_python(
+                os.path.join(HERE, "gitql.py"),
+                "-e",
+                "\\output csv",
+                "-e",
+                f"\\execution {execution}",
+                "-e",
+                query,
+                "-e",
+                "\\sync bench.repo1 issues",
+                "-e",
+                "\\mirror on",
+                "-e",
+                query,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            rows = "number\n" + "".join(f"{n}\n" for n in expected)
+            # the same rows from the API listing and from the mirror
+            self.assertEqual(result.stdout.count(rows), 2, result.stdout)
+
+    def test_rows_are_written_before_waiting_on_a_page(self):
+        self.api.stop()
+        self.api = StubAPI(synthetic_repos("bench", 1, 150), latency=0.5).start()
+        self.env["GITQL_API_URL"] = self.api.url
+        process = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(HERE, "gitql.py"),
+                "-e",
+                "\\output csv",
+                "-e",
+                "SELECT number FROM bench.repo1.issues LIMIT 150",
+            ],
+            cwd=self.cwd.name,
+            env=self.env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+        )
+        seen: dict[str, float] = {}
+        for line in process.stdout:
+            seen.setdefault(line.strip(), time.monotonic())
+        process.wait()
+        # the last row of the first page doesn't wait for the second page
+        self.assertLess(seen["51"] - seen["150"], 0.25)
+        self.assertIn("50", seen)
+
+    def test_script_stops_at_error(self):
+        with open(os.path.join(self.cwd.name, "report.gql"), "w") as script:
+            script.write(
+                "\\execution sideways\nSELECT number FROM bench.repo1.issues\n"
+            )
+        result = self.run_python(os.path.join(HERE, "gitql.py"), "-f", "report.gql")
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("gitql: Execution mode must be row or batch", result.stderr)
+        self.assertNotIn("Query Results", result.stdout)
+
+    def test_errors_are_reported_in_one_line(self):
+        query: str = "SELECT number FROM bench.repo1.issues"
+        for statements, message in [
+            (["SELECT number FROM bench.missing.issues"], "gitql: 404 "),
+            (["\\output csv missing/rows.csv", query], "gitql: [Errno 2] "),
+            ([f"{query} WHERE title = 'x"], "gitql: Unterminated string"),
+        ]:
+            args: list[str] = [arg for s in statements for arg in ("-e", s)]
+            result = self.run_python(os.path.join(HERE, "gitql.py"), *args)
+            self.assertEqual(result.returncode, 1)
+            self.assertIn(message, result.stderr)
+            self.assertNotIn("Traceback", result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
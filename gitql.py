@@ -1,74 +1,304 @@
+import argparse
+import os
+import sys
 import time
 import logging
-from beautifultable import BeautifulTable
-from context import Context
-from parser import Parser
-from tokenizer import Tokenizer, TokenType
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from functools import partial
+from github import GithubException
+from context import Context, EXPENSIVE_COLUMNS, FANOUT_WORKERS, PER_PAGE, open_session
 from expression import Expression
-from pygments.lexers.sql import SqlLexer
-from prompt_toolkit import PromptSession
-from prompt_toolkit.lexers import PygmentsLexer
-from pygments.styles import get_style_by_name
-from prompt_toolkit.styles.pygments import style_from_pygments_cls
+from globals import SourceType
+from compiler import Compiled, compile_expression
+from batch import BatchCompiled, selected_indices
+from records import Record, Row
+from aggregate import HashAggregate
+from selectivity import SelectivityStats
+from session import Session
+from explain import OperatorStats, QueryProfile
+import telemetry
+from telemetry import OtlpFileExporter, registry, rows_selected, tracer
+from join import JoinSide, LookupJoin, make_join
+from planner import (
+    check_columns,
+    describe,
+    join_conjuncts,
+    join_keys,
+    native_sort,
+    projected_columns,
+    push_down,
+    qualified,
+    referenced_columns,
+    search_created,
+    search_qualifiers,
+    split_by_alias,
+    split_by_cost,
+    split_conjuncts,
+    text_search,
+)
+from plans import Plan, PlanCache, bind
+from tokenizer import Token
+from sorting import TopK
+from output import OUTPUT_MODES, RowWriter, make_writer
+from itertools import islice
+from typing import TYPE_CHECKING, TextIO
+
+# The result table and the interactive prompt are imported when first used,
+# keeping them off the startup of scripts and of library use
+if TYPE_CHECKING:
+    from beautifultable import BeautifulTable
 
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
-)
 logger = logging.getLogger(__name__)
 
 
+# Source names accepted by \sync
+SOURCE_TYPES: dict[str, SourceType] = {
+    "issues": SourceType.ISSUES,
+    "pull_requests": SourceType.PULL_REQUESTS,
+    "commits": SourceType.COMMITS,
+}
+
+
+# REPL argument -> bound value: digits are ints, quotes are optional on strings
+def parse_value(arg: str) -> int | str:
+    if arg.isdigit():
+        return int(arg)
+    return arg[1:-1] if len(arg) > 1 and arg[0] == arg[-1] == "'" else arg
+
+
+# ORDER BY keys as written, for EXPLAIN
+def sort_keys(order_by: list[tuple[Expression, bool]]) -> str:
+    return ", ".join(
+        describe(key) + (" DESC" if descending else "") for key, descending in order_by
+    )
+
+
 class GitQL:
     def __init__(self):
-        self.tokenizer: Tokenizer = Tokenizer()
-        self.parser: Parser = Parser()
-        self.ctx: Context = Context()
-        self.session: PromptSession = PromptSession(
-            lexer=PygmentsLexer(SqlLexer),
-            style=style_from_pygments_cls(get_style_by_name("manni")),
+        self.plans: PlanCache = PlanCache(
+            int(os.getenv("GITQL_PLAN_CACHE_SIZE", 256))
         )
+        self.statements: dict[str, Plan] = {}
+        self.backend: str = os.getenv("GITQL_BACKEND", "rest")
+        self.execution: str = os.getenv("GITQL_EXECUTION", "row")
+        self.mirror: bool = os.getenv("GITQL_MIRROR", "off") == "on"
+        max_age: str | None = os.getenv("GITQL_MIRROR_MAX_AGE")
+        self.mirror_max_age: float | None = float(max_age) if max_age else None
+        self.output: str = os.getenv("GITQL_OUTPUT", "table")
+        self.output_file: str | None = os.getenv("GITQL_OUTPUT_FILE")
+        self.writer: RowWriter | None = None
+        # pass rates of WHERE predicates, kept across queries
+        self.selectivity: SelectivityStats = SelectivityStats()
+        # what the current query's operators do and cost, under EXPLAIN
+        self.profile: QueryProfile | None = None
+        # metrics and traces are written out after every query
+        self.metrics_file: str | None = os.getenv("GITQL_METRICS_FILE")
+        otlp_file: str | None = os.getenv("GITQL_OTLP_FILE")
+        self.otlp: OtlpFileExporter | None = (
+            OtlpFileExporter(otlp_file) if otlp_file else None
+        )
+        tracer.enabled = self.otlp is not None
+        # client and resolved objects outlive the per-query Context
+        self.session: Session = open_session()
+        self.ctx: Context = Context(self.session)
+        self.ctx.set_backend(self.backend)
+        self.ctx.set_mirror(self.mirror, self.mirror_max_age)
 
         logger.info("GitQL initialized.")
 
-    def initialize(self, query: str):
-        logger.debug(f"Initializing with query: {query}")
-        self.tokenizer.tokenize(query)
-        while self.tokenizer.has_next():
-            token = self.tokenizer.current_token()
-            logger.debug(f"Current token: {token}")
-            if token.type == TokenType.SELECT:
-                self.tokenizer.next_token()
-                if self.tokenizer.current_token().type == TokenType.ASTERISK:
-                    self.tokenizer.next_token()
-                while self.tokenizer.current_token().type == TokenType.COLUMN_PH:
-                    self.ctx.add_selected_column(self.tokenizer.next_token().value)
-            elif token.type == TokenType.SOURCE:
-                logger.info(f"Set source: {self.tokenizer.current_token().value}")
-                self.ctx.set_sources(self.tokenizer.next_token())
-            elif token.type == TokenType.LIMIT:
-                self.tokenizer.next_token()  # Skip LIMIT keyword
-                limit_value = int(self.tokenizer.next_token().value)
-                self.ctx.set_limit(limit_value)
-            elif token.type == TokenType.WHERE:
-                self.tokenizer.next_token()  # Skip WHERE keyword
-                logger.debug("Processing WHERE clause.")
-                while (
-                    self.tokenizer.has_next()
-                    and self.tokenizer.current_token().type != TokenType.LIMIT
+    # Parse a query into a reusable plan, from the plan cache when possible.
+    # `?` and `:name` placeholders are bound per execution.
+    def prepare(self, query: str) -> Plan:
+        return self.plans.prepare(query)
+
+    # REPL commands start with a backslash, e.g. `\backend graphql`
+    def command(self, line: str):
+        args: list[str] = line[1:].split()
+        if len(args) == 0:
+            print("Empty command")
+            return
+        match args[0]:
+            case "backend":
+                if len(args) == 1:
+                    print(f"Backend: {self.backend}")
+                    return
+                self.ctx.set_backend(args[1])
+                self.backend = args[1]
+                print(f"Backend set to {self.backend}")
+            case "execution":
+                if len(args) == 1:
+                    print(f"Execution: {self.execution}")
+                    return
+                if args[1] not in ("row", "batch"):
+                    raise RuntimeError("Execution mode must be row or batch")
+                self.execution = args[1]
+                print(f"Execution set to {self.execution}")
+            case "prepare":
+                # \prepare <name> <query with ? or :name placeholders>
+                if len(args) < 3:
+                    raise RuntimeError("Usage: \\prepare <name> <query>")
+                self.statements[args[1]] = self.prepare(line.split(maxsplit=2)[2])
+                print(f"Prepared {args[1]}")
+            case "execute":
+                # \execute <name> [value ...], values bound in order
+                if len(args) < 2 or args[1] not in self.statements:
+                    raise RuntimeError("Usage: \\execute <prepared name> [value ...]")
+                plan: Plan = self.statements[args[1]]
+                values: list = [parse_value(arg) for arg in args[2:]]
+                if not plan.positional:
+                    values = dict(zip(plan.parameters, values))
+                self.run_plan(plan, values)
+            case "sync":
+                # \sync <owner>.<repo> [issues | pull_requests | commits]
+                if len(args) < 2 or len(args[1].split(".")) != 2:
+                    raise RuntimeError("Usage: \\sync <owner>.<repo> [source ...]")
+                source_types: list[SourceType] = [
+                    SOURCE_TYPES[arg] for arg in args[2:] if arg in SOURCE_TYPES
+                ]
+                if len(source_types) != len(args[2:]):
+                    raise RuntimeError(f"Can only sync {list(SOURCE_TYPES)}")
+                s_time = time.time()
+                written: dict[SourceType, int] = self.ctx.sync(
+                    args[1].replace(".", "/"), source_types
+                )
+                for source_type, count in written.items():
+                    print(f"{source_type.name.lower()}: {count} rows synced")
+                print(f"Total Time: {time.time() - s_time}s")
+            case "mirror":
+                # \mirror [on | off] [max age in seconds]
+                if len(args) == 1:
+                    state: str = "on" if self.mirror else "off"
+                    print(f"Mirror: {state}, max age: {self.mirror_max_age}")
+                    return
+                if args[1] not in ("on", "off"):
+                    raise RuntimeError("Mirror must be on or off")
+                self.mirror = args[1] == "on"
+                self.mirror_max_age = float(args[2]) if len(args) > 2 else None
+                self.ctx.set_mirror(self.mirror, self.mirror_max_age)
+                print(f"Mirror set to {args[1]}")
+            case "output":
+                # \output [table | chunked | ndjson | csv | tsv] [file]
+                if len(args) == 1:
+                    print(f"Output: {self.output} to {self.output_file or 'stdout'}")
+                    return
+                if args[1] not in OUTPUT_MODES:
+                    raise RuntimeError(f"Output must be one of {OUTPUT_MODES}")
+                if args[1] == "table" and len(args) > 2:
+                    raise RuntimeError("Table output only goes to stdout")
+                self.output = args[1]
+                self.output_file = args[2] if len(args) > 2 else None
+                print(f"Output set to {self.output}")
+            case "plans":
+                counters: dict[str, int] = self.plans.counters()
+                print(
+                    f"Plan cache: {self.plans.size()} plans, "
+                    f"{counters['hits']} hits, {counters['misses']} misses"
+                )
+            case "objects":
+                # \objects [clear]: repositories, users and milestones cached
+                if len(args) > 1 and args[1] == "clear":
+                    self.session.objects.clear()
+                    print("Object cache cleared")
+                    return
+                counters = self.session.objects.counters()
+                print(
+                    f"Object cache: {self.session.objects.size()} objects, "
+                    f"{counters['hits']} hits, {counters['misses']} misses"
+                )
+            case "selectivity":
+                # \selectivity [reset]
+                if len(args) > 1 and args[1] == "reset":
+                    self.selectivity.clear()
+                    print("Selectivity stats cleared")
+                    return
+                for (scope, predicate), (evaluated, passed) in sorted(
+                    self.selectivity.counts.items()
                 ):
-                    self.parser.add_token(self.tokenizer.next_token())
-            else:
-                self.tokenizer.next_token()
+                    print(f"{scope.lower()}: {predicate}: {passed}/{evaluated} rows")
+            case "metrics":
+                # \metrics: the process's metrics in Prometheus text format
+                print(registry.prometheus(), end="")
+            case _:
+                print(f"Unknown command: {args[0]}")
 
     def reset(self):
         logger.info("Resetting GitQL state.")
-        self.tokenizer.reset()
-        self.parser.reset()
-        self.ctx = Context()
+        self.ctx.close()
+        self.writer = None
+        self.profile = None
+        self.ctx = Context(self.session)
+        self.ctx.set_backend(self.backend)
+        self.ctx.set_mirror(self.mirror, self.mirror_max_age)
 
     def print(self, time):
+        if self.profile is not None:
+            self.print_profile(time)
+            return
         logger.debug("Printing query results.")
+        out: TextIO = sys.stdout
+        if self.writer is not None:
+            rows: int = self.writer.rows
+            # keep stdout to the rows themselves when they feed a pipeline
+            if self.output != "chunked" or self.output_file:
+                out = sys.stderr
+        else:
+            # detail columns of every result row in one concurrent round
+            self.ctx.load_details(self.ctx.query_results)
+            table: BeautifulTable = self.result_table()
+            print("\nQuery Results:")
+            print(table)
+            rows = len(table.rows)
+        print(f"\nTotal Rows Fetched: {self.ctx.current_read}", file=out)
+        print(f"Total Pages Fetched: {self.ctx.pages_fetched()}", file=out)
+        print(f"\nTotal Rows: {rows}", file=out)
+        if self.ctx.join is not None:
+            for side in self.ctx.join.sides():
+                usage: dict = side.usage()
+                line: str = (
+                    f"Join {usage['alias']} ({usage['role']}): "
+                    f"{usage['rows_in']} rows read, {usage['rows_out']} kept, "
+                    f"{usage['api_calls']} API calls"
+                )
+                if usage["role"] == "build":
+                    line += (
+                        f", hash table {usage['table_rows']} rows "
+                        f"in {usage['table_bytes'] / 1024:.1f} KiB"
+                    )
+                print(line, file=out)
+        cache: dict[str, int] = self.ctx.cache_usage()
+        print(
+            f"Cache: {cache['hits']} hits, {cache['revalidations']} revalidated, "
+            f"{cache['misses']} misses",
+            file=out,
+        )
+        fetches: dict[str, int] = self.ctx.fetch_usage()
+        if fetches["calls"] or fetches["coalesced"]:
+            print(
+                f"Detail Calls: {fetches['calls']}, "
+                f"{fetches['coalesced']} coalesced",
+                file=out,
+            )
+        rate: dict = self.ctx.rate_usage()
+        budgets: str = ", ".join(
+            f"{resource} {remaining}/{limit}"
+            for resource, (remaining, limit) in sorted(rate["budgets"].items())
+        )
+        print(
+            f"Rate Limit: {budgets or 'unused'} over {rate['tokens']} tokens, "
+            f"{rate['retries']} retries, waited {rate['waited']:.1f}s",
+            file=out,
+        )
+        if self.writer is not None and self.writer.first_row is not None:
+            print(f"Time to First Row: {self.writer.first_row}s", file=out)
+        print(f"Total Time: {time}s", file=out)
+
+        logger.info(f"Query executed in {time}s with {rows} rows.")
+
+    def result_table(self) -> "BeautifulTable":
+        from beautifultable import BeautifulTable
+
         table: BeautifulTable = BeautifulTable(maxwidth=200)
         if len(self.ctx.selected_columns) > 0:
             table.columns.header = self.ctx.selected_columns
@@ -81,44 +311,698 @@ class GitQL:
             table.columns.header = self.ctx.query_results[0].keys()
             for result in self.ctx.query_results:
                 table.rows.append(result.values())
+        return table
 
-        print("\nQuery Results:")
-        print(table)
-        print(f"\nTotal Rows Fetched: {self.ctx.current_read}")
-        print(f"\nTotal Rows: {len(table.rows)}")
+    # EXPLAIN output: the operators of the plan, and under ANALYZE what each
+    # cost. The result rows are rendered as usual but not shown.
+    def print_profile(self, time):
+        profile: QueryProfile = self.profile
+        rows: int = 0
+        if profile.analyze:
+            if self.writer is not None:
+                rows = self.writer.rows
+            else:
+                self.ctx.load_details(self.ctx.query_results)
+                with profile.timed("output") as stats:
+                    table: BeautifulTable = self.result_table()
+                    str(table)
+                    rows = len(table.rows)
+                    stats.rows_in = rows
+            profile.operator("output").rows_out = rows
+            if "limit" in profile.notes:
+                profile.operator("limit").rows_out = rows
+            profile.add_traffic(self.ctx.traffic_usage())
+        print("\nQuery Plan:")
+        for line in profile.lines():
+            print(line)
+        if not profile.analyze:
+            return
+        budgets: dict = self.ctx.rate_usage()["budgets"]
+        quota: str = ", ".join(
+            f"{resource} {used} used, {budgets[resource][0]} left"
+            for resource, used in sorted(self.ctx.quota_usage().items())
+            if used
+        )
+        print(f"\nRate Limit: {quota or 'nothing used'}")
+        print(f"Total Rows: {rows}")
         print(f"Total Time: {time}s")
+        logger.info(f"Query analyzed in {time}s with {rows} rows.")
+
+    # Note how `operator` runs for EXPLAIN
+    def explain(self, operator: str, text: str):
+        if self.profile is not None:
+            self.profile.note(operator, text)
+
+    # EXPLAIN without ANALYZE: the query is planned but never scanned
+    def planning_only(self) -> bool:
+        return self.profile is not None and not self.profile.analyze
+
+    # Execute, print and reset: the whole of one query in the REPL, traced as
+    # a "query" span the scan's spans nest in
+    def run_plan(self, plan: Plan, params: list | dict | None = None):
+        s_time = time.time()
+        try:
+            with tracer.span("query", query=plan.query) as span:
+                try:
+                    self.execute_plan(plan, params)
+                    self.print(time.time() - s_time)
+                finally:
+                    span.set("rows", self.ctx.selected)
+                    rows_selected.inc(self.ctx.selected)
+                    self.reset()
+        finally:
+            self.export_telemetry()
+
+    def export_telemetry(self):
+        if self.metrics_file:
+            telemetry.write_prometheus(self.metrics_file, registry)
+        if self.otlp is not None:
+            self.otlp.export(tracer, registry)
+
+    def execute(self, query: str, params: list | dict | None = None):
+        self.execute_plan(self.prepare(query), params)
+
+    def execute_plan(self, plan: Plan, params: list | dict | None = None):
+        values: dict[str, object] = plan.bindings(params)
+        if plan.explain is not None:
+            self.profile = QueryProfile(plan.explain == "analyze")
+            self.ctx.set_profile(self.profile)
+        for column in plan.columns:
+            self.ctx.add_selected_column(column)
+        limit: int | None = plan.limit_for(values)
+        expr: Expression | None = bind(plan.where, values)
+        order_by: list[tuple[Expression, bool]] = [
+            (bind(key, values), desc) for key, desc in plan.order_by
+        ]
+        if plan.joined():
+            self.explain(
+                "scan",
+                f"{plan.source.value} AS {plan.source_alias} "
+                f"JOIN {plan.join_source.value} AS {plan.join_alias}",
+            )
+            expr = self.setup_join(plan, expr, bind(plan.join_on, values), order_by)
+        elif plan.source is not None:
+            logger.info(f"Set source: {plan.source.value}")
+            self.explain("scan", plan.source.value)
+            self.ctx.set_sources(plan.source)
+        if plan.aggregating():
+            self.execute_aggregate(plan, expr, order_by, limit)
+            return
+        if limit is not None:
+            self.explain("limit", str(limit))
+            self.ctx.set_limit(limit)
+        elif order_by:
+            # ORDER BY without LIMIT returns every row sorted, as over groups
+            self.ctx.set_limit(sys.maxsize)
+        filters, expr = self.scan_filters(expr)
+        native: dict | None = None
+        if not self.ctx.use_mirror():
+            # mirrored rows are filtered and sorted locally
+            native = native_sort(order_by, self.ctx.source_type)
+            if self.ctx.search is not None and native is not None:
+                # search results can only be read in creation order
+                native = native if native["sort"] == "created" else None
+        if native is not None:
+            # rows already arrive in order, so LIMIT can still stop the scan
+            self.explain(
+                "sort", f"by the API, sort={native['sort']} {native['direction']}"
+            )
+            if self.ctx.repos:
+                self.explain("sort", "sorted listings merged across repositories")
+            filters.update(native)
+            # a fan-out source merges its sorted per-repository listings
+            self.ctx.set_merge_order(
+                [(compile_expression(key), desc) for key, desc in order_by]
+            )
+        elif order_by:
+            k: int = self.ctx.limit
+            kept: str = "all rows" if k == sys.maxsize else f"top {k}"
+            self.explain("sort", f"in memory, {kept} by {sort_keys(order_by)}")
+            self.ctx.set_sorter(
+                TopK([(compile_expression(key), desc) for key, desc in order_by], k)
+            )
+        self.ctx.set_filters(filters)
+        self.ctx.set_projection(
+            projected_columns(
+                self.ctx.selected_columns, expr, *[key for key, _ in order_by]
+            )
+        )
+        self.explain("output", self.output_description())
+        if self.output != "table" and not self.planning_only():
+            self.writer = self.make_writer()
+            self.ctx.set_sink(
+                self.profiled("output", self.writer.write), self.writer.flush
+            )
+        self.scan(expr)
+        if self.writer is not None:
+            self.writer.close()
+
+    # Writer of the result rows; EXPLAIN ANALYZE writes them nowhere
+    def make_writer(self) -> RowWriter:
+        path: str | None = self.output_file
+        if self.profile is not None:
+            path = os.devnull
+        return make_writer(self.output, self.ctx.selected_columns, path)
+
+    # `sink` counted into `operator` under EXPLAIN ANALYZE
+    def profiled(
+        self, operator: str, sink: Callable[[Row], None]
+    ) -> Callable[[Row], None]:
+        if self.profile is None:
+            return sink
+        return self.profile.sink(operator, sink)
+
+    def timed(self, operator: str) -> AbstractContextManager[OperatorStats]:
+        if self.profile is None:
+            return nullcontext(OperatorStats())
+        return self.profile.timed(operator)
+
+    def output_description(self) -> str:
+        if self.output_file:
+            return f"{self.output} to {self.output_file}"
+        return self.output
 
-        logger.info(f"Query executed in {time}s with {len(table.rows)} rows.")
+    # API filters of the scan and the predicate left to check on its rows. A
+    # LIKE on issue text turns the scan into an issue search, which narrows
+    # the rows without deciding them; otherwise filters are pushed down to
+    # the listing. Mirrored rows are filtered locally.
+    def scan_filters(self, expr: Expression | None) -> tuple[dict, Expression | None]:
+        filters, residual = self._scan_filters(expr)
+        if self.ctx.join is None:
+            check_columns(residual, self.ctx.source_type)
+        return filters, residual
+
+    def _scan_filters(self, expr: Expression | None) -> tuple[dict, Expression | None]:
+        if self.ctx.use_mirror():
+            return {}, expr
+        search: list[str] | None = None
+        if not self.ctx.repos and self.ctx.join is None:
+            search = text_search(expr, self.ctx.source_type)
+        if search is not None:
+            self.ctx.set_search(search, *search_created(expr))
+            return {}, expr
+        return push_down(expr, self.ctx.source_type)
+
+    # Detail columns of the source, qualified by alias over a join
+    def expensive_columns(self) -> set[str]:
+        if self.ctx.join is None:
+            return EXPENSIVE_COLUMNS.get(self.ctx.source_type, set())
+        return {
+            f"{side.alias}.{column}"
+            for side in self.ctx.join.sides()
+            for column in EXPENSIVE_COLUMNS.get(side.ctx.source_type, set())
+        }
+
+    # Read the source, selecting the rows `expr` matches: the cheap conjuncts
+    # are checked first and expensive columns only fetched for their survivors.
+    # Within each part predicates run in the order the session's selectivity
+    # stats rank cheapest, and the rows they pass are counted into those.
+    def scan(self, expr: Expression | None):
+        expensive: set[str] = self.expensive_columns()
+        scope: str = self.ctx.source_type.name if self.ctx.source_type else "join"
+        cheap_expr, costly_expr = split_by_cost(expr, expensive)
+        cheap_expr = self.selectivity.plan(cheap_expr, expensive, scope)
+        costly_expr = self.selectivity.plan(costly_expr, expensive, scope)
+        costly: Compiled | None = self.selectivity.compile(costly_expr, scope)
+        costly_columns: set[str] = referenced_columns(costly_expr)
+        profile: QueryProfile | None = self.profile
+        if profile is not None:
+            self.explain_scan(cheap_expr, costly_expr, expensive)
+            if not profile.analyze:
+                return
+            costly = profile.predicate("detail_filter", costly)
+        self.ctx.populate()
+        if self.execution == "batch":
+            cheap_batch: BatchCompiled | None = self.selectivity.compile_batch(
+                cheap_expr, scope
+            )
+            if profile is not None:
+                cheap_batch = profile.batch_predicate("filter", cheap_batch)
+            self.run_batches(cheap_batch, costly, costly_columns)
+        else:
+            cheap: Compiled | None = self.selectivity.compile(cheap_expr, scope)
+            if profile is not None:
+                cheap = profile.predicate("filter", cheap)
+            self.run_rows(cheap, costly, costly_columns)
+        self.ctx.close()
+        self.ctx.finish()
+
+    # EXPLAIN notes of a scan about to start: where rows are read from and
+    # the predicates checked on them, in the order they run
+    def explain_scan(
+        self,
+        cheap_expr: Expression | None,
+        costly_expr: Expression | None,
+        expensive: set[str],
+    ):
+        ctx: Context = self.ctx
+        if ctx.join is None:
+            if ctx.repos:
+                access: str = f"{len(ctx.repos)} repositories, {FANOUT_WORKERS} at once"
+            elif ctx.search is not None:
+                access = f"issue search for {' '.join(ctx.search)}"
+            elif ctx.use_mirror():
+                access = "local mirror"
+            else:
+                access = f"{self.backend} listing"
+            self.explain("scan", f"Read from {access}")
+            if ctx.api_filters:
+                self.explain(
+                    "scan",
+                    "API filters: "
+                    + ", ".join(f"{k}={v}" for k, v in ctx.api_filters.items()),
+                )
+            columns: str = "all"
+            if ctx.projection is not None:
+                columns = ", ".join(sorted(ctx.projection))
+            self.explain("scan", f"Columns: {columns}")
+        if cheap_expr is not None:
+            self.explain("filter", describe(cheap_expr))
+        fetched: set[str] = referenced_columns(costly_expr) & expensive
+        if costly_expr is not None:
+            self.explain("detail_filter", describe(costly_expr))
+            self.explain(
+                "detail_filter",
+                f"Fetches {', '.join(sorted(fetched))} of the rows passing the filter",
+            )
+        shown: set[str] = expensive if ctx.projection is None else ctx.projection
+        output: set[str] = (shown & expensive) - fetched
+        if output:
+            self.explain(
+                "details",
+                f"{', '.join(sorted(output))} of the output rows, "
+                f"{ctx.fetch_concurrency()} calls at once",
+            )
+
+    # FROM a JOIN b ON a.x = b.y: each source is read by a context of its own,
+    # filtered by the WHERE conjuncts that only touch it, and the query runs
+    # over the joined rows. Returns the conjuncts left to check on those.
+    def setup_join(
+        self,
+        plan: Plan,
+        expr: Expression | None,
+        on: Expression,
+        order_by: list[tuple[Expression, bool]],
+    ) -> Expression | None:
+        aliases: list[str] = [plan.source_alias, plan.join_alias]
+        left_key, right_key, on_rest = join_keys(on, *aliases)
+        expr = join_conjuncts(split_conjuncts(expr) + split_conjuncts(on_rest))
+        side_exprs, residual = split_by_alias(expr, aliases)
+        # columns each source has to read; None for all of them (SELECT *)
+        columns: set[str] | None = None
+        aggregated: set[str] = {a.name for a in plan.aggregates}
+        if plan.columns:
+            columns = (
+                {c for c in plan.columns if c not in aggregated}
+                | set(plan.group_by)
+                | {a.column for a in plan.aggregates if a.column != "*"}
+                | referenced_columns(residual)
+            )
+            for key, _ in order_by:
+                columns |= referenced_columns(key) - aggregated
+        projections: dict[str, set[str] | None] = {alias: None for alias in aliases}
+        if columns is not None:
+            projections = {alias: set() for alias in aliases}
+            for column in columns:
+                alias, name = qualified(column, aliases)
+                projections[alias].add(name)
+        sides: list[JoinSide] = [
+            self.join_side(alias, source, key, side_exprs[alias], projections[alias])
+            for alias, source, key in zip(
+                aliases, (plan.source, plan.join_source), (left_key, right_key)
+            )
+        ]
+        join = make_join(sides[0], sides[1], left_key, right_key, PER_PAGE)
+        if isinstance(join, LookupJoin):
+            # looked up rows skip the listing filters, so the side's whole
+            # predicate is checked locally
+            target_expr: Expression | None = side_exprs[join.target.alias]
+            join.target.predicate = self.side_predicate(
+                target_expr, join.target.ctx.source_type
+            )
+            join.target.predicate_columns = referenced_columns(target_expr)
+        self.explain(
+            "scan",
+            f"{type(join).__name__} on {aliases[0]}.{left_key} = "
+            f"{aliases[1]}.{right_key}",
+        )
+        for side in join.sides():
+            estimate: int | str = "unknown"
+            if side.estimate is not None:
+                estimate = side.estimate
+            text: str = f"{side.alias} ({side.role}): {estimate} rows estimated"
+            if side.ctx.api_filters:
+                text += ", API filters " + ", ".join(
+                    f"{k}={v}" for k, v in side.ctx.api_filters.items()
+                )
+            if side_exprs[side.alias] is not None:
+                text += f", filter {describe(side_exprs[side.alias])}"
+            self.explain("scan", text)
+        self.ctx.set_join(join)
+        return residual
+
+    # Local predicate of a join side, ordered and counted like a scan's
+    def side_predicate(
+        self, expr: Expression | None, source_type: SourceType | None
+    ) -> Compiled | None:
+        check_columns(expr, source_type)
+        expensive: set[str] = EXPENSIVE_COLUMNS.get(source_type, set())
+        scope: str = source_type.name if source_type else "join"
+        return self.selectivity.compile(
+            self.selectivity.plan(expr, expensive, scope), scope
+        )
+
+    # One source of a join, its API filters pushed down and its size
+    # estimated to pick the join strategy
+    def join_side(
+        self,
+        alias: str,
+        source: Token,
+        key: str,
+        expr: Expression | None,
+        projection: set[str] | None,
+    ) -> JoinSide:
+        logger.info(f"Set join source {alias}: {source.value}")
+        ctx: Context = Context(self.session)
+        ctx.set_backend(self.backend)
+        ctx.set_mirror(self.mirror, self.mirror_max_age)
+        ctx.set_sources(source)
+        filters: dict = {}
+        residual: Expression | None = expr
+        if not ctx.use_mirror():
+            filters, residual = push_down(expr, ctx.source_type)
+        ctx.set_filters(filters)
+        if projection is not None:
+            projection = projection | {key} | referenced_columns(expr)
+        ctx.set_projection(projection)
+        side: JoinSide = JoinSide(
+            alias,
+            ctx,
+            self.side_predicate(residual, ctx.source_type),
+            referenced_columns(residual),
+        )
+        side.lookup_key = ctx.lookup_key()
+        side.estimate = ctx.estimate_rows()
+        if side.estimate is not None and not ctx.use_mirror():
+            side.estimate_calls = 1
+        return side
+
+    # Aggregates and GROUP BY: the source is scanned with the WHERE clause as
+    # usual, but selected rows are folded into a streaming hash aggregate and
+    # ORDER BY and LIMIT apply to the groups
+    def execute_aggregate(
+        self,
+        plan: Plan,
+        expr: Expression | None,
+        order_by: list[tuple[Expression, bool]],
+        limit: int | None,
+    ):
+        rows: list[Row]
+        count: int | None = self.fast_count(plan, expr)
+        if count is not None:
+            rows = [Record({a.name: count for a in plan.aggregates})]
+        else:
+            filters, expr = self.scan_filters(expr)
+            self.ctx.set_filters(filters)
+            # every matching row feeds a group
+            self.ctx.set_limit(sys.maxsize)
+            self.ctx.set_projection(
+                set(plan.group_by)
+                | {a.column for a in plan.aggregates if a.column != "*"}
+                | referenced_columns(expr)
+            )
+            grouping: str = ""
+            if plan.group_by:
+                grouping = f" grouped by {', '.join(plan.group_by)}"
+            self.explain(
+                "aggregate",
+                f"{', '.join(a.name for a in plan.aggregates)}{grouping}, hashed",
+            )
+            aggregate: HashAggregate = HashAggregate(plan.group_by, plan.aggregates)
+            self.ctx.set_sink(self.profiled("aggregate", aggregate.add))
+            self.scan(expr)
+            rows = aggregate.rows()
+            if self.profile is not None:
+                self.profile.operator("aggregate").rows_out = len(rows)
+        if order_by:
+            kept: str = f"top {limit}" if limit is not None else "all rows"
+            self.explain("sort", f"in memory, {kept} by {sort_keys(order_by)}")
+            sorter: TopK = TopK(
+                [(compile_expression(key), desc) for key, desc in order_by],
+                limit if limit is not None else len(rows),
+            )
+            with self.timed("sort") as stats:
+                for row in rows:
+                    sorter.push(row)
+                stats.rows_in = len(rows)
+                rows = sorter.result()
+                stats.rows_out = len(rows)
+        elif limit is not None:
+            rows = rows[:limit]
+        if limit is not None:
+            self.explain("limit", str(limit))
+        self.explain("output", self.output_description())
+        if self.planning_only():
+            return
+        if self.output == "table":
+            self.ctx.query_results.extend(rows)
+            return
+        self.writer = self.make_writer()
+        write: Callable[[Row], None] = self.profiled("output", self.writer.write)
+        for row in rows:
+            write(row)
+        self.writer.close()
+
+    # A plain COUNT(*) answered without listing rows: from the mirror, the
+    # listing's page count when every filter is pushed down, or the search
+    # API's total when the WHERE clause translates into search qualifiers.
+    # None when the rows have to be counted.
+    def fast_count(self, plan: Plan, expr: Expression | None) -> int | None:
+        strategy: tuple[str, Callable[[], int | None]] | None = self.count_strategy(
+            plan, expr
+        )
+        if strategy is None:
+            return None
+        source, count = strategy
+        if self.planning_only():
+            self.explain("aggregate", f"COUNT(*) from {source}")
+            return 0
+        with self.timed("aggregate") as stats:
+            result: int | None = count()
+        if result is not None:
+            self.explain("aggregate", f"COUNT(*) from {source}")
+            stats.rows_out = 1
+        return result
+
+    # Where fast_count gets its count from, and the call returning it
+    def count_strategy(
+        self, plan: Plan, expr: Expression | None
+    ) -> tuple[str, Callable[[], int | None]] | None:
+        if plan.group_by or self.ctx.repos or self.ctx.join is not None:
+            return None
+        if any(a.name != "COUNT(*)" for a in plan.aggregates):
+            return None
+        if self.ctx.use_mirror():
+            if expr is not None:
+                return None
+            return "the local mirror", self.ctx.mirror_count
+        filters, residual = push_down(expr, self.ctx.source_type)
+        if residual is None:
+            self.ctx.set_filters(filters)
+            return "the listing's page count", self.ctx.listing_count
+        qualifiers: list[str] | None = search_qualifiers(expr, self.ctx.source_type)
+        if qualifiers is not None:
+            return "the search API's total", partial(
+                self.ctx.search_count, qualifiers
+            )
+        return None
+
+    def run_rows(
+        self, cheap: Compiled | None, costly: Compiled | None, costly_columns: set[str]
+    ):
+        # without a costly part every row passing `cheap` is output unless
+        # sorting, so its detail columns can be fetched ahead as well
+        ahead: set[str] | None = costly_columns
+        if costly is None:
+            ahead = None if self.ctx.sorter is None else set()
+        while not self.ctx.done():
+            record: Row = self.ctx.current_record()
+            if cheap is None or cheap(record):
+                if self.ctx.needs_details(record, ahead):
+                    self.prefetch_details(cheap, ahead)
+                if costly is None or costly(record):
+                    self.ctx.select_current()
+                    continue
+            self.ctx.advance()
+
+    # Load detail columns for the next rows of the page passing `cheap` in
+    # one concurrent round, instead of a call per row. No more rows than the
+    # query can still select are fetched ahead.
+    def prefetch_details(self, cheap: Compiled | None, columns: set[str] | None):
+        window: int = min(self.ctx.fetch_concurrency(), self.ctx.wanted())
+        rows: list[Row] = list(
+            islice(
+                (r for r in self.ctx.current_page() if cheap is None or cheap(r)),
+                window,
+            )
+        )
+        self.ctx.load_details(rows, columns)
+
+    # Evaluate the cheap predicate over a whole page into a mask, then check
+    # the expensive part on the survivors only, their detail columns fetched
+    # concurrently a window at a time
+    def run_batches(
+        self,
+        cheap: BatchCompiled | None,
+        costly: Compiled | None,
+        costly_columns: set[str],
+    ):
+        while not self.ctx.done():
+            page: list[Row] = self.ctx.current_page()
+            if cheap is None:
+                survivors: list[Row] = page
+            else:
+                survivors = [page[i] for i in selected_indices(cheap(page))]
+            if costly is None:
+                self.ctx.select_page(survivors)
+                continue
+            wanted: int | float = self.ctx.wanted()
+            selected: list[Row] = []
+            start: int = 0
+            while start < len(survivors) and len(selected) < wanted:
+                window: int = min(self.ctx.fetch_concurrency(), wanted - len(selected))
+                rows: list[Row] = survivors[start : start + window]
+                self.ctx.load_details(rows, costly_columns)
+                selected.extend(record for record in rows if costly(record))
+                start += window
+            self.ctx.select_page(selected)
+
+    # One statement of a script: a backslash command or a query
+    def run_statement(self, statement: str):
+        if statement.startswith("\\"):
+            self.command(statement)
+            return
+        self.run_plan(self.prepare(statement))
 
     def run(self):
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.lexers import PygmentsLexer
+        from prompt_toolkit.styles.pygments import style_from_pygments_cls
+        from pygments.lexers.sql import SqlLexer
+        from pygments.styles import get_style_by_name
+
+        session: PromptSession = PromptSession(
+            lexer=PygmentsLexer(SqlLexer),
+            style=style_from_pygments_cls(get_style_by_name("manni")),
+        )
         logger.info("GitQL execution started.")
         while True:
             try:
-                query: str = self.session.prompt("GitQL> ")
+                query: str = session.prompt("GitQL> ")
                 if len(query) == 0:
                     logger.info("Exiting GitQL.")
                     break
+                if query.startswith("\\"):
+                    try:
+                        self.command(query)
+                    except RuntimeError as e:
+                        print(e)
+                    continue
 
-                s_time = time.time()
                 logger.debug("Processing query.")
-                self.initialize(query)
-                expr: Expression = self.parser.parse()
-                self.ctx.populate()
-                while not self.ctx.done():
-                    can_select: bool = expr.eval(self.ctx) if expr != None else True
-                    if can_select:
-                        self.ctx.select_current()
-                    else:
-                        self.ctx.advance()
-
-                self.print(time.time() - s_time)
-                self.reset()
+                self.run_plan(self.prepare(query))
             except (KeyboardInterrupt, EOFError):
                 logger.info("Exiting GitQL.")
                 break
 
 
-# Start the GitQL instance
-gQL: GitQL = GitQL()
+# Statements of a script. A backslash command takes one line; a query runs to
+# a line ending in `;`, a blank line or a command. Lines starting with `--`
+# are comments.
+def split_statements(text: str) -> list[str]:
+    statements: list[str] = []
+    lines: list[str] = []
+    for line in text.splitlines():
+        stripped: str = line.strip()
+        if stripped.startswith("--"):
+            continue
+        if stripped.startswith("\\"):
+            if lines:
+                statements.append("\n".join(lines))
+                lines = []
+            statements.append(stripped)
+            continue
+        if stripped:
+            lines.append(stripped)
+        if lines and (not stripped or stripped.endswith(";")):
+            statements.append("\n".join(lines))
+            lines = []
+    if lines:
+        statements.append("\n".join(lines))
+    return statements
+
+
+# Log to context.log, and at the prompt to the console too; scripts only
+# print warnings there, leaving their output to the results
+def configure_logging(interactive: bool):
+    console: logging.Handler = logging.StreamHandler()
+    if not interactive:
+        console.setLevel(logging.WARNING)
+    telemetry.configure_logging([logging.FileHandler("context.log"), console])
+
+
+def parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="gitql",
+        description="Query GitHub with SQL. Without -e or -f, start the prompt.",
+    )
+    # -e and -f share a list, so statements run in the order given
+    parser.add_argument(
+        "-e",
+        "--execute",
+        dest="statements",
+        action="append",
+        metavar="QUERY",
+        help="run a query or backslash command, then exit",
+    )
+    parser.add_argument(
+        "-f",
+        "--file",
+        dest="statements",
+        action="append",
+        type=argparse.FileType("r"),
+        metavar="SCRIPT",
+        help="run the statements of a script file, - for stdin, then exit",
+    )
+    return parser.parse_args(argv)
+
+
+# Entry point. Queries given with -e and -f run in order and the first error
+# ends the run with exit status 1; the prompt only starts without either.
+def main(argv: list[str] | None = None) -> int:
+    args: argparse.Namespace = parse_args(argv)
+    interactive: bool = args.statements is None
+    configure_logging(interactive)
+    gitql: GitQL = GitQL()
+    if interactive:
+        gitql.run()
+        return 0
+    try:
+        for source in args.statements:
+            if isinstance(source, str):
+                statements: list[str] = [source.strip()]
+            else:
+                with source:
+                    statements = split_statements(source.read())
+            for statement in statements:
+                gitql.run_statement(statement)
+    # TokenizationException is a RuntimeError; OSError also covers files
+    # that can't be opened and requests' connection errors
+    except (RuntimeError, OSError, GithubException) as e:
+        print(f"gitql: {e}", file=sys.stderr)
+        return 1
+    return 0
+
 
-gQL.run()
+if __name__ == "__main__":
+    sys.exit(main())
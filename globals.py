@@ -1,3 +1,15 @@
+from enum import Enum
+
+
+class SourceType(Enum):
+    USER = 0
+    REPO = 1
+    ISSUES = 2
+    PULL_REQUESTS = 3
+    COMMITS = 4
+    USER_REPOS = 5
+
+
 inner_entities = {
     "issues": [
         "label",
@@ -0,0 +1,330 @@
+import logging
+from collections.abc import Callable
+from github.Requester import Requester
+from globals import SourceType
+
+
+logger = logging.getLogger(__name__)
+
+
+PER_PAGE: int = 100
+
+
+def _date(value: str | None) -> str:
+    # 2024-01-31T12:00:00Z -> 2024-01-31 12:00:00, the format REST records use
+    return value[:19].replace("T", " ") if value else "N/A"
+
+
+def _login(actor: dict | None, default: str = "N/A") -> str:
+    return actor["login"] if actor else default
+
+
+def _closed_by(node: dict) -> str:
+    events: list[dict] = node["timelineItems"]["nodes"]
+    return _login(events[-1].get("actor")) if events else "N/A"
+
+
+def _head(node: dict) -> str:
+    owner: dict | None = node["headRepositoryOwner"]
+    return f"{owner['login']}:{node['headRefName']}" if owner else node["headRefName"]
+
+
+# column -> (selection set, value extractor) for every source the backend supports
+FIELDS: dict[SourceType, dict[str, tuple[str, Callable[[dict], object]]]] = {
+    SourceType.ISSUES: {
+        "id": ("databaseId", lambda n: n["databaseId"]),
+        "number": ("number", lambda n: n["number"]),
+        "title": ("title", lambda n: n["title"]),
+        "body": ("body", lambda n: n["body"]),
+        "state": ("state", lambda n: n["state"].lower()),
+        "milestone": (
+            "milestone { title }",
+            lambda n: n["milestone"]["title"] if n["milestone"] else "N/A",
+        ),
+        "labels": (
+            "labels(first: 100) { nodes { name } }",
+            lambda n: [label["name"] for label in n["labels"]["nodes"]],
+        ),
+        "user": ("author { login }", lambda n: _login(n["author"])),
+        "assignee": (
+            "assignees(first: 1) { nodes { login } }",
+            lambda n: _login(next(iter(n["assignees"]["nodes"]), None)),
+        ),
+        "created_at": ("createdAt", lambda n: _date(n["createdAt"])),
+        "updated_at": ("updatedAt", lambda n: _date(n["updatedAt"])),
+        "closed_at": ("closedAt", lambda n: _date(n["closedAt"])),
+        "closed_by": (
+            "timelineItems(itemTypes: [CLOSED_EVENT], last: 1) "
+            "{ nodes { ... on ClosedEvent { actor { login } } } }",
+            _closed_by,
+        ),
+    },
+    SourceType.PULL_REQUESTS: {
+        "id": ("databaseId", lambda n: n["databaseId"]),
+        "number": ("number", lambda n: n["number"]),
+        "title": ("title", lambda n: n["title"]),
+        "state": (
+            "state",
+            lambda n: "open" if n["state"] == "OPEN" else "closed",
+        ),
+        "milestone": (
+            "milestone { title }",
+            lambda n: n["milestone"]["title"] if n["milestone"] else "N/A",
+        ),
+        "user": ("author { login }", lambda n: _login(n["author"])),
+        "base": ("baseRefName", lambda n: n["baseRefName"]),
+        "head": ("headRefName headRepositoryOwner { login }", _head),
+        "created_at": ("createdAt", lambda n: _date(n["createdAt"])),
+        "updated_at": ("updatedAt", lambda n: _date(n["updatedAt"])),
+        "merged": ("merged", lambda n: "true" if n["merged"] else "false"),
+        "merged_at": ("mergedAt", lambda n: _date(n["mergedAt"])),
+        "changed_files": ("changedFiles", lambda n: n["changedFiles"]),
+        "merged_by": ("mergedBy { login }", lambda n: _login(n["mergedBy"], "None")),
+    },
+    SourceType.COMMITS: {
+        "sha": ("oid", lambda n: n["oid"]),
+        "author": (
+            "author { user { login } }",
+            lambda n: _login(n["author"]["user"]),
+        ),
+        # the author date, like the date of REST commit records
+        "date": ("authoredDate", lambda n: _date(n["authoredDate"])),
+    },
+    SourceType.USER_REPOS: {
+        "id": ("databaseId", lambda n: n["databaseId"]),
+        "name": ("name", lambda n: n["name"]),
+        "open_issues_count": (
+            "issues(states: [OPEN]) { totalCount }",
+            lambda n: n["issues"]["totalCount"],
+        ),
+        "private": ("isPrivate", lambda n: n["isPrivate"]),
+        "created_at": ("createdAt", lambda n: _date(n["createdAt"])),
+        "description": ("description", lambda n: n["description"]),
+        "forks_count": ("forkCount", lambda n: n["forkCount"]),
+        "full_name": ("nameWithOwner", lambda n: n["nameWithOwner"]),
+        "languages": (
+            "languages(first: 100) { edges { size node { name } } }",
+            lambda n: {e["node"]["name"]: e["size"] for e in n["languages"]["edges"]},
+        ),
+        "topics": (
+            "repositoryTopics(first: 100) { nodes { topic { name } } }",
+            lambda n: [t["topic"]["name"] for t in n["repositoryTopics"]["nodes"]],
+        ),
+    },
+}
+
+# Columns every page needs regardless of the projection
+KEY_COLUMNS: dict[SourceType, str] = {
+    SourceType.ISSUES: "number",
+    SourceType.PULL_REQUESTS: "number",
+    SourceType.COMMITS: "sha",
+    SourceType.USER_REPOS: "full_name",
+}
+
+PAGE_INFO: str = "pageInfo { hasNextPage endCursor }"
+
+# REST `sort` values -> GraphQL order fields
+ORDER_FIELDS: dict[str, str] = {
+    "created": "CREATED_AT",
+    "updated": "UPDATED_AT",
+    "full_name": "NAME",
+}
+
+# The issues connection leaves pull requests out, unlike the REST issues
+# listing and an issue search (see planner.SEARCH_SCOPES), so issue queries
+# read fewer rows over this backend
+QUERIES: dict[SourceType, str] = {
+    SourceType.ISSUES: """
+query($owner: String!, $name: String!, $first: Int!, $after: String,
+      $states: [IssueState!], $labels: [String!], $filterBy: IssueFilters,
+      $orderBy: IssueOrder = {field: CREATED_AT, direction: DESC}) {
+  repository(owner: $owner, name: $name) {
+    connection: issues(first: $first, after: $after, states: $states,
+        labels: $labels, filterBy: $filterBy, orderBy: $orderBy) {
+      %s
+      nodes { %s }
+    }
+  }
+}""",
+    SourceType.PULL_REQUESTS: """
+query($owner: String!, $name: String!, $first: Int!, $after: String,
+      $states: [PullRequestState!], $base: String, $head: String,
+      $orderBy: IssueOrder = {field: CREATED_AT, direction: DESC}) {
+  repository(owner: $owner, name: $name) {
+    connection: pullRequests(first: $first, after: $after, states: $states,
+        baseRefName: $base, headRefName: $head, orderBy: $orderBy) {
+      %s
+      nodes { %s }
+    }
+  }
+}""",
+    SourceType.COMMITS: """
+query($owner: String!, $name: String!, $first: Int!, $after: String,
+      $since: GitTimestamp, $until: GitTimestamp, $path: String,
+      $author: CommitAuthor) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          connection: history(first: $first, after: $after, since: $since,
+              until: $until, path: $path, author: $author) {
+            %s
+            nodes { %s }
+          }
+        }
+      }
+    }
+  }
+}""",
+    SourceType.USER_REPOS: """
+query($owner: String!, $first: Int!, $after: String,
+      $orderBy: RepositoryOrder = {field: NAME, direction: ASC}) {
+  repository: user(login: $owner) {
+    connection: repositories(first: $first, after: $after,
+        ownerAffiliations: [OWNER], orderBy: $orderBy) {
+      %s
+      nodes { %s }
+    }
+  }
+}""",
+}
+
+
+def columns_for(source_type: SourceType, projection: set[str] | None) -> list[str]:
+    fields = FIELDS[source_type]
+    if projection is None:
+        return list(fields.keys())
+    key: str = KEY_COLUMNS[source_type]
+    return [col for col in fields if col in projection or col == key]
+
+
+def build_query(source_type: SourceType, columns: list[str]) -> str:
+    selection: str = " ".join(FIELDS[source_type][col][0] for col in columns)
+    return QUERIES[source_type] % (PAGE_INFO, selection)
+
+
+# Translate pushed-down REST listing parameters into query variables. The
+# milestone must already be resolved to a Milestone, and `user_id` maps a
+# login to its node id for the commit author filter.
+def build_variables(
+    source_type: SourceType,
+    owner: str,
+    name: str | None,
+    params: dict,
+    user_id: Callable[[str], str],
+) -> dict:
+    variables: dict = {"owner": owner, "name": name}
+    match source_type:
+        case SourceType.ISSUES:
+            if params.get("state", "all") != "all":
+                variables["states"] = [params["state"].upper()]
+            if "labels" in params:
+                # matches issues with any of the labels; GraphQLCursor checks
+                # that they have all of them, as REST's `labels` does
+                variables["labels"] = params["labels"]
+            filter_by: dict = {}
+            if "milestone" in params:
+                filter_by["milestone"] = str(params["milestone"].number)
+            if "assignee" in params:
+                filter_by["assignee"] = params["assignee"]
+            if "creator" in params:
+                filter_by["createdBy"] = params["creator"]
+            if "since" in params:
+                filter_by["since"] = params["since"].strftime("%Y-%m-%dT%H:%M:%SZ")
+            if filter_by:
+                variables["filterBy"] = filter_by
+        case SourceType.PULL_REQUESTS:
+            match params.get("state", "all"):
+                case "open":
+                    variables["states"] = ["OPEN"]
+                case "closed":
+                    variables["states"] = ["CLOSED", "MERGED"]
+            if "base" in params:
+                variables["base"] = params["base"]
+            if "head" in params:
+                # REST filters on owner:ref, GraphQL on the bare ref name
+                variables["head"] = params["head"].split(":")[-1]
+        case SourceType.COMMITS:
+            for bound in ("since", "until"):
+                if bound in params:
+                    variables[bound] = params[bound].strftime("%Y-%m-%dT%H:%M:%SZ")
+            if "path" in params:
+                variables["path"] = params["path"]
+            if "author" in params:
+                author: str = params["author"]
+                variables["author"] = (
+                    {"emails": [author]} if "@" in author else {"id": user_id(author)}
+                )
+        case SourceType.USER_REPOS:
+            del variables["name"]
+    if "sort" in params:
+        variables["orderBy"] = {
+            "field": ORDER_FIELDS[params["sort"]],
+            "direction": params.get("direction", "desc").upper(),
+        }
+    return variables
+
+
+# Cursor over one GraphQL connection, fetching a page of 100 nodes per request
+# with only the fields of the projected columns
+class GraphQLCursor:
+    def __init__(
+        self,
+        requester: Requester,
+        source_type: SourceType,
+        variables: dict,
+        projection: set[str] | None,
+        head: str | None = None,
+        labels: list[str] | None = None,
+    ):
+        self.requester: Requester = requester
+        self.source_type: SourceType = source_type
+        self.variables: dict = variables
+        self.columns: list[str] = columns_for(source_type, projection)
+        # the REST head filter is owner:ref while GraphQL only matches the ref,
+        # so the owner is checked on the returned nodes
+        self.head: str | None = head if head and ":" in head else None
+        if self.head is not None and "head" not in self.columns:
+            self.columns.append("head")
+        # `labels:` matches any of several labels, so each node is checked
+        # for all of them
+        self.labels: list[str] | None = labels if labels and len(labels) > 1 else None
+        if self.labels is not None and "labels" not in self.columns:
+            self.columns.append("labels")
+        self.query: str = build_query(source_type, self.columns)
+        self.after: str | None = None
+        self.has_next_page: bool = True
+        self.pages: int = 0
+
+    def has_next(self) -> bool:
+        return self.has_next_page
+
+    # Nodes of the next page. Nodes failing the local checks are dropped, and
+    # pages are requested until a page's worth pass or the connection ends.
+    def next_page(self) -> list[dict]:
+        nodes: list[dict] = []
+        while self.has_next_page and len(nodes) < PER_PAGE:
+            variables: dict = dict(self.variables, first=PER_PAGE, after=self.after)
+            _, data = self.requester.graphql_query(self.query, variables)
+            root: dict = data["data"]["repository"]
+            if self.source_type == SourceType.COMMITS:
+                root = root["defaultBranchRef"]["target"]
+            connection: dict = root["connection"]
+            self.after = connection["pageInfo"]["endCursor"]
+            self.has_next_page = connection["pageInfo"]["hasNextPage"]
+            self.pages += 1
+            logger.debug(f"Fetched GraphQL page {self.pages}")
+            nodes.extend(node for node in connection["nodes"] if self._matches(node))
+        return nodes
+
+    def _matches(self, node: dict) -> bool:
+        if self.head is not None and _head(node) != self.head:
+            return False
+        if self.labels is not None:
+            names: set[str] = {label["name"] for label in node["labels"]["nodes"]}
+            return all(label in names for label in self.labels)
+        return True
+
+    def values(self, node: dict) -> dict:
+        fields = FIELDS[self.source_type]
+        return {col: fields[col][1](node) for col in self.columns}
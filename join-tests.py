@@ -0,0 +1,159 @@
+import unittest
+from join import HashJoin, JoinSide, JoinedRecord, LookupJoin, make_join
+from records import Loader, record_type
+
+
+Row = record_type("Row", ["number", "title", "details"])
+
+
+# Stand-in for a side's Context: `rows` in pages of `size`, `details` loaded
+# through a loader counting its calls
+class FakeContext:
+    def __init__(self, rows: list[dict], size: int = 2):
+        self.calls: int = 0
+        self.lookups: list[list] = []
+        self.loader: Loader = Loader(self.load_detail, {"details"})
+        self.rows: list = [Row(row, self.loader) for row in rows]
+        self.size: int = size
+        self.read: int = 0
+        self.exhausted: bool = False
+        self.closed: bool = False
+
+    def load_detail(self, record, column: str):
+        self.calls += 1
+        return f"details of {record.get('number')}"
+
+    def read_page(self) -> list:
+        page: list = self.rows[self.read : self.read + self.size]
+        self.read += len(page)
+        self.exhausted = self.read >= len(self.rows)
+        return page
+
+    def pages_fetched(self) -> int:
+        return -(-self.read // self.size)
+
+    def needs_details(self, record, columns) -> bool:
+        wanted: set[str] = {"details"} if columns is None else {"details"} & columns
+        return not all(record.is_loaded(column) for column in wanted)
+
+    def load_details(self, records: list, columns=None):
+        for record in records:
+            if self.needs_details(record, columns):
+                record.get("details")
+
+    def lookup(self, keys: list) -> dict:
+        self.lookups.append(keys)
+        return {row.get("number"): row for row in self.rows if row.get("number") in keys}
+
+    def close(self):
+        self.closed = True
+
+
+def side(alias: str, numbers: list[int], predicate=None) -> JoinSide:
+    return JoinSide(
+        alias,
+        FakeContext([{"number": n, "title": f"{alias}{n}"} for n in numbers]),
+        predicate,
+        set(),
+    )
+
+
+def read_all(join) -> list:
+    rows: list = []
+    while join.has_next():
+        rows.extend(join.next_page())
+    return rows
+
+
+class TestHashJoin(unittest.TestCase):
+    def test_matches(self):
+        left, right = side("p", [1, 2, 3, 4]), side("i", [2, 4, 4, 5])
+        rows = read_all(HashJoin(left, right, "number", "number", 2, build=right))
+        self.assertEqual(
+            [(r.get("p.title"), r.get("i.title")) for r in rows],
+            [("p2", "i2"), ("p4", "i4"), ("p4", "i4")],
+        )
+        self.assertEqual(list(rows[0].keys())[:2], ["p.number", "p.title"])
+        usage = right.usage()
+        self.assertEqual(usage["role"], "build")
+        self.assertEqual(usage["table_rows"], 4)
+        self.assertGreater(usage["table_bytes"], 0)
+        self.assertEqual(left.usage()["api_calls"], 2)
+
+    def test_side_predicates(self):
+        left = side("p", [1, 2, 3, 4], lambda r: r.get("number") > 2)
+        right = side("i", [1, 2, 3, 4])
+        rows = read_all(HashJoin(left, right, "number", "number", 10, build=left))
+        self.assertEqual([r.get("i.number") for r in rows], [3, 4])
+        self.assertEqual((left.rows_in, left.rows_out), (4, 2))
+
+    def test_pages_are_filled(self):
+        left, right = side("p", list(range(10))), side("i", list(range(10)))
+        join = HashJoin(left, right, "number", "number", 5, build=right)
+        self.assertEqual(len(join.next_page()), 6)
+
+    def test_close_closes_both_sides(self):
+        left, right = side("p", [1]), side("i", [1])
+        join = HashJoin(left, right, "number", "number", 2, build=right)
+        join.close()
+        self.assertFalse(join.has_next())
+        self.assertTrue(left.ctx.closed and right.ctx.closed)
+
+
+class TestLookupJoin(unittest.TestCase):
+    def test_distinct_keys_are_looked_up_once(self):
+        left, right = side("p", [1, 1, 2, 9, 2]), side("i", [1, 2, 3])
+        join = LookupJoin(left, right, "number", "number", 2, target=right)
+        rows = read_all(join)
+        self.assertEqual([r.get("i.number") for r in rows], [1, 1, 2, 2])
+        self.assertEqual(right.ctx.lookups, [[1], [2, 9]])
+        self.assertEqual(right.usage()["api_calls"], 3)
+        self.assertEqual(right.ctx.read, 0)
+
+    def test_lookup_side_predicate(self):
+        left = side("p", [1, 2])
+        right = side("i", [1, 2], lambda r: r.get("number") == 2)
+        rows = read_all(LookupJoin(left, right, "number", "number", 2, target=right))
+        self.assertEqual([r.get("p.number") for r in rows], [2])
+
+
+class TestJoinedRecord(unittest.TestCase):
+    def test_details_load_from_their_side(self):
+        left, right = side("p", [1]), side("i", [1])
+        record = JoinedRecord([(left, left.ctx.rows[0]), (right, right.ctx.rows[0])])
+        self.assertIn("i.details", record)
+        self.assertFalse(record.is_loaded("i.details"))
+        join = HashJoin(left, right, "number", "number", 2, build=right)
+        self.assertTrue(join.needs_details(record, {"i.details"}))
+        join.load_details([record, record], {"i.details"})
+        self.assertEqual((left.ctx.calls, right.ctx.calls), (0, 1))
+        self.assertFalse(join.needs_details(record, {"i.details"}))
+        self.assertEqual(record.get("i.details"), "details of 1")
+        self.assertEqual(right.ctx.calls, 1)
+
+
+class TestMakeJoin(unittest.TestCase):
+    def test_builds_on_the_smaller_side(self):
+        left, right = side("p", []), side("i", [])
+        left.estimate, right.estimate = 10, 500
+        join = make_join(left, right, "number", "number", 100)
+        self.assertIsInstance(join, HashJoin)
+        self.assertIs(join.build, left)
+
+    def test_unknown_sizes_build_on_the_right(self):
+        left, right = side("p", []), side("i", [])
+        self.assertIs(make_join(left, right, "number", "number", 100).build, right)
+
+    def test_looks_up_a_large_keyed_side(self):
+        left, right = side("p", []), side("i", [])
+        left.estimate, right.estimate = 3, 5000
+        right.lookup_key = "number"
+        join = make_join(left, right, "number", "number", 100)
+        self.assertIsInstance(join, LookupJoin)
+        self.assertIs(join.target, right)
+        # not keyed by the join column
+        self.assertIsInstance(make_join(left, right, "number", "id", 100), HashJoin)
+
+
+if __name__ == "__main__":
+    unittest.main()
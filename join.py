@@ -0,0 +1,300 @@
+import logging
+import sys
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+from functools import partial
+from records import Record, Row
+
+
+logger = logging.getLogger(__name__)
+
+
+# A predicate compiled against one side's records
+Predicate = Callable[[Row], object]
+
+
+# One input of a join: a context reading its source page by page, with the
+# side's local predicate. Counts what the side cost for the query stats.
+class JoinSide:
+    def __init__(
+        self,
+        alias: str,
+        ctx,
+        predicate: Predicate | None,
+        predicate_columns: set[str],
+    ):
+        self.alias: str = alias
+        self.ctx = ctx
+        self.predicate: Predicate | None = predicate
+        self.predicate_columns: set[str] = predicate_columns
+        self.role: str = "probe"
+        # rows the source lists, None when unknown (fan-out sources)
+        self.estimate: int | None = None
+        # column the source's rows can be fetched by, see Context.lookup
+        self.lookup_key: str | None = None
+        self.rows_in: int = 0
+        self.rows_out: int = 0
+        self.lookups: int = 0
+        self.estimate_calls: int = 0
+        self.table_rows: int = 0
+        self.table_bytes: int = 0
+
+    def keep(self, rows: list[Row]) -> list[Row]:
+        self.rows_in += len(rows)
+        if self.predicate is not None:
+            # detail columns the predicate reads, fetched concurrently
+            self.ctx.load_details(rows, self.predicate_columns)
+            rows = [row for row in rows if self.predicate(row)]
+        self.rows_out += len(rows)
+        return rows
+
+    # Rows of the next page passing the side's predicate; None once the
+    # source is exhausted
+    def next_rows(self) -> list[Row] | None:
+        page: list[Row] = self.ctx.read_page()
+        if not page and self.ctx.exhausted:
+            return None
+        return self.keep(page)
+
+    def api_calls(self) -> int:
+        return self.ctx.pages_fetched() + self.lookups + self.estimate_calls
+
+    def usage(self) -> dict:
+        return {
+            "alias": self.alias,
+            "role": self.role,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "api_calls": self.api_calls(),
+            "table_rows": self.table_rows,
+            "table_bytes": self.table_bytes,
+        }
+
+    def close(self):
+        self.ctx.close()
+
+
+# Join keys compare with ==; lists (labels) become tuples so they can be
+# hashed, and missing values never match
+def _key(value):
+    if value is None:
+        return None
+    if type(value) is list:
+        return tuple(value)
+    return value
+
+
+def _size(record: Row) -> int:
+    return sys.getsizeof(record) + sum(
+        sys.getsizeof(value) for value in record.as_dict().values()
+    )
+
+
+# A joined row: every column of both sides under `alias.column`. Detail
+# columns not loaded yet stay lazy and load from their side's record, which
+# is kept so a page of joined rows can have them loaded together.
+class JoinedRecord(Record):
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: list[tuple[JoinSide, Row]]):
+        values: dict = {}
+        loaders: dict[str, Callable] = {}
+        for side, record in parts:
+            for column in record.keys():
+                name: str = f"{side.alias}.{column}"
+                if record.is_loaded(column):
+                    values[name] = record.get(column)
+                else:
+                    loaders[name] = partial(record.get, column)
+        super().__init__(values, loaders)
+        self.parts: list[tuple[JoinSide, Row]] = parts
+
+
+# Equi-join of two sources read as a cursor of joined records, so WHERE,
+# ORDER BY and LIMIT over joined rows run like over any source. Pages hold at
+# least `page_size` rows except the last, like the other cursors.
+class JoinCursor(ABC):
+    def __init__(
+        self,
+        left: JoinSide,
+        right: JoinSide,
+        left_key: str,
+        right_key: str,
+        page_size: int,
+    ):
+        self.left: JoinSide = left
+        self.right: JoinSide = right
+        self.keys: dict[str, str] = {left.alias: left_key, right.alias: right_key}
+        self.page_size: int = page_size
+        self.closed: bool = False
+        self.done: bool = False
+
+    @property
+    def pages(self) -> int:
+        return self.left.ctx.pages_fetched() + self.right.ctx.pages_fetched()
+
+    def has_next(self) -> bool:
+        return not self.closed and not self.done
+
+    def key(self, side: JoinSide, record: Row):
+        return _key(record.get(self.keys[side.alias]))
+
+    # Joined rows in left, right column order whichever side was probed
+    def combine(self, probe: JoinSide, row: Row, other: JoinSide, match: Row):
+        if probe is self.left:
+            return JoinedRecord([(probe, row), (other, match)])
+        return JoinedRecord([(other, match), (probe, row)])
+
+    # Unqualified names of the qualified `columns` read from `side`
+    def _side_columns(
+        self, side: JoinSide, columns: set[str] | None
+    ) -> set[str] | None:
+        if columns is None:
+            return None
+        prefix: str = f"{side.alias}."
+        return {c[len(prefix) :] for c in columns if c.startswith(prefix)}
+
+    # Counterparts of Context.needs_details and load_details for joined
+    # rows: each side loads the detail columns of its own records. Other
+    # rows (e.g. groups of an aggregate) have nothing to load.
+    def needs_details(self, record: Row, columns: set[str] | None) -> bool:
+        return isinstance(record, JoinedRecord) and any(
+            side.ctx.needs_details(part, self._side_columns(side, columns))
+            for side, part in record.parts
+        )
+
+    def load_details(self, records: list[Row], columns: set[str] | None):
+        records = [r for r in records if isinstance(r, JoinedRecord)]
+        for i, side in enumerate(self.sides()):
+            parts: list[Row] = list(
+                {id(r.parts[i][1]): r.parts[i][1] for r in records}.values()
+            )
+            side.ctx.load_details(parts, self._side_columns(side, columns))
+
+    # Joined rows for one page of probe rows, or None when the probe side
+    # is exhausted
+    @abstractmethod
+    def _join_page(self) -> list[Row] | None:
+        pass
+
+    def next_page(self) -> list[Row]:
+        rows: list[Row] = []
+        while not self.closed and not self.done and len(rows) < self.page_size:
+            page: list[Row] | None = self._join_page()
+            if page is None:
+                self.done = True
+                break
+            rows.extend(page)
+        return rows
+
+    def sides(self) -> list[JoinSide]:
+        return [self.left, self.right]
+
+    def close(self):
+        self.closed = True
+        self.left.close()
+        self.right.close()
+
+
+# Reads the whole build side into a hash table keyed by the join column, then
+# streams the probe side through it
+class HashJoin(JoinCursor):
+    def __init__(self, left, right, left_key, right_key, page_size, build: JoinSide):
+        super().__init__(left, right, left_key, right_key, page_size)
+        self.build: JoinSide = build
+        self.probe: JoinSide = right if build is left else left
+        self.build.role = "build"
+        self.table: dict | None = None
+
+    def _build(self):
+        logger.info(f"Building join hash table from {self.build.alias}")
+        self.table = {}
+        while not self.closed:
+            rows: list[Row] | None = self.build.next_rows()
+            if rows is None:
+                break
+            for row in rows:
+                key = self.key(self.build, row)
+                if key is None:
+                    continue
+                self.table.setdefault(key, []).append(row)
+                self.build.table_rows += 1
+                self.build.table_bytes += _size(row)
+        logger.info(
+            f"Join hash table holds {self.build.table_rows} rows "
+            f"in {len(self.table)} keys"
+        )
+
+    def _join_page(self) -> list[Row] | None:
+        if self.table is None:
+            self._build()
+        rows: list[Row] | None = self.probe.next_rows()
+        if rows is None:
+            return None
+        result: list[Row] = []
+        for row in rows:
+            for match in self.table.get(self.key(self.probe, row), ()):
+                result.append(self.combine(self.probe, row, self.build, match))
+        return result
+
+
+# Streams the probe side and fetches the matching rows of the other side by
+# key, a page of distinct keys at a time, instead of listing it. Used when
+# the other side is keyed by the join column and has far more rows.
+class LookupJoin(JoinCursor):
+    def __init__(self, left, right, left_key, right_key, page_size, target: JoinSide):
+        super().__init__(left, right, left_key, right_key, page_size)
+        self.target: JoinSide = target
+        self.probe: JoinSide = right if target is left else left
+        self.target.role = "lookup"
+        # rows already fetched by key, None when there is none
+        self.found: dict = {}
+
+    def _join_page(self) -> list[Row] | None:
+        rows: list[Row] | None = self.probe.next_rows()
+        if rows is None:
+            return None
+        keys: list = list(
+            dict.fromkeys(
+                key
+                for key in (self.key(self.probe, row) for row in rows)
+                if key is not None and key not in self.found
+            )
+        )
+        if keys:
+            self.target.lookups += len(keys)
+            fetched: dict = self.target.ctx.lookup(keys)
+            for key in keys:
+                record: Row | None = fetched.get(key)
+                kept: list[Row] = (
+                    self.target.keep([record]) if record is not None else []
+                )
+                self.found[key] = kept[0] if kept else None
+        result: list[Row] = []
+        for row in rows:
+            match: Row | None = self.found.get(self.key(self.probe, row))
+            if match is not None:
+                result.append(self.combine(self.probe, row, self.target, match))
+        return result
+
+
+# Look the rows of a side keyed by the join column up when the other side has
+# fewer rows than the keyed side has pages, one call per key costing less than
+# listing it. Otherwise hash join, building on the side known to be smaller.
+def make_join(
+    left: JoinSide, right: JoinSide, left_key: str, right_key: str, page_size: int
+) -> JoinCursor:
+    for target, probe, key in ((right, left, right_key), (left, right, left_key)):
+        if (
+            target.lookup_key == key
+            and target.estimate is not None
+            and probe.estimate is not None
+            and probe.estimate < target.estimate / page_size
+        ):
+            return LookupJoin(left, right, left_key, right_key, page_size, target)
+    build: JoinSide = right
+    if left.estimate is not None and (
+        right.estimate is None or left.estimate < right.estimate
+    ):
+        build = left
+    return HashJoin(left, right, left_key, right_key, page_size, build)
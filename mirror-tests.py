@@ -0,0 +1,146 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from github import Github
+import transport
+from globals import SourceType
+from mirror import DATE_FORMAT, Mirror
+
+
+def item(number: int, updated: int) -> dict:
+    return {
+        "number": number,
+        "sha": f"{number:040x}",
+        "updated_at": f"2024-01-01T00:{updated:02d}:00Z",
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    issues: list[dict] = []
+    commits: list[dict] = []
+    requests: list[str] = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query: dict = {k: v[0] for k, v in parse_qs(url.query).items()}
+        StubHandler.requests.append(self.path)
+        host: str = self.headers["Host"]
+        if url.path == "/repos/a/b":
+            self.reply({"full_name": "a/b", "url": f"http://{host}/repos/a/b"})
+            return
+        if url.path.endswith("/commits"):
+            items: list[dict] = StubHandler.commits
+        else:
+            items = sorted(
+                StubHandler.issues,
+                key=lambda i: i["updated_at"],
+                reverse=query.get("direction") == "desc",
+            )
+            if "since" in query:
+                items = [i for i in items if i["updated_at"] >= query["since"]]
+        page: int = int(query.get("page", 1))
+        per_page: int = int(query.get("per_page", 30))
+        link: str | None = None
+        if page * per_page < len(items):
+            query["page"] = str(page + 1)
+            next_query: str = "&".join(f"{k}={v}" for k, v in query.items())
+            link = f'<http://{host}{url.path}?{next_query}>; rel="next"'
+        self.reply(items[(page - 1) * per_page : page * per_page], link)
+
+    def reply(self, payload, link: str | None = None):
+        body: bytes = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        if link is not None:
+            self.send_header("Link", link)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def issue_values(issue) -> dict:
+    return {
+        "number": issue.number,
+        "updated_at": issue.updated_at.strftime(DATE_FORMAT),
+    }
+
+
+def commit_values(commit) -> dict:
+    return {"sha": commit.sha, "date": commit.sha}
+
+
+class TestMirror(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        transport.install(None)
+        host, port = cls.server.server_address
+        cls.git = Github(base_url=f"http://{host}:{port}", per_page=2, retry=None)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        StubHandler.issues = [item(n, n) for n in range(1, 6)]
+        StubHandler.commits = [item(n, 0) for n in range(5, 0, -1)]
+        StubHandler.requests.clear()
+        self.mirror = Mirror(":memory:")
+        self.repo = self.git.get_repo("a/b")
+
+    def sync(self, source_type: SourceType, values) -> int:
+        return self.mirror.sync(self.repo, source_type, values)
+
+    def read(self, source_type: SourceType) -> list[dict]:
+        cursor = self.mirror.cursor("A/B", source_type)
+        rows: list[dict] = []
+        while cursor.has_next():
+            rows.extend(cursor.next_page())
+        return rows
+
+    def test_issue_sync_asks_for_changes_since_the_last_one(self):
+        self.assertEqual(self.sync(SourceType.ISSUES, issue_values), 5)
+        self.assertEqual(
+            self.mirror.mark("a/b", SourceType.ISSUES), "2024-01-01 00:05:00"
+        )
+        StubHandler.issues[1] = item(2, 9)
+        StubHandler.requests.clear()
+        # the updated issue and the one at the mark itself
+        self.assertEqual(self.sync(SourceType.ISSUES, issue_values), 2)
+        self.assertIn("since=2024-01-01T00%3A05%3A00Z", StubHandler.requests[0])
+        rows = self.read(SourceType.ISSUES)
+        self.assertEqual([r["number"] for r in rows], [5, 4, 3, 2, 1])
+        self.assertEqual(rows[3]["updated_at"], "2024-01-01 00:09:00")
+
+    def test_pull_sync_stops_at_the_mark(self):
+        self.mirror.sync(self.repo, SourceType.PULL_REQUESTS, issue_values)
+        StubHandler.issues[0] = item(1, 7)
+        StubHandler.requests.clear()
+        written = self.mirror.sync(self.repo, SourceType.PULL_REQUESTS, issue_values)
+        # the changed pull and the one at the mark, then stop before page 3
+        self.assertEqual(written, 2)
+        self.assertEqual(len(StubHandler.requests), 2)
+        self.assertEqual(self.mirror.count("a/b", SourceType.PULL_REQUESTS), 5)
+
+    def test_commit_sync_stops_at_the_last_head(self):
+        self.mirror.sync(self.repo, SourceType.COMMITS, commit_values)
+        StubHandler.commits.insert(0, item(6, 0))
+        StubHandler.requests.clear()
+        self.assertEqual(self.sync(SourceType.COMMITS, commit_values), 1)
+        self.assertEqual(len(StubHandler.requests), 1)
+        self.assertEqual(self.mirror.mark("a/b", SourceType.COMMITS), f"{6:040x}")
+        self.assertEqual(len(self.read(SourceType.COMMITS)), 6)
+
+    def test_unsynced_source(self):
+        self.assertIsNone(self.mirror.synced_at("a/b", SourceType.ISSUES))
+        self.assertEqual(self.read(SourceType.ISSUES), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from github.PaginatedList import PaginatedList
+from github.Repository import Repository
+from cursor import PageCursor
+from globals import SourceType
+
+
+logger = logging.getLogger(__name__)
+
+
+# Sources the mirror keeps, with the column identifying a row
+KEYS: dict[SourceType, str] = {
+    SourceType.ISSUES: "number",
+    SourceType.PULL_REQUESTS: "number",
+    SourceType.COMMITS: "sha",
+}
+
+# Column rows are read back in by, newest first like the API listings
+POSITIONS: dict[SourceType, str] = {
+    SourceType.ISSUES: "number",
+    SourceType.PULL_REQUESTS: "number",
+    SourceType.COMMITS: "date",
+}
+
+DATE_FORMAT: str = "%Y-%m-%d %H:%M:%S"
+
+PER_PAGE: int = 100
+
+
+# Local SQLite copy of repository listings. Each source keeps a sync mark so
+# a refresh only asks GitHub for what changed since the previous one:
+# issues updated since the last seen updated_at, pulls sorted by updated_at
+# down to it, and commits down to the last seen head SHA.
+class Mirror:
+    def __init__(self, path: str):
+        self.path: str = path
+        self.lock: threading.Lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                repo TEXT NOT NULL,
+                source INTEGER NOT NULL,
+                key TEXT NOT NULL,
+                position,
+                data TEXT NOT NULL,
+                PRIMARY KEY (repo, source, key)
+            )
+            """
+        )
+        self.db.execute(
+            "CREATE INDEX IF NOT EXISTS rows_position "
+            "ON rows (repo, source, position, key)"
+        )
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS syncs (
+                repo TEXT NOT NULL,
+                source INTEGER NOT NULL,
+                synced_at REAL NOT NULL,
+                mark TEXT,
+                PRIMARY KEY (repo, source)
+            )
+            """
+        )
+        self.db.commit()
+
+    def _sync_row(self, repo: str, source_type: SourceType) -> tuple | None:
+        with self.lock:
+            return self.db.execute(
+                "SELECT synced_at, mark FROM syncs WHERE repo = ? AND source = ?",
+                (repo.lower(), source_type.value),
+            ).fetchone()
+
+    # When the source was last synced, None if it never was
+    def synced_at(self, repo: str, source_type: SourceType) -> float | None:
+        row: tuple | None = self._sync_row(repo, source_type)
+        return row[0] if row is not None else None
+
+    def mark(self, repo: str, source_type: SourceType) -> str | None:
+        row: tuple | None = self._sync_row(repo, source_type)
+        return row[1] if row is not None else None
+
+    def count(self, repo: str, source_type: SourceType) -> int:
+        with self.lock:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM rows WHERE repo = ? AND source = ?",
+                (repo.lower(), source_type.value),
+            ).fetchone()[0]
+
+    def upsert(self, repo: str, source_type: SourceType, rows: list[dict]):
+        key: str = KEYS[source_type]
+        position: str = POSITIONS[source_type]
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        repo.lower(),
+                        source_type.value,
+                        str(row[key]),
+                        row[position],
+                        json.dumps(row),
+                    )
+                    for row in rows
+                ],
+            )
+            self.db.commit()
+
+    def set_mark(self, repo: str, source_type: SourceType, mark: str | None):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO syncs VALUES (?, ?, ?, ?)",
+                (repo.lower(), source_type.value, time.time(), mark),
+            )
+            self.db.commit()
+
+    # One page of rows, newest first, after the (position, key) of the last
+    # row of the previous page
+    def page(
+        self, repo: str, source_type: SourceType, after: tuple | None, size: int
+    ) -> list[tuple]:
+        query: str = (
+            "SELECT position, key, data FROM rows WHERE repo = ? AND source = ?"
+        )
+        args: list = [repo.lower(), source_type.value]
+        if after is not None:
+            query += " AND (position, key) < (?, ?)"
+            args.extend(after)
+        query += " ORDER BY position DESC, key DESC LIMIT ?"
+        args.append(size)
+        with self.lock:
+            return self.db.execute(query, args).fetchall()
+
+    def cursor(self, repo: str, source_type: SourceType) -> "MirrorCursor":
+        return MirrorCursor(self, repo, source_type)
+
+    # Bring one source of `repo` up to date; `values` turns an API item into
+    # the row values Context builds for it. Returns the number of rows written.
+    def sync(
+        self,
+        repo: Repository,
+        source_type: SourceType,
+        values: Callable[[object], dict],
+    ) -> int:
+        name: str = repo.full_name
+        mark: str | None = self.mark(name, source_type)
+        listing: PaginatedList
+        match source_type:
+            case SourceType.ISSUES:
+                params: dict = {"state": "all", "sort": "updated", "direction": "asc"}
+                if mark is not None:
+                    params["since"] = datetime.strptime(mark, DATE_FORMAT)
+                listing = repo.get_issues(**params)
+            case SourceType.PULL_REQUESTS:
+                # no `since` on pulls: read the most recently updated ones
+                # until reaching what the previous sync already saw
+                listing = repo.get_pulls(state="all", sort="updated", direction="desc")
+            case SourceType.COMMITS:
+                listing = repo.get_commits()
+            case _:
+                raise RuntimeError(f"Can't mirror {source_type.name.lower()}")
+
+        cursor: PageCursor = PageCursor(listing)
+        new_mark: str | None = mark
+        written: int = 0
+        done: bool = False
+        while not done and cursor.has_next():
+            rows: list[dict] = [values(item) for item in cursor.next_page()]
+            match source_type:
+                case SourceType.ISSUES:
+                    if rows:
+                        new_mark = max(new_mark or "", rows[-1]["updated_at"])
+                case SourceType.PULL_REQUESTS:
+                    if cursor.pages == 1 and rows:
+                        new_mark = rows[0]["updated_at"]
+                    if mark is not None:
+                        fresh: list[dict] = [r for r in rows if r["updated_at"] >= mark]
+                        done = len(fresh) < len(rows)
+                        rows = fresh
+                case SourceType.COMMITS:
+                    if cursor.pages == 1 and rows:
+                        new_mark = rows[0]["sha"]
+                    shas: list[str] = [row["sha"] for row in rows]
+                    if mark in shas:
+                        rows = rows[: shas.index(mark)]
+                        done = True
+            self.upsert(name, source_type, rows)
+            written += len(rows)
+        self.set_mark(name, source_type, new_mark)
+        logger.info(
+            f"Synced {written} {source_type.name.lower()} rows of {name} "
+            f"in {cursor.pages} pages"
+        )
+        return written
+
+
+# Reads mirrored rows page by page, with the same interface as PageCursor
+class MirrorCursor:
+    def __init__(self, mirror: Mirror, repo: str, source_type: SourceType):
+        self.mirror: Mirror = mirror
+        self.repo: str = repo
+        self.source_type: SourceType = source_type
+        self.after: tuple | None = None
+        self.has_next_page: bool = True
+        # no API pages are fetched for mirrored rows
+        self.pages: int = 0
+
+    def has_next(self) -> bool:
+        return self.has_next_page
+
+    def next_page(self) -> list[dict]:
+        if not self.has_next_page:
+            return []
+        rows: list[tuple] = self.mirror.page(
+            self.repo, self.source_type, self.after, PER_PAGE
+        )
+        self.has_next_page = len(rows) == PER_PAGE
+        if rows:
+            self.after = rows[-1][:2]
+        return [json.loads(data) for _, _, data in rows]
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+from output import make_writer
+from records import Record
+
+
+class TestWriters(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.dir.name, "out")
+        self.records = [
+            Record({"number": 1, "title": "a, b", "labels": ["bug"]}),
+            Record({"number": 2, "title": "x" * 60, "labels": []}),
+        ]
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def write(self, mode: str, columns: list[str]) -> str:
+        writer = make_writer(mode, columns, self.path)
+        for record in self.records:
+            writer.write(record)
+        writer.close()
+        with open(self.path, newline="") as f:
+            return f.read()
+
+    def test_ndjson(self):
+        lines = self.write("ndjson", ["number", "labels"]).splitlines()
+        self.assertEqual(json.loads(lines[0]), {"number": 1, "labels": ["bug"]})
+        self.assertEqual(len(lines), 2)
+
+    def test_csv_quotes_and_header(self):
+        self.assertEqual(
+            self.write("csv", ["number", "title", "labels"]).splitlines()[:2],
+            ["number,title,labels", '1,"a, b","[""bug""]"'],
+        )
+
+    def test_tsv_uses_record_columns_for_select_star(self):
+        self.assertEqual(self.write("tsv", []).splitlines()[1], '1\ta, b\t["bug"]')
+
+    def test_chunked_table_cuts_long_values(self):
+        lines = self.write("chunked", ["number", "title"]).splitlines()
+        self.assertEqual(lines[0], lines[2])
+        self.assertEqual(lines[0], lines[-1])
+        self.assertEqual(len({len(line) for line in lines}), 1)
+        self.assertTrue(lines[4].rstrip(" |").endswith("…"))
+
+    def test_first_row_is_written_at_once(self):
+        writer = make_writer("ndjson", ["number"], self.path)
+        writer.write(self.records[0])
+        with open(self.path) as f:
+            self.assertEqual(f.read(), '{"number": 1}\n')
+        writer.write(self.records[1])
+        writer.close()
+        self.assertIsNotNone(writer.first_row)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(RuntimeError):
+            make_writer("xml", [])
+
+
+if __name__ == "__main__":
+    unittest.main()
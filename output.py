@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import TextIO
+from records import Row
+
+
+logger = logging.getLogger(__name__)
+
+
+OUTPUT_MODES: list[str] = ["table", "chunked", "ndjson", "csv", "tsv"]
+
+# Rows buffered before a bulk write, and the longest a row waits in the buffer
+FLUSH_ROWS: int = 100
+FLUSH_INTERVAL: float = 0.1
+
+# Rows per chunk in chunked table mode; column widths come from the first one
+CHUNK_ROWS: int = 50
+MAX_WIDTH: int = 40
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+# Writes rows as they are selected. Lines are buffered and written in bulk
+# every FLUSH_ROWS rows or FLUSH_INTERVAL seconds, checked as rows arrive.
+# The scan also calls `flush` before it waits for a page (see
+# Context.set_sink), so no row waits on a fetch.
+class RowWriter(ABC):
+    def __init__(self, columns: list[str], path: str | None = None):
+        self.columns: list[str] = list(columns)
+        self.path: str | None = path
+        self.out: TextIO = open(path, "w", newline="") if path else sys.stdout
+        self.buffer: list[str] = []
+        self.last_flush: float = 0.0
+        self.rows: int = 0
+        self.started_at: float = time.monotonic()
+        # seconds from the writer's creation to the first row, None until then
+        self.first_row: float | None = None
+
+    def write(self, record: Row):
+        if self.rows == 0:
+            self.first_row = time.monotonic() - self.started_at
+            if len(self.columns) == 0:
+                self.columns = record.keys()
+            self.start()
+        self.buffer.append(self.format(record))
+        self.rows += 1
+        if (
+            len(self.buffer) >= FLUSH_ROWS
+            or time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def start(self):
+        pass
+
+    @abstractmethod
+    def format(self, record: Row) -> str:
+        pass
+
+    def flush(self):
+        if self.buffer:
+            self.out.write("".join(self.buffer))
+            self.buffer.clear()
+        self.out.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        if self.path:
+            self.out.close()
+            logger.info(f"Wrote {self.rows} rows to {self.path}")
+
+
+class NdjsonWriter(RowWriter):
+    def format(self, record: Row) -> str:
+        row: dict = {column: record.get(column) for column in self.columns}
+        return json.dumps(row, default=str) + "\n"
+
+
+class CsvWriter(RowWriter):
+    def __init__(self, columns: list[str], path: str | None = None):
+        super().__init__(columns, path)
+        self.line: io.StringIO = io.StringIO()
+        self.csv = csv.writer(self.line, lineterminator="\n")
+
+    def _line(self, values: list[str]) -> str:
+        self.line.seek(0)
+        self.line.truncate()
+        self.csv.writerow(values)
+        return self.line.getvalue()
+
+    def start(self):
+        self.buffer.append(self._line(self.columns))
+
+    def format(self, record: Row) -> str:
+        return self._line([_text(record.get(column)) for column in self.columns])
+
+
+# Tab-separated values without quoting: tabs and newlines inside values
+# become spaces, so every line is one row for cut/awk
+class TsvWriter(RowWriter):
+    def _line(self, values: list[str]) -> str:
+        return "\t".join(v.replace("\t", " ").replace("\n", " ") for v in values) + "\n"
+
+    def start(self):
+        self.buffer.append(self._line(self.columns))
+
+    def format(self, record: Row) -> str:
+        return self._line([_text(record.get(column)) for column in self.columns])
+
+
+# Plain-text table printed in chunks of up to CHUNK_ROWS rows. Widths are
+# fixed by the first chunk so later chunks line up; longer values are cut.
+class ChunkedTableWriter(RowWriter):
+    def __init__(self, columns: list[str], path: str | None = None):
+        super().__init__(columns, path)
+        self.chunk: list[Row] = []
+        self.widths: list[int] | None = None
+
+    def write(self, record: Row):
+        if self.rows == 0:
+            self.first_row = time.monotonic() - self.started_at
+            self.last_flush = time.monotonic()
+            if len(self.columns) == 0:
+                self.columns = record.keys()
+        self.chunk.append(record)
+        self.rows += 1
+        if (
+            len(self.chunk) >= CHUNK_ROWS
+            or time.monotonic() - self.last_flush >= FLUSH_INTERVAL
+        ):
+            self.flush()
+
+    def _line(self, values: list[str]) -> str:
+        cells: list[str] = []
+        for value, width in zip(values, self.widths):
+            value = value.replace("\n", " ")
+            if len(value) > width:
+                value = value[: width - 1] + "…"
+            cells.append(value.ljust(width))
+        return "| " + " | ".join(cells) + " |\n"
+
+    def format(self, record: Row) -> str:
+        return self._line([_text(record.get(column)) for column in self.columns])
+
+    def _rule(self) -> str:
+        return "+" + "+".join("-" * (width + 2) for width in self.widths) + "+\n"
+
+    def flush(self):
+        if self.chunk and self.widths is None:
+            self.widths = [
+                min(
+                    MAX_WIDTH,
+                    max(len(column), *(len(_text(r.get(column))) for r in self.chunk)),
+                )
+                for column in self.columns
+            ]
+            self.buffer.extend([self._rule(), self._line(self.columns), self._rule()])
+        self.buffer.extend(self.format(record) for record in self.chunk)
+        self.chunk.clear()
+        super().flush()
+
+    def close(self):
+        self.flush()
+        if self.widths is not None:
+            self.buffer.append(self._rule())
+        super().close()
+
+
+def make_writer(mode: str, columns: list[str], path: str | None = None) -> RowWriter:
+    match mode:
+        case "ndjson":
+            return NdjsonWriter(columns, path)
+        case "csv":
+            return CsvWriter(columns, path)
+        case "tsv":
+            return TsvWriter(columns, path)
+        case "chunked":
+            return ChunkedTableWriter(columns, path)
+    raise RuntimeError(f"Unknown output mode {mode}, expected one of {OUTPUT_MODES}")
@@ -10,6 +10,7 @@ class Parser:
         self.precedence: dict[str, int] = {
             "NUMBER": 0,
             "STRING": 0,
+            "PARAMETER": 0,
             "OR": 1,
             "AND": 2,
             "NOT": 3,
@@ -18,6 +19,10 @@ class Parser:
             "GREATER": 4,
             "LEQ": 4,
             "GEQ": 4,
+            "LIKE": 4,
+            "PLUS": 5,
+            "MINUS": 5,
+            "ASTERISK": 6,
         }
 
     def add_token(self, token: Token):
@@ -46,9 +51,11 @@ class Parser:
             right = self.parse(self.get_precedence(TokenType.NOT))
             return UnaryExpression(token.type, right)
         elif token.type == TokenType.NUMBER:
-            return LiteralExpression(token.value, ExpressionType.INT)
+            return LiteralExpression(int(token.value), ExpressionType.INT)
         elif token.type == TokenType.STRING:
             return LiteralExpression(token.value, ExpressionType.STR)
+        elif token.type == TokenType.PARAMETER:
+            return LiteralExpression(token.value, ExpressionType.PARAM)
         else:
             raise RuntimeError(f"Unexpected token in nud: {token.type}")
 
@@ -0,0 +1,294 @@
+import unittest
+from datetime import datetime, timezone
+from context import SourceType
+from parser import Parser
+from planner import (
+    check_columns,
+    describe,
+    join_keys,
+    like_words,
+    native_sort,
+    projected_columns,
+    push_down,
+    search_created,
+    search_qualifiers,
+    split_by_alias,
+    split_by_cost,
+    split_conjuncts,
+    text_search,
+)
+from tokenizer import Tokenizer
+
+
+def parse(where: str):
+    tokenizer: Tokenizer = Tokenizer(where)
+    parser: Parser = Parser()
+    while tokenizer.has_next():
+        parser.add_token(tokenizer.next_token())
+    return parser.parse()
+
+
+class TestPushDown(unittest.TestCase):
+    def test_exact_filters_are_removed(self):
+        expr = parse("state = 'open' AND milestone = 'v1.0' AND labels = 'bug'")
+        params, residual = push_down(expr, SourceType.ISSUES)
+        self.assertEqual(
+            params, {"state": "open", "milestone": "v1.0", "labels": ["bug"]}
+        )
+        self.assertIsNone(residual)
+
+    def test_multiple_labels(self):
+        expr = parse("labels = 'bug' AND 'ui' = labels")
+        params, residual = push_down(expr, SourceType.ISSUES)
+        self.assertEqual(params, {"labels": ["bug", "ui"]})
+        self.assertIsNone(residual)
+
+    def test_unpushable_conjuncts_stay_local(self):
+        expr = parse("state = 'open' AND title = 'crash'")
+        params, residual = push_down(expr, SourceType.ISSUES)
+        self.assertEqual(params, {"state": "open"})
+        self.assertEqual(residual.left.value, "title")
+
+    def test_or_is_not_pushed(self):
+        expr = parse("state = 'open' OR state = 'closed'")
+        params, residual = push_down(expr, SourceType.ISSUES)
+        self.assertEqual(params, {})
+        self.assertIs(residual, expr)
+
+    def test_invalid_state_stays_local(self):
+        expr = parse("state = 'merged'")
+        params, residual = push_down(expr, SourceType.PULL_REQUESTS)
+        self.assertEqual(params, {})
+        self.assertIs(residual, expr)
+
+    def test_ranges_keep_local_check(self):
+        expr = parse("date >= '2023-01-01' AND date < '2023-06-01' AND author = 'me'")
+        params, residual = push_down(expr, SourceType.COMMITS)
+        self.assertEqual(
+            params,
+            {
+                "since": datetime(2023, 1, 1),
+                "author": "me",
+            },
+        )
+        # the API matches author emails too, so the column is checked locally
+        self.assertEqual(len(split_conjuncts(residual)), 3)
+
+    def test_missing_values_stay_local(self):
+        expr = parse("milestone = 'N/A' AND assignee = 'N/A' AND state = 'open'")
+        params, residual = push_down(expr, SourceType.ISSUES)
+        self.assertEqual(params, {"state": "open"})
+        self.assertEqual(len(split_conjuncts(residual)), 2)
+        self.assertIsNone(search_qualifiers(expr, SourceType.ISSUES))
+
+    def test_assignee_keeps_local_check(self):
+        # the API matches any of an issue's assignees, the column the first
+        expr = parse("assignee = 'me'")
+        params, residual = push_down(expr, SourceType.ISSUES)
+        self.assertEqual(params, {"assignee": "me"})
+        self.assertIs(residual, expr)
+        self.assertIsNone(search_qualifiers(expr, SourceType.ISSUES))
+
+    def test_narrowest_lower_bound_wins(self):
+        expr = parse("created_at > '2023-01-01' AND updated_at > '2024-01-01'")
+        params, _ = push_down(expr, SourceType.ISSUES)
+        self.assertEqual(params, {"since": datetime(2024, 1, 1)})
+
+    def test_unknown_columns_are_rejected(self):
+        # `status` is no column of issues, so it would match nothing locally
+        expr = parse("status = 'open' OR title = 'crash'")
+        _, residual = push_down(expr, SourceType.ISSUES)
+        with self.assertRaisesRegex(RuntimeError, "Unknown column status"):
+            check_columns(residual, SourceType.ISSUES)
+        check_columns(parse("state = 'open' OR repo = 'a/b'"), SourceType.ISSUES)
+
+    def test_filter_columns_are_only_pushed(self):
+        params, residual = push_down(parse("path = 'a.py'"), SourceType.COMMITS)
+        self.assertEqual(params, {"path": "a.py"})
+        check_columns(residual, SourceType.COMMITS)
+        with self.assertRaisesRegex(RuntimeError, "path can only be filtered"):
+            check_columns(parse("NOT path = 'a.py'"), SourceType.COMMITS)
+
+    def test_no_where_clause(self):
+        self.assertEqual(push_down(None, SourceType.ISSUES), ({}, None))
+
+
+class TestProjection(unittest.TestCase):
+    def test_projection_includes_where_columns(self):
+        expr = parse("merged_by = 'me' OR NOT title = 'x'")
+        self.assertEqual(
+            projected_columns(["number"], expr), {"number", "merged_by", "title"}
+        )
+
+    def test_select_star_projects_everything(self):
+        self.assertIsNone(projected_columns([], parse("title = 'x'")))
+
+    def test_split_by_cost(self):
+        expr = parse("merged_by = 'me' AND state = 'open' AND title = 'x'")
+        cheap, costly = split_by_cost(expr, {"merged_by", "changed_files"})
+        self.assertEqual(len(split_conjuncts(cheap)), 2)
+        self.assertEqual(costly.left.value, "merged_by")
+
+    def test_split_without_expensive_columns(self):
+        expr = parse("state = 'open'")
+        self.assertEqual(split_by_cost(expr, {"merged_by"}), (expr, None))
+
+
+class TestNativeSort(unittest.TestCase):
+    def test_single_sortable_column(self):
+        self.assertEqual(
+            native_sort([(parse("updated_at"), False)], SourceType.ISSUES),
+            {"sort": "updated", "direction": "asc"},
+        )
+
+    def test_local_sort_fallbacks(self):
+        for order_by, source_type in [
+            ([(parse("title"), True)], SourceType.ISSUES),
+            ([(parse("date"), True)], SourceType.COMMITS),
+            ([(parse("number + 1"), True)], SourceType.PULL_REQUESTS),
+            ([(parse("created_at"), True), (parse("id"), True)], SourceType.ISSUES),
+        ]:
+            self.assertIsNone(native_sort(order_by, source_type))
+
+    def test_order_columns_are_projected(self):
+        self.assertEqual(
+            projected_columns(["title"], None, parse("created_at")),
+            {"title", "created_at"},
+        )
+
+
+class TestSearchQualifiers(unittest.TestCase):
+    def test_exact_filters(self):
+        expr = parse("state = 'open' AND labels = 'bug' AND user = 'me'")
+        self.assertEqual(
+            search_qualifiers(expr, SourceType.ISSUES),
+            ['state:"open"', 'label:"bug"', 'author:"me"'],
+        )
+        self.assertEqual(
+            search_qualifiers(parse("base = 'main'"), SourceType.PULL_REQUESTS),
+            ["is:pr", 'base:"main"'],
+        )
+
+    def test_dates_match_the_local_comparison(self):
+        expr = parse(
+            "created_at > '2023-01-01' AND created_at <= '2023-06-01' "
+            "AND updated_at < '2024-01-01 12:00:00'"
+        )
+        self.assertEqual(
+            search_qualifiers(expr, SourceType.ISSUES),
+            [
+                "created:>=2023-01-01",
+                "created:<2023-06-01",
+                "updated:<2024-01-01T12:00:00Z",
+            ],
+        )
+
+    def test_inexact_predicates(self):
+        for where, source_type in [
+            ("title = 'crash'", SourceType.ISSUES),
+            ("state = 'open' OR state = 'closed'", SourceType.ISSUES),
+            ("state = 'merged'", SourceType.PULL_REQUESTS),
+            ("closed_at > '2023-01-01'", SourceType.ISSUES),
+            ("created_at > 'yesterday'", SourceType.ISSUES),
+            ("author = 'me'", SourceType.COMMITS),
+        ]:
+            self.assertIsNone(search_qualifiers(parse(where), source_type))
+
+
+
+class TestTextSearch(unittest.TestCase):
+    def test_like_words(self):
+        self.assertEqual(like_words("%bug%"), [])
+        self.assertEqual(like_words("% Crash on start%"), ["crash", "on"])
+        self.assertEqual(like_words("bug fix%"), ["bug"])
+        self.assertEqual(like_words("%(bug) fix_ %"), [])
+
+    def test_text_search(self):
+        terms = text_search(
+            parse(
+                "title LIKE '% crash %' AND body LIKE 'Steps to%' AND state = 'open' "
+                "AND created_at > '2024-01-01' AND number > 5"
+            ),
+            SourceType.ISSUES,
+        )
+        self.assertEqual(terms, ["crash", "steps", "in:title,body", 'state:"open"'])
+
+    def test_search_starts_from_the_created_bounds(self):
+        start, end = search_created(
+            parse(
+                "title LIKE '% crash %' AND created_at > '2024-01-01 12:00:00' "
+                "AND created_at >= '2023-06-01' AND created_at < '2024-03-01' "
+                "AND created_at <= '2024-02-10T08:00:00' AND updated_at < '2020-01-01'"
+            )
+        )
+        # whole days: '2024-02-10 09:00:00' < '2024-02-10T08:00:00' as strings
+        self.assertEqual(start, datetime(2024, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(end, datetime(2024, 2, 10, 23, 59, 59, tzinfo=timezone.utc))
+        self.assertEqual(search_created(parse("title LIKE '% a %'")), (None, None))
+
+    def test_no_narrowing_like(self):
+        for where, source_type in [
+            ("title LIKE '%bug%' AND state = 'open'", SourceType.ISSUES),
+            ("user LIKE 'bot %'", SourceType.ISSUES),
+            ("title LIKE '% bug %'", SourceType.PULL_REQUESTS),
+            ("state = 'open'", SourceType.ISSUES),
+        ]:
+            self.assertIsNone(text_search(parse(where), source_type))
+
+    def test_every_source_type(self):
+        where = {
+            SourceType.ISSUES: "title LIKE '% crash %' AND user = 'x'",
+            SourceType.PULL_REQUESTS: "title LIKE '% crash %' AND user = 'x'",
+            SourceType.COMMITS: "author = 'x' AND date > '2024-01-01'",
+            SourceType.USER_REPOS: "language = 'Python' AND name LIKE 'git %'",
+        }
+        for source_type in SourceType:
+            expr = parse(where.get(source_type, "name = 'x'"))
+            terms = text_search(expr, source_type)
+            if source_type == SourceType.ISSUES:
+                self.assertEqual(terms[:2], ["crash", "in:title"])
+            else:
+                self.assertIsNone(terms)
+            self.assertIsNone(search_qualifiers(expr, source_type))
+
+
+class TestJoinPlanning(unittest.TestCase):
+    def test_join_keys(self):
+        left, right, rest = join_keys(
+            parse("i.number = p.number AND p.state = 'open'"), "p", "i"
+        )
+        self.assertEqual((left, right), ("number", "number"))
+        self.assertEqual(rest.left.value, "p.state")
+
+    def test_join_needs_an_equality_across_sources(self):
+        with self.assertRaises(RuntimeError):
+            join_keys(parse("p.number = p.id"), "p", "i")
+        with self.assertRaises(RuntimeError):
+            join_keys(parse("number = i.number"), "p", "i")
+
+    def test_split_by_alias(self):
+        sides, residual = split_by_alias(
+            parse("p.state = 'open' AND i.user = 'x' AND p.user = i.user"), ["p", "i"]
+        )
+        self.assertEqual(sides["p"].left.value, "state")
+        self.assertEqual(sides["i"].left.value, "user")
+        self.assertEqual(residual.left.value, "p.user")
+        self.assertEqual(residual.right.value, "i.user")
+
+    def test_unqualified_columns(self):
+        with self.assertRaises(RuntimeError):
+            split_by_alias(parse("state = 'open'"), ["p", "i"])
+
+
+class TestDescribe(unittest.TestCase):
+    def test_describe(self):
+        self.assertEqual(
+            describe(parse("state = 'open' AND number > 3 OR NOT title LIKE '%a%'")),
+            "(state = 'open' AND number > 3) OR NOT title LIKE '%a%'",
+        )
+        query: str = "user = :name AND number = ?"
+        self.assertEqual(describe(parse(query)), query)
+
+
+if __name__ == "__main__":
+    unittest.main()
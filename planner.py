@@ -0,0 +1,567 @@
+import logging
+import re
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from context import COLUMNS, SourceType
+from expression import (
+    BinaryExpression,
+    Expression,
+    ExpressionType,
+    LiteralExpression,
+    UnaryExpression,
+)
+from tokenizer import TokenType
+
+
+logger = logging.getLogger(__name__)
+
+
+# Equality predicates the API evaluates exactly: column -> API parameter.
+# Conjuncts pushed through these maps are dropped from the local predicate,
+# so every key is a column of the source's records (see COLUMNS) or one of
+# its FILTER_COLUMNS.
+EXACT_FILTERS: dict[SourceType, dict[str, str]] = {
+    SourceType.ISSUES: {
+        "state": "state",
+        "labels": "labels",
+        "milestone": "milestone",
+        "user": "creator",
+    },
+    SourceType.PULL_REQUESTS: {
+        "state": "state",
+        "base": "base",
+        "head": "head",
+    },
+    SourceType.COMMITS: {
+        "path": "path",
+    },
+}
+
+# Filters the API takes that are not columns of the rows, e.g. the commits
+# touching a path. They can only be pushed down, as `column = 'value'`
+# conjuncts.
+FILTER_COLUMNS: dict[SourceType, set[str]] = {
+    SourceType.COMMITS: {"path"},
+}
+
+# Equality predicates the API matches more loosely than the local column:
+# column -> API parameter. These only shrink the listing, so the predicate is
+# still checked locally. The API matches an issue having the assignee among
+# any of its assignees, while the column holds the first one. The commits
+# API matches an author's login or email, while the column holds the login.
+LOOSE_FILTERS: dict[SourceType, dict[str, str]] = {
+    SourceType.ISSUES: {
+        "assignee": "assignee",
+    },
+    SourceType.COMMITS: {
+        "author": "author",
+    },
+}
+
+# The value the local columns show for a missing milestone or assignee. The
+# API would take it for a name, so these comparisons stay local.
+MISSING: str = "N/A"
+
+# Date ranges the API can narrow down: column -> (lower bound, upper bound).
+# These only shrink the listing, so the predicate is still checked locally.
+# An issue is always updated at or after its creation, so a lower bound on
+# created_at is also a valid lower bound for `since`. The commits API filters
+# by committer date while the local `date` is the author date; a commit is
+# committed at or after it is authored, so only the lower bound is safe.
+RANGE_FILTERS: dict[SourceType, dict[str, tuple[str | None, str | None]]] = {
+    SourceType.ISSUES: {
+        "updated_at": ("since", None),
+        "created_at": ("since", None),
+    },
+    SourceType.COMMITS: {
+        "date": ("since", None),
+    },
+}
+
+API_STATES: list[str] = ["open", "closed"]
+
+# Orders the listing endpoints can return natively: column -> `sort` value
+NATIVE_SORTS: dict[SourceType, dict[str, str]] = {
+    SourceType.ISSUES: {"created_at": "created", "updated_at": "updated"},
+    SourceType.PULL_REQUESTS: {"created_at": "created", "updated_at": "updated"},
+    SourceType.USER_REPOS: {"created_at": "created", "full_name": "full_name"},
+}
+
+# Equality predicates the search API matches exactly: column -> qualifier
+SEARCH_FILTERS: dict[SourceType, dict[str, str]] = {
+    SourceType.ISSUES: {
+        "state": "state",
+        "labels": "label",
+        "milestone": "milestone",
+        "user": "author",
+    },
+    SourceType.PULL_REQUESTS: {
+        "state": "state",
+        "milestone": "milestone",
+        "user": "author",
+        "base": "base",
+    },
+}
+
+# Date columns the search API can bound: column -> qualifier. closed_at and
+# merged_at are left out: rows without one hold "N/A", which compares
+# greater than any date locally.
+SEARCH_DATES: dict[str, str] = {
+    "created_at": "created",
+    "updated_at": "updated",
+}
+
+# The issues listing includes pull requests, and so does an issue search
+# without an `is:` qualifier
+SEARCH_SCOPES: dict[SourceType, list[str]] = {
+    SourceType.ISSUES: [],
+    SourceType.PULL_REQUESTS: ["is:pr"],
+}
+
+# Text columns LIKE narrows an issue search on: column -> `in:` qualifier.
+# Only issue search results carry every column of their source's rows.
+SEARCH_TEXT: dict[SourceType, dict[str, str]] = {
+    SourceType.ISSUES: {"title": "title", "body": "body"},
+}
+
+# A word the search API matches: letters and digits only
+SEARCH_WORD_RE: re.Pattern = re.compile(r"^[^\W_]+$")
+
+SEARCH_OPERATORS: dict[TokenType, str] = {
+    TokenType.GREATER: ">",
+    TokenType.GEQ: ">=",
+    TokenType.LESS: "<",
+    TokenType.LEQ: "<=",
+}
+
+FLIPPED: dict[TokenType, TokenType] = {
+    TokenType.GREATER: TokenType.LESS,
+    TokenType.GEQ: TokenType.LEQ,
+    TokenType.LESS: TokenType.GREATER,
+    TokenType.LEQ: TokenType.GEQ,
+    TokenType.EQUAL: TokenType.EQUAL,
+}
+
+
+def split_conjuncts(expr: Expression | None) -> list[Expression]:
+    if expr is None:
+        return []
+    if isinstance(expr, BinaryExpression) and expr.operator == TokenType.AND:
+        return split_conjuncts(expr.left) + split_conjuncts(expr.right)
+    return [expr]
+
+
+def join_conjuncts(conjuncts: list[Expression]) -> Expression | None:
+    if len(conjuncts) == 0:
+        return None
+    expr: Expression = conjuncts[0]
+    for conjunct in conjuncts[1:]:
+        expr = BinaryExpression(expr, TokenType.AND, conjunct)
+    return expr
+
+
+def referenced_columns(expr: Expression | None) -> set[str]:
+    if isinstance(expr, LiteralExpression):
+        return {expr.value} if expr.type == ExpressionType.CPH else set()
+    if isinstance(expr, UnaryExpression):
+        return referenced_columns(expr.right)
+    if isinstance(expr, BinaryExpression):
+        return referenced_columns(expr.left) | referenced_columns(expr.right)
+    return set()
+
+
+# Reject a predicate checked locally on a column the source's rows don't
+# have, which would silently match nothing
+def check_columns(expr: Expression | None, source_type: SourceType | None):
+    columns: list[str] | None = COLUMNS.get(source_type)
+    if columns is None:
+        return
+    for column in sorted(referenced_columns(expr) - set(columns)):
+        if column in FILTER_COLUMNS.get(source_type, set()):
+            raise RuntimeError(
+                f"{column} can only be filtered with {column} = '...' "
+                "joined to the rest of the WHERE clause by AND"
+            )
+        raise RuntimeError(
+            f"Unknown column {column} of {source_type.name.lower()}, "
+            f"expected one of {', '.join(columns)}"
+        )
+
+
+# Columns the query needs; None when every column is selected
+def projected_columns(
+    selected_columns: list[str], *exprs: Expression | None
+) -> set[str] | None:
+    if len(selected_columns) == 0:
+        return None
+    columns: set[str] = set(selected_columns)
+    for expr in exprs:
+        columns |= referenced_columns(expr)
+    return columns
+
+
+# API sort parameters producing the ORDER BY order, or None when the rows
+# have to be sorted locally
+def native_sort(
+    order_by: list[tuple[Expression, bool]], source_type: SourceType
+) -> dict | None:
+    if len(order_by) != 1:
+        return None
+    expr, descending = order_by[0]
+    if not isinstance(expr, LiteralExpression) or expr.type != ExpressionType.CPH:
+        return None
+    sort: str | None = NATIVE_SORTS.get(source_type, {}).get(expr.value)
+    if sort is None:
+        return None
+    return {"sort": sort, "direction": "desc" if descending else "asc"}
+
+
+# Split a predicate into conjuncts on cheap columns and conjuncts touching
+# expensive ones, so the expensive part only runs for rows passing the rest
+def split_by_cost(
+    expr: Expression | None, expensive: set[str]
+) -> tuple[Expression | None, Expression | None]:
+    cheap: list[Expression] = []
+    costly: list[Expression] = []
+    for conjunct in split_conjuncts(expr):
+        if referenced_columns(conjunct) & expensive:
+            costly.append(conjunct)
+        else:
+            cheap.append(conjunct)
+    return join_conjuncts(cheap), join_conjuncts(costly)
+
+
+# Normalize `col <op> 'literal'` and `'literal' <op> col` to (col, op, literal)
+def _column_comparison(expr: Expression) -> tuple[str, TokenType, str] | None:
+    if not isinstance(expr, BinaryExpression) or expr.operator not in FLIPPED:
+        return None
+    left, right = expr.left, expr.right
+    if not isinstance(left, LiteralExpression) or not isinstance(
+        right, LiteralExpression
+    ):
+        return None
+    if left.type == ExpressionType.CPH and right.type == ExpressionType.STR:
+        return left.value, expr.operator, right.value
+    if left.type == ExpressionType.STR and right.type == ExpressionType.CPH:
+        return right.value, FLIPPED[expr.operator], left.value
+    return None
+
+
+def _parse_date(value: str) -> datetime | None:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+# Split the WHERE tree into API parameters and the residual local predicate
+def push_down(
+    expr: Expression | None, source_type: SourceType
+) -> tuple[dict, Expression | None]:
+    exact: dict[str, str] = EXACT_FILTERS.get(source_type, {})
+    loose: dict[str, str] = LOOSE_FILTERS.get(source_type, {})
+    ranges: dict[str, tuple[str | None, str | None]] = RANGE_FILTERS.get(
+        source_type, {}
+    )
+    params: dict = {}
+    residual: list[Expression] = []
+
+    for conjunct in split_conjuncts(expr):
+        comparison = _column_comparison(conjunct)
+        if comparison is None:
+            residual.append(conjunct)
+            continue
+        column, operator, value = comparison
+
+        if operator == TokenType.EQUAL and value == MISSING:
+            residual.append(conjunct)
+            continue
+        if operator == TokenType.EQUAL and column in exact:
+            param: str = exact[column]
+            if param == "labels":
+                params.setdefault("labels", []).append(value)
+                continue
+            if param == "state" and value not in API_STATES:
+                residual.append(conjunct)
+                continue
+            if param not in params:
+                params[param] = value
+                continue
+        elif operator == TokenType.EQUAL and column in loose:
+            params.setdefault(loose[column], value)
+        elif operator != TokenType.EQUAL and column in ranges:
+            date: datetime | None = _parse_date(value)
+            lower, upper = ranges[column]
+            if date is not None and operator in (TokenType.GREATER, TokenType.GEQ):
+                if lower is not None:
+                    params[lower] = max(params.get(lower, date), date)
+            elif date is not None and operator in (TokenType.LESS, TokenType.LEQ):
+                if upper is not None:
+                    params[upper] = min(params.get(upper, date), date)
+        residual.append(conjunct)
+
+    logger.info(f"Pushed down filters: {params}")
+    return params, join_conjuncts(residual)
+
+
+# Search qualifier for a date comparison matching the local string comparison
+# exactly. Rows hold "YYYY-MM-DD HH:MM:SS", so against a bare date `>` and
+# `>=` both mean "on or after that day" and `<` and `<=` "before that day".
+def _date_qualifier(qualifier: str, operator: TokenType, value: str) -> str | None:
+    if _parse_date(value) is None:
+        return None
+    if len(value) == 10:
+        if operator in (TokenType.GREATER, TokenType.GEQ):
+            return f"{qualifier}:>={value}"
+        return f"{qualifier}:<{value}"
+    if len(value) != 19 or value[10] != " ":
+        return None
+    return f"{qualifier}:{SEARCH_OPERATORS[operator]}{value.replace(' ', 'T')}Z"
+
+
+# Search qualifier selecting exactly the rows a conjunct matches, or None
+def _exact_qualifier(conjunct: Expression, source_type: SourceType) -> str | None:
+    comparison = _column_comparison(conjunct)
+    if comparison is None:
+        return None
+    column, operator, value = comparison
+    exact: dict[str, str] = SEARCH_FILTERS.get(source_type, {})
+    if operator == TokenType.EQUAL and column in exact:
+        if value == MISSING:
+            return None
+        if exact[column] == "state" and value not in API_STATES:
+            return None
+        return f'{exact[column]}:"{value}"'
+    if operator in SEARCH_OPERATORS and column in SEARCH_DATES:
+        return _date_qualifier(SEARCH_DATES[column], operator, value)
+    return None
+
+
+# Translate a WHERE tree into issue search qualifiers selecting exactly the
+# rows it matches, or None when some conjunct has no exact equivalent
+def search_qualifiers(
+    expr: Expression | None, source_type: SourceType
+) -> list[str] | None:
+    if source_type not in SEARCH_SCOPES:
+        return None
+    qualifiers: list[str] = list(SEARCH_SCOPES[source_type])
+    for conjunct in split_conjuncts(expr):
+        qualifier: str | None = _exact_qualifier(conjunct, source_type)
+        if qualifier is None:
+            return None
+        qualifiers.append(qualifier)
+    return qualifiers
+
+
+# Words every string matching a LIKE pattern contains whole: the search API
+# only matches whole words, so `%bug%` (which matches "debug") has none, and
+# `% bug %` or `bug fix%` do. A word counts when it is delimited by spaces or
+# the ends of the pattern and holds no wildcard or punctuation.
+def like_words(pattern: str) -> list[str]:
+    return [word.lower() for word in pattern.split() if SEARCH_WORD_RE.match(word)]
+
+
+# `column LIKE 'pattern'` -> (column, pattern)
+def _like_comparison(expr: Expression) -> tuple[str, str] | None:
+    if not isinstance(expr, BinaryExpression) or expr.operator != TokenType.LIKE:
+        return None
+    left, right = expr.left, expr.right
+    if (
+        isinstance(left, LiteralExpression)
+        and isinstance(right, LiteralExpression)
+        and left.type == ExpressionType.CPH
+        and right.type == ExpressionType.STR
+    ):
+        return left.value, right.value
+    return None
+
+
+# An issue search to read instead of the whole listing when LIKE patterns on
+# text columns narrow it: their words, with the exact qualifiers of
+# search_qualifiers for the other conjuncts that have one. The search matches
+# a superset of the rows, so the whole WHERE clause is still checked on each.
+# created_at is left to the search cursor, which splits on it and starts from
+# the bounds of search_created. None when no LIKE narrows the search.
+def text_search(expr: Expression | None, source_type: SourceType) -> list[str] | None:
+    # only issues and pull requests can be searched
+    if source_type not in SEARCH_TEXT:
+        return None
+    text: dict[str, str] = SEARCH_TEXT[source_type]
+    words: list[str] = []
+    fields: list[str] = []
+    qualifiers: list[str] = []
+    for conjunct in split_conjuncts(expr):
+        like = _like_comparison(conjunct)
+        if like is not None:
+            column, pattern = like
+            found: list[str] = like_words(pattern)
+            if column in text and found:
+                words += found
+                fields.append(text[column])
+            continue
+        comparison = _column_comparison(conjunct)
+        if comparison is not None and comparison[0] == "created_at":
+            continue
+        qualifier: str | None = _exact_qualifier(conjunct, source_type)
+        if qualifier is not None:
+            qualifiers.append(qualifier)
+    if not words:
+        return None
+    return [
+        *dict.fromkeys(words),
+        f"in:{','.join(dict.fromkeys(fields))}",
+        *SEARCH_SCOPES[source_type],
+        *qualifiers,
+    ]
+
+
+
+# The created range of an issue search for the created_at comparisons in
+# `expr`: (lowest, highest), None where unbounded. Rows hold
+# "YYYY-MM-DD HH:MM:SS", so only the day a value starts with decides which
+# rows compare on either side of it; the range spans whole days and the
+# comparisons are still checked on each row.
+def search_created(
+    expr: Expression | None,
+) -> tuple[datetime | None, datetime | None]:
+    start: datetime | None = None
+    end: datetime | None = None
+    for conjunct in split_conjuncts(expr):
+        comparison = _column_comparison(conjunct)
+        if comparison is None or comparison[0] != "created_at":
+            continue
+        _, operator, value = comparison
+        day: datetime | None = _parse_date(value[:10])
+        if day is None or f"{day:%Y-%m-%d}" != value[:10]:
+            continue
+        day = day.replace(tzinfo=timezone.utc)
+        if operator in (TokenType.GREATER, TokenType.GEQ):
+            start = day if start is None else max(start, day)
+        elif operator in (TokenType.LESS, TokenType.LEQ):
+            last: datetime = day + timedelta(days=1, seconds=-1)
+            end = last if end is None else min(end, last)
+    return start, end
+
+# `alias.column` -> (alias, column): every column of a join query names the
+# source it is read from
+def qualified(column: str, aliases: list[str]) -> tuple[str, str]:
+    alias, _, name = column.partition(".")
+    if not name or alias not in aliases:
+        raise RuntimeError(f"Column {column} must be qualified with one of {aliases}")
+    return alias, name
+
+
+def rename_columns(
+    expr: Expression | None, rename: Callable[[str], str]
+) -> Expression | None:
+    if isinstance(expr, LiteralExpression):
+        if expr.type != ExpressionType.CPH:
+            return expr
+        return LiteralExpression(rename(expr.value), ExpressionType.CPH)
+    if isinstance(expr, UnaryExpression):
+        return UnaryExpression(expr.operator, rename_columns(expr.right, rename))
+    if isinstance(expr, BinaryExpression):
+        return BinaryExpression(
+            rename_columns(expr.left, rename),
+            expr.operator,
+            rename_columns(expr.right, rename),
+        )
+    return expr
+
+
+# The first equality of the ON condition between a column of each source is
+# the join key, as (left column, right column). Its other conjuncts filter the
+# joined rows like the WHERE clause.
+def join_keys(
+    on: Expression, left: str, right: str
+) -> tuple[str, str, Expression | None]:
+    keys: tuple[str, str] | None = None
+    rest: list[Expression] = []
+    for conjunct in split_conjuncts(on):
+        if (
+            keys is None
+            and isinstance(conjunct, BinaryExpression)
+            and conjunct.operator == TokenType.EQUAL
+            and isinstance(conjunct.left, LiteralExpression)
+            and isinstance(conjunct.right, LiteralExpression)
+            and conjunct.left.type == ExpressionType.CPH
+            and conjunct.right.type == ExpressionType.CPH
+        ):
+            a_alias, a_column = qualified(conjunct.left.value, [left, right])
+            b_alias, b_column = qualified(conjunct.right.value, [left, right])
+            if a_alias != b_alias:
+                keys = (a_column, b_column) if a_alias == left else (b_column, a_column)
+                continue
+        rest.append(conjunct)
+    if keys is None:
+        raise RuntimeError("ON needs an equality between a column of each source")
+    return keys[0], keys[1], join_conjuncts(rest)
+
+
+# Split a join's predicate into the conjuncts each source checks on its own
+# rows, with unqualified columns, and the residual comparing both sources
+def split_by_alias(
+    expr: Expression | None, aliases: list[str]
+) -> tuple[dict[str, Expression | None], Expression | None]:
+    sides: dict[str, list[Expression]] = {alias: [] for alias in aliases}
+    residual: list[Expression] = []
+    for conjunct in split_conjuncts(expr):
+        used: set[str] = {
+            qualified(column, aliases)[0] for column in referenced_columns(conjunct)
+        }
+        if len(used) == 1:
+            sides[used.pop()].append(
+                rename_columns(conjunct, lambda column: column.partition(".")[2])
+            )
+        else:
+            residual.append(conjunct)
+    return {
+        alias: join_conjuncts(conjuncts) for alias, conjuncts in sides.items()
+    }, join_conjuncts(residual)
+
+
+OPERATOR_TEXT: dict[TokenType, str] = {
+    TokenType.GREATER: ">",
+    TokenType.LESS: "<",
+    TokenType.GEQ: ">=",
+    TokenType.LEQ: "<=",
+    TokenType.EQUAL: "=",
+    TokenType.PLUS: "+",
+    TokenType.MINUS: "-",
+    TokenType.ASTERISK: "*",
+    TokenType.DIV: "/",
+    TokenType.AND: "AND",
+    TokenType.OR: "OR",
+    TokenType.LIKE: "LIKE",
+}
+
+
+# Query text of an expression, parenthesized where AND and OR nest
+def describe(expr: Expression | None) -> str:
+    if expr is None:
+        return ""
+    if isinstance(expr, LiteralExpression):
+        match expr.type:
+            case ExpressionType.STR:
+                return f"'{expr.value}'"
+            case ExpressionType.PARAM:
+                return "?" if expr.value is None else f":{expr.value}"
+        return str(expr.value)
+    if isinstance(expr, UnaryExpression):
+        return f"NOT {_describe_operand(expr.right, TokenType.NOT)}"
+    if isinstance(expr, BinaryExpression):
+        left: str = _describe_operand(expr.left, expr.operator)
+        right: str = _describe_operand(expr.right, expr.operator)
+        return f"{left} {OPERATOR_TEXT.get(expr.operator, expr.operator.value)} {right}"
+    return str(expr)
+
+
+def _describe_operand(expr: Expression, parent: TokenType) -> str:
+    text: str = describe(expr)
+    if (
+        isinstance(expr, BinaryExpression)
+        and expr.operator in (TokenType.AND, TokenType.OR)
+        and expr.operator != parent
+    ):
+        return f"({text})"
+    return text
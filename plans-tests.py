@@ -0,0 +1,136 @@
+import unittest
+from expression import ExpressionType
+from plans import PlanCache, bind, build_plan, normalize
+from tokenizer import TokenType
+
+
+class TestBuildPlan(unittest.TestCase):
+    def test_clauses(self):
+        plan = build_plan(
+            "SELECT number, title FROM a.b.issues WHERE state = 'open' "
+            "ORDER BY number DESC LIMIT 5"
+        )
+        self.assertEqual(plan.columns, ["number", "title"])
+        self.assertEqual(plan.source.value, "a.b.issues")
+        self.assertEqual(plan.limit_for({}), 5)
+        self.assertEqual(plan.where.operator, TokenType.EQUAL)
+        self.assertEqual(len(plan.order_by), 1)
+        self.assertTrue(plan.order_by[0][1])
+
+    def test_explain(self):
+        query: str = "SELECT number FROM a.b.issues LIMIT 5"
+        self.assertIsNone(build_plan(query).explain)
+        self.assertEqual(build_plan(f"EXPLAIN {query}").explain, "plan")
+        plan = build_plan(f"explain analyze {query}")
+        self.assertEqual(plan.explain, "analyze")
+        self.assertEqual(plan.columns, ["number"])
+        with self.assertRaises(RuntimeError):
+            build_plan("SELECT number EXPLAIN FROM a.b.issues")
+
+    def test_group_by(self):
+        plan = build_plan(
+            "SELECT user, count( * ) FROM a.b.issues WHERE state = 'open' "
+            "GROUP BY user ORDER BY COUNT(*) DESC LIMIT 3"
+        )
+        self.assertTrue(plan.aggregating())
+        self.assertEqual(plan.columns, ["user", "COUNT(*)"])
+        self.assertEqual(plan.group_by, ["user"])
+        self.assertEqual(plan.where.operator, TokenType.EQUAL)
+        self.assertEqual(plan.order_by[0][0].value, "COUNT(*)")
+        self.assertEqual(plan.limit_for({}), 3)
+
+    def test_ungrouped_column(self):
+        with self.assertRaises(RuntimeError):
+            build_plan("SELECT user, title, COUNT(*) FROM a.b.issues GROUP BY user")
+        with self.assertRaises(RuntimeError):
+            build_plan("SELECT * FROM a.b.issues GROUP BY user")
+
+    def test_join(self):
+        plan = build_plan(
+            "SELECT p.title, i.state FROM a.b.pull_requests AS p "
+            "JOIN a.b.issues ON p.number = issues.number AND i.state = 'open' "
+            "WHERE p.state = 'closed' LIMIT 5"
+        )
+        self.assertTrue(plan.joined())
+        self.assertEqual(plan.source.value, "a.b.pull_requests")
+        self.assertEqual(plan.source_alias, "p")
+        self.assertEqual(plan.join_source.value, "a.b.issues")
+        self.assertEqual(plan.join_alias, "issues")
+        self.assertEqual(plan.join_on.operator, TokenType.AND)
+        self.assertEqual(plan.where.left.value, "p.state")
+        self.assertEqual(plan.limit_for({}), 5)
+
+    def test_join_errors(self):
+        with self.assertRaises(RuntimeError):
+            build_plan("SELECT * FROM a.b.issues JOIN c.d.issues ON a = b")
+        with self.assertRaises(RuntimeError):
+            build_plan("SELECT * FROM a.b.issues AS x JOIN c.d.issues AS y")
+        plan = build_plan(
+            "SELECT x.user, COUNT(y.number) FROM a.b.issues x "
+            "JOIN c.d.issues y ON x.number = y.number GROUP BY x.user"
+        )
+        self.assertEqual(plan.aggregates[0].column, "y.number")
+
+    def test_positional_parameters(self):
+        plan = build_plan(
+            "SELECT * FROM a.b.issues WHERE number > ? AND state = ? LIMIT ?"
+        )
+        self.assertEqual(plan.parameters, ["1", "2", "3"])
+        values = plan.bindings([10, "open", 3])
+        self.assertEqual(plan.limit_for(values), 3)
+        where = bind(plan.where, values)
+        self.assertEqual(where.left.right.value, 10)
+        self.assertEqual(where.left.right.type, ExpressionType.INT)
+        self.assertEqual(where.right.right.type, ExpressionType.STR)
+        # the plan itself keeps its placeholders
+        self.assertEqual(plan.where.left.right.type, ExpressionType.PARAM)
+
+    def test_named_parameters(self):
+        plan = build_plan("SELECT * FROM a.b.issues WHERE user = :me OR assignee = :me")
+        self.assertEqual(plan.parameters, ["me"])
+        where = bind(plan.where, plan.bindings({"me": "octocat"}))
+        self.assertEqual(where.right.right.value, "octocat")
+
+    def test_binding_errors(self):
+        plan = build_plan("SELECT * FROM a.b.issues WHERE number > :n")
+        for params in [{}, {"n": 1, "m": 2}, [1], {"n": 1.5}]:
+            with self.assertRaises(RuntimeError):
+                plan.bindings(params)
+        with self.assertRaises(RuntimeError):
+            build_plan("SELECT * FROM a.b.issues WHERE number > ? AND user = :me")
+
+    def test_unchanged_subtrees_are_shared(self):
+        plan = build_plan(
+            "SELECT * FROM a.b.issues WHERE state = 'open' AND number > ?"
+        )
+        where = bind(plan.where, plan.bindings([1]))
+        self.assertIs(where.left, plan.where.left)
+
+
+class TestPlanCache(unittest.TestCase):
+    def test_normalized_queries_share_a_plan(self):
+        cache = PlanCache(8)
+        plan = cache.prepare("SELECT  title\nFROM a.b.issues  WHERE title = 'a  b';")
+        self.assertIs(
+            cache.prepare("SELECT title FROM a.b.issues WHERE title = 'a  b'"), plan
+        )
+        self.assertEqual(cache.counters(), {"hits": 1, "misses": 1})
+        self.assertEqual(plan.where.right.value, "a  b")
+
+    def test_lru_eviction(self):
+        cache = PlanCache(2)
+        first = cache.prepare("SELECT * FROM a.b.issues LIMIT 1")
+        cache.prepare("SELECT * FROM a.b.issues LIMIT 2")
+        cache.prepare("SELECT * FROM a.b.issues LIMIT 1")
+        cache.prepare("SELECT * FROM a.b.issues LIMIT 3")
+        self.assertEqual(cache.size(), 2)
+        self.assertIs(cache.prepare("SELECT * FROM a.b.issues LIMIT 1"), first)
+        cache.prepare("SELECT * FROM a.b.issues LIMIT 2")
+        self.assertEqual(cache.counters(), {"hits": 2, "misses": 4})
+
+    def test_normalize(self):
+        self.assertEqual(normalize("  SELECT *\t FROM x ;  "), "SELECT * FROM x")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,316 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from aggregate import Aggregate, canonical, parse_aggregate
+from expression import (
+    BinaryExpression,
+    Expression,
+    ExpressionType,
+    LiteralExpression,
+    UnaryExpression,
+)
+from parser import Parser
+from tokenizer import Token, Tokenizer, TokenType
+
+
+logger = logging.getLogger(__name__)
+
+
+# Tokens that end a WHERE or ORDER BY clause
+CLAUSE_ENDS: tuple[TokenType, ...] = (
+    TokenType.GROUP_BY,
+    TokenType.ORDER_BY,
+    TokenType.LIMIT,
+    TokenType.SEMI_COLON,
+)
+
+OPERANDS: tuple[TokenType, ...] = (
+    TokenType.COLUMN_PH,
+    TokenType.NUMBER,
+    TokenType.STRING,
+    TokenType.PARAMETER,
+)
+
+LITERAL_TYPES: dict[type, ExpressionType] = {
+    int: ExpressionType.INT,
+    str: ExpressionType.STR,
+}
+
+
+# Everything a query needs before it runs: the parsed clauses with parameters
+# left as placeholders, so one plan serves every binding of the same query
+class Plan:
+    def __init__(self, query: str):
+        self.query: str = query
+        self.columns: list[str] = []
+        self.source: Token | None = None
+        # FROM <source> [AS alias] JOIN <source> [AS alias] ON <condition>;
+        # an alias defaults to the last part of its source name
+        self.source_alias: str | None = None
+        self.join_source: Token | None = None
+        self.join_alias: str | None = None
+        self.join_on: Expression | None = None
+        self.limit: Token | None = None
+        self.where: Expression | None = None
+        self.order_by: list[tuple[Expression, bool]] = []
+        self.group_by: list[str] = []
+        self.aggregates: list[Aggregate] = []
+        self.parameters: list[str] = []
+        self.positional: bool = False
+        # EXPLAIN shows the plan ("plan"), EXPLAIN ANALYZE runs the query
+        # and shows what each operator cost ("analyze")
+        self.explain: str | None = None
+
+    # Map the caller's values onto parameter names: a list binds `?`
+    # placeholders in order, a dict binds `:name` ones
+    def bindings(self, params: list | dict | None) -> dict[str, object]:
+        if params is None:
+            params = [] if self.positional else {}
+        if isinstance(params, (list, tuple)):
+            if not self.positional and self.parameters:
+                raise RuntimeError("Query has named parameters, bind them by name")
+            values: dict = {str(i + 1): v for i, v in enumerate(params)}
+        else:
+            if self.positional:
+                raise RuntimeError("Query has ? parameters, bind them in order")
+            values = dict(params)
+        missing: list[str] = [p for p in self.parameters if p not in values]
+        if missing:
+            raise RuntimeError(f"Missing values for parameters: {missing}")
+        extra: list[str] = [p for p in values if p not in self.parameters]
+        if extra:
+            raise RuntimeError(f"Unknown parameters: {extra}")
+        for name, value in values.items():
+            if type(value) not in LITERAL_TYPES:
+                raise RuntimeError(f"Parameter {name} must be an int or a string")
+        return values
+
+    def limit_for(self, values: dict[str, object]) -> int | None:
+        if self.limit is None:
+            return None
+        if self.limit.type == TokenType.PARAMETER:
+            limit = values[self.limit.value]
+            if type(limit) != int:
+                raise RuntimeError("LIMIT must be an int")
+            return limit
+        return int(self.limit.value)
+
+    def joined(self) -> bool:
+        return self.join_source is not None
+
+    # Rows are folded into groups instead of being output one by one
+    def aggregating(self) -> bool:
+        return bool(self.aggregates or self.group_by)
+
+
+# Replace parameter placeholders with literals, sharing unchanged subtrees
+def bind(expr: Expression | None, values: dict[str, object]) -> Expression | None:
+    if isinstance(expr, LiteralExpression):
+        if expr.type != ExpressionType.PARAM:
+            return expr
+        value = values[expr.value]
+        return LiteralExpression(value, LITERAL_TYPES[type(value)])
+    if isinstance(expr, UnaryExpression):
+        right: Expression = bind(expr.right, values)
+        return expr if right is expr.right else UnaryExpression(expr.operator, right)
+    if isinstance(expr, BinaryExpression):
+        left: Expression = bind(expr.left, values)
+        right = bind(expr.right, values)
+        if left is expr.left and right is expr.right:
+            return expr
+        return BinaryExpression(left, expr.operator, right)
+    return expr
+
+
+# Collapse whitespace outside string literals, so reformatted copies of a
+# query share one cache entry
+def normalize(query: str) -> str:
+    parts: list[str] = query.split("'")
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "'".join(parts).strip().rstrip(";").rstrip()
+
+
+def _number_parameters(tokens: list[Token]) -> tuple[list[str], bool]:
+    names: list[str] = []
+    positional: int = 0
+    for token in tokens:
+        if token.type != TokenType.PARAMETER:
+            continue
+        if token.value is None:
+            positional += 1
+            token.value = str(positional)
+        if token.value not in names:
+            names.append(token.value)
+    if positional and len(names) != positional:
+        raise RuntimeError("Can't mix ? and :name parameters")
+    return names, positional > 0
+
+
+# ORDER BY <expr> [ASC | DESC] [, ...]. Commas are dropped by the
+# tokenizer, so a new key starts where an operand follows an operand.
+def _parse_order_by(tokenizer: Tokenizer) -> list[tuple[Expression, bool]]:
+    keys: list[tuple[Expression, bool]] = []
+    parser: Parser = Parser()
+    previous: TokenType | None = None
+    while tokenizer.has_next() and tokenizer.current_token().type not in CLAUSE_ENDS:
+        token = tokenizer.next_token()
+        if token.type in (TokenType.ASC, TokenType.DESC):
+            keys.append((parser.parse(), token.type == TokenType.DESC))
+            parser = Parser()
+            previous = None
+            continue
+        if token.type in OPERANDS and previous in OPERANDS:
+            keys.append((parser.parse(), False))
+            parser = Parser()
+        if token.type == TokenType.COLUMN_PH:
+            token.value = canonical(token.value)
+        parser.add_token(token)
+        previous = token.type
+    if len(parser.tokens) > 0:
+        keys.append((parser.parse(), False))
+    return keys
+
+
+# <source> [AS alias]: the alias names the source in qualified columns
+def _parse_source(tokenizer: Tokenizer) -> tuple[Token, str]:
+    source: Token = tokenizer.next_token()
+    alias: str = source.value.split(".")[-1]
+    if tokenizer.has_next() and tokenizer.current_token().type == TokenType.AS:
+        tokenizer.next_token()  # Skip AS keyword
+        if (
+            not tokenizer.has_next()
+            or tokenizer.current_token().type != TokenType.COLUMN_PH
+        ):
+            raise RuntimeError(f"AS must be followed by an alias for {source.value}")
+        alias = tokenizer.next_token().value
+    elif tokenizer.has_next() and tokenizer.current_token().type == TokenType.COLUMN_PH:
+        alias = tokenizer.next_token().value
+    return source, alias
+
+
+def build_plan(query: str) -> Plan:
+    logger.debug(f"Planning query: {query}")
+    plan: Plan = Plan(query)
+    tokenizer: Tokenizer = Tokenizer()
+    tokenizer.tokenize(query)
+    plan.parameters, plan.positional = _number_parameters(tokenizer.tokens)
+    parser: Parser = Parser()
+    while tokenizer.has_next():
+        token = tokenizer.current_token()
+        if token.type == TokenType.EXPLAIN:
+            if tokenizer.index != 0:
+                raise RuntimeError("EXPLAIN must start the query")
+            tokenizer.next_token()
+            plan.explain = "plan"
+            if (
+                tokenizer.has_next()
+                and tokenizer.current_token().type == TokenType.ANALYZE
+            ):
+                tokenizer.next_token()
+                plan.explain = "analyze"
+        elif token.type == TokenType.SELECT:
+            tokenizer.next_token()
+            if tokenizer.current_token().type == TokenType.ASTERISK:
+                tokenizer.next_token()
+            while tokenizer.current_token().type == TokenType.COLUMN_PH:
+                column: str = tokenizer.next_token().value
+                aggregate: Aggregate | None = parse_aggregate(column)
+                if aggregate is not None:
+                    plan.aggregates.append(aggregate)
+                    column = aggregate.name
+                plan.columns.append(column)
+        elif token.type == TokenType.SOURCE:
+            if plan.source is None:
+                plan.source, plan.source_alias = _parse_source(tokenizer)
+            elif plan.join_source is None:
+                plan.join_source, plan.join_alias = _parse_source(tokenizer)
+            else:
+                raise RuntimeError("Only one JOIN per query is supported")
+        elif token.type == TokenType.ON:
+            tokenizer.next_token()  # Skip ON keyword
+            on_parser: Parser = Parser()
+            while (
+                tokenizer.has_next()
+                and tokenizer.current_token().type not in CLAUSE_ENDS
+                and tokenizer.current_token().type != TokenType.WHERE
+            ):
+                on_parser.add_token(tokenizer.next_token())
+            plan.join_on = on_parser.parse()
+        elif token.type == TokenType.LIMIT:
+            tokenizer.next_token()  # Skip LIMIT keyword
+            plan.limit = tokenizer.next_token()
+        elif token.type == TokenType.WHERE:
+            tokenizer.next_token()  # Skip WHERE keyword
+            while (
+                tokenizer.has_next()
+                and tokenizer.current_token().type not in CLAUSE_ENDS
+            ):
+                parser.add_token(tokenizer.next_token())
+        elif token.type == TokenType.GROUP_BY:
+            tokenizer.next_token()  # Skip GROUP BY keyword
+            while (
+                tokenizer.has_next()
+                and tokenizer.current_token().type == TokenType.COLUMN_PH
+            ):
+                plan.group_by.append(tokenizer.next_token().value)
+        elif token.type == TokenType.ORDER_BY:
+            tokenizer.next_token()  # Skip ORDER BY keyword
+            plan.order_by = _parse_order_by(tokenizer)
+        else:
+            tokenizer.next_token()
+    plan.where = parser.parse()
+    if plan.joined():
+        if plan.join_on is None:
+            raise RuntimeError("JOIN needs an ON condition")
+        if plan.source_alias == plan.join_alias:
+            raise RuntimeError(
+                f"Both sources are named {plan.source_alias}, give them aliases with AS"
+            )
+    if plan.aggregating():
+        if len(plan.columns) == 0:
+            raise RuntimeError("SELECT * can't be used with aggregates or GROUP BY")
+        aggregated: set[str] = {a.name for a in plan.aggregates}
+        for column in plan.columns:
+            if column not in aggregated and column not in plan.group_by:
+                raise RuntimeError(f"{column} must be aggregated or in GROUP BY")
+    return plan
+
+
+# LRU cache of plans keyed by normalized query text
+class PlanCache:
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        self.plans: OrderedDict[str, Plan] = OrderedDict()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def prepare(self, query: str) -> Plan:
+        key: str = normalize(query)
+        with self.lock:
+            plan: Plan | None = self.plans.get(key)
+            if plan is not None:
+                self.hits += 1
+                self.plans.move_to_end(key)
+                return plan
+            self.misses += 1
+        plan = build_plan(key)
+        if self.max_size <= 0:
+            return plan
+        with self.lock:
+            self.plans[key] = plan
+            while len(self.plans) > self.max_size:
+                self.plans.popitem(last=False)
+        return plan
+
+    def size(self) -> int:
+        return len(self.plans)
+
+    def clear(self):
+        with self.lock:
+            self.plans.clear()
+
+    def counters(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
@@ -0,0 +1,60 @@
+import threading
+import time
+import unittest
+from prefetch import Prefetcher
+
+
+class TestPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.fetched: list[int] = []
+        self.lock = threading.Lock()
+
+    def fetch(self, page: int) -> list[int]:
+        with self.lock:
+            self.fetched.append(page)
+        time.sleep(0.01 * (3 - page % 3))  # finish out of order
+        if page >= 5:
+            return []
+        return [page * 10 + i for i in range(10 if page < 4 else 3)]
+
+    def test_pages_come_back_in_order(self):
+        prefetcher = Prefetcher(self.fetch, depth=3)
+        rows: list[int] = []
+        while not prefetcher.exhausted:
+            rows.extend(prefetcher.next())
+        self.assertEqual(
+            rows,
+            [p * 10 + i for p in range(4) for i in range(10)] + [40, 41, 42],
+        )
+        self.assertEqual(prefetcher.next(), [])
+        prefetcher.close()
+
+    def test_short_pages_dont_end_the_stream(self):
+        pages = [[1, 2], [3], [4, 5]]
+        prefetcher = Prefetcher(
+            lambda page: pages[page] if page < len(pages) else [], depth=2
+        )
+        rows: list[int] = []
+        while not prefetcher.exhausted:
+            rows.extend(prefetcher.next())
+        prefetcher.close()
+        self.assertEqual(rows, [1, 2, 3, 4, 5])
+
+    def test_prefetches_ahead(self):
+        prefetcher = Prefetcher(self.fetch, depth=3)
+        prefetcher.next()
+        self.assertEqual(len(prefetcher.pending), 3)
+        self.assertEqual(prefetcher.next_page, 4)
+        prefetcher.close()
+
+    def test_close_stops_fetching(self):
+        prefetcher = Prefetcher(self.fetch, depth=2)
+        prefetcher.next()
+        prefetcher.close()
+        self.assertEqual(prefetcher.next(), [])
+        time.sleep(0.05)
+        self.assertLessEqual(max(self.fetched), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import logging
+from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+logger = logging.getLogger(__name__)
+
+
+# Fetches the next `depth` pages in background threads while the caller works
+# on the current one. Pages come back in order; an empty page ends the stream.
+# Short pages don't: a search's created ranges and pages filtered after
+# fetching can come back short before the end.
+class Prefetcher:
+    def __init__(
+        self,
+        fetch_page: Callable[[int], list],
+        depth: int,
+        workers: int | None = None,
+    ):
+        self.fetch_page: Callable[[int], list] = fetch_page
+        self.depth: int = max(depth, 1)
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=workers or self.depth, thread_name_prefix="gitql-prefetch"
+        )
+        self.pending: deque[Future] = deque()
+        self.next_page: int = 0
+        self.exhausted: bool = False
+        self.closed: bool = False
+        self._fill()
+
+    def _fill(self):
+        while not self.closed and not self.exhausted and len(self.pending) < self.depth:
+            logger.debug(f"Prefetching page {self.next_page}")
+            self.pending.append(self.executor.submit(self.fetch_page, self.next_page))
+            self.next_page += 1
+
+    # Whether `next` would return without waiting
+    def ready(self) -> bool:
+        return self.closed or not self.pending or self.pending[0].done()
+
+    # Block until the oldest outstanding page is available
+    def next(self) -> list:
+        if self.closed or not self.pending:
+            return []
+        page: list = self.pending.popleft().result()
+        if not page:
+            # anything queued after the last page is empty too
+            self.exhausted = True
+            self._cancel()
+        self._fill()
+        return page
+
+    def _cancel(self):
+        while self.pending:
+            self.pending.pop().cancel()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
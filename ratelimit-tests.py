@@ -0,0 +1,161 @@
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from github import Github
+import transport
+from ratelimit import Budget, Scheduler, resource_for
+
+
+def rate_headers(remaining: int, limit: int = 5000, resource: str = "core") -> dict:
+    return {
+        "x-ratelimit-limit": str(limit),
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-reset": str(int(time.time()) + 3600),
+        "x-ratelimit-resource": resource,
+    }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Authorization header of every request, and tokens to answer 429 to once
+    requests: list[str] = []
+    limited: set[str] = set()
+
+    def do_GET(self):
+        token: str = self.headers.get("Authorization")
+        StubHandler.requests.append(token)
+        if token in StubHandler.limited:
+            StubHandler.limited.discard(token)
+            self.send_response(429)
+            self.send_header("Retry-After", "1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body: bytes = json.dumps(
+            {"login": "octocat", "url": f"http://{self.headers['Host']}{self.path}"}
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        for name, value in rate_headers(4000 if token == "token a" else 100).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResources(unittest.TestCase):
+    def test_resource_for(self):
+        self.assertEqual(resource_for("/search/issues?q=x"), "search")
+        self.assertEqual(resource_for("/graphql"), "graphql")
+        self.assertEqual(resource_for("/api/graphql"), "graphql")
+        self.assertEqual(resource_for("/repos/a/b/issues?page=2"), "core")
+
+
+class TestBudget(unittest.TestCase):
+    def test_unpaced_above_the_low_water_mark(self):
+        scheduler = Scheduler(["a"])
+        for _ in range(4000):
+            scheduler.acquire("core")
+        self.assertEqual(scheduler.counters()["waited"], 0.0)
+        self.assertEqual(scheduler.tokens[0].budget("core").remaining, 1000)
+
+    def test_burst_then_paced_below_the_low_water_mark(self):
+        budget: Budget = Budget("core")
+        budget.remaining = 1000
+        budget.reset = time.time() + 3600
+        for _ in range(100):
+            self.assertEqual(budget.wait(), 0.0)
+            budget.tokens -= 1
+        # 1000 requests over an hour leave 3.6s between paced requests
+        self.assertAlmostEqual(budget.wait(), 3.6, delta=0.1)
+
+    def test_exhausted_waits_for_reset(self):
+        budget: Budget = Budget("core")
+        budget.remaining = 0
+        budget.reset = time.time() + 30
+        self.assertAlmostEqual(budget.wait(), 30, delta=1)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler(["a", "b"])
+
+    def test_prefers_most_remaining_quota(self):
+        a, b = self.scheduler.tokens
+        self.scheduler.update(a, "core", 200, rate_headers(10), "", 0)
+        self.scheduler.update(b, "core", 200, rate_headers(4000), "", 0)
+        self.assertIs(self.scheduler.acquire("core"), b)
+
+    def test_budgets_are_per_resource(self):
+        a, _ = self.scheduler.tokens
+        self.scheduler.update(a, "search", 200, rate_headers(5, 30, "search"), "", 0)
+        self.assertEqual(a.budget("search").remaining, 5)
+        self.assertEqual(a.budget("core").remaining, 5000)
+
+    def test_rate_limited_token_is_rotated_out(self):
+        a, b = self.scheduler.tokens
+        headers: dict = {**rate_headers(0), "retry-after": "60"}
+        delay = self.scheduler.update(a, "core", 429, headers, "", 0)
+        self.assertEqual(delay, 0.0)
+        self.assertIs(self.scheduler.acquire("core"), b)
+        self.assertEqual(self.scheduler.counters()["retries"], 1)
+
+    def test_permission_errors_are_not_retried(self):
+        a, _ = self.scheduler.tokens
+        delay = self.scheduler.update(a, "core", 403, {}, '{"message": "Forbidden"}', 0)
+        self.assertIsNone(delay)
+
+    def test_server_errors_back_off(self):
+        a, _ = self.scheduler.tokens
+        delay = self.scheduler.update(a, "core", 502, {}, "", 3)
+        self.assertTrue(0 <= delay <= 8)
+        self.assertIsNone(self.scheduler.update(a, "core", 502, {}, "", 6))
+
+    def test_usage_sums_the_pool(self):
+        a, b = self.scheduler.tokens
+        self.scheduler.update(a, "core", 200, rate_headers(10), "", 0)
+        self.scheduler.update(b, "core", 200, rate_headers(20), "", 0)
+        self.assertEqual(self.scheduler.usage(), {"core": (30, 10000)})
+
+
+class TestScheduledConnection(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        transport.install(None)
+
+    def setUp(self):
+        StubHandler.requests.clear()
+        self.scheduler = Scheduler(["a", "b"])
+        transport.install(None, self.scheduler)
+        host, port = self.server.server_address
+        self.git = Github(base_url=f"http://{host}:{port}", retry=None)
+
+    def test_requests_rotate_on_rate_limit(self):
+        StubHandler.limited = {"token b"}
+        self.scheduler.tokens[0].budget("core").remaining = 1000
+        self.scheduler.tokens[1].budget("core").remaining = 2000
+        self.assertEqual(self.git.get_user("octocat").login, "octocat")
+        self.assertEqual(StubHandler.requests, ["token b", "token a"])
+        # the 429 reported no headers, so b keeps its own count
+        self.assertEqual(self.scheduler.usage()["core"][0], 4000 + 1999)
+
+    def test_budget_follows_headers(self):
+        self.git.get_user("octocat").login
+        self.git.get_user("octocat").login
+        # a is first among equals, b has more quota after a's first response
+        self.assertEqual(StubHandler.requests, ["token a", "token b"])
+        self.assertEqual(self.scheduler.tokens[0].budget("core").remaining, 4000)
+
+
+if __name__ == "__main__":
+    unittest.main()
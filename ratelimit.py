@@ -0,0 +1,200 @@
+import logging
+import random
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+# Budgets GitHub documents per token and hour (search: per minute), used
+# until the first response reports the real ones
+DEFAULT_LIMITS: dict[str, tuple[int, int]] = {
+    "core": (5000, 3600),
+    "search": (30, 60),
+    "graphql": (5000, 3600),
+}
+
+# Share of the limit below which requests are paced: above it they go out as
+# fast as they come, below it what is left is spread evenly until the window
+# resets, so a long scan slows down instead of hitting the wall
+LOW_WATER_FRACTION: float = 0.2
+
+# Share of the remaining budget that may still be spent in a burst once
+# requests are paced
+BURST_FRACTION: float = 0.1
+
+RETRY_STATUSES: set[int] = {403, 429, 500, 502, 503, 504}
+MAX_ATTEMPTS: int = 6
+BACKOFF_BASE: float = 1.0
+BACKOFF_MAX: float = 60.0
+
+
+def resource_for(url: str) -> str:
+    path: str = url.split("?", 1)[0]
+    if path.startswith("/search/"):
+        return "search"
+    if path.rstrip("/").endswith("/graphql"):
+        return "graphql"
+    return "core"
+
+
+# Quota of one token for one API resource, refilled as a token bucket
+class Budget:
+    def __init__(self, resource: str):
+        limit, window = DEFAULT_LIMITS.get(resource, DEFAULT_LIMITS["core"])
+        self.limit: int = limit
+        self.remaining: int = limit
+        self.reset: float = time.time() + window
+        self.blocked_until: float = 0.0
+        self.tokens: float = max(1.0, limit * BURST_FRACTION)
+        self.refilled_at: float = time.monotonic()
+
+    def paced(self) -> bool:
+        return self.remaining <= self.limit * LOW_WATER_FRACTION
+
+    def capacity(self) -> float:
+        return max(1.0, self.remaining * BURST_FRACTION)
+
+    # Requests per second that spend the remaining budget by the reset
+    def rate(self) -> float:
+        return max(self.remaining, 1) / max(self.reset - time.time(), 1.0)
+
+    def refill(self):
+        now: float = time.monotonic()
+        self.tokens = min(
+            self.capacity(), self.tokens + (now - self.refilled_at) * self.rate()
+        )
+        self.refilled_at = now
+
+    # Seconds until a request may go out with this budget
+    def wait(self) -> float:
+        now: float = time.time()
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.remaining <= 0 and self.reset > now:
+            return self.reset - now
+        if not self.paced():
+            # the burst allowance starts full once pacing does
+            self.tokens = self.capacity()
+            self.refilled_at = time.monotonic()
+            return 0.0
+        self.refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate()
+
+
+class PoolToken:
+    def __init__(self, index: int, secret: str):
+        self.index: int = index
+        self.secret: str = secret
+        self.budgets: dict[str, Budget] = {}
+
+    def budget(self, resource: str) -> Budget:
+        if resource not in self.budgets:
+            self.budgets[resource] = Budget(resource)
+        return self.budgets[resource]
+
+
+# Decides which token every request goes out with and when. Tracks the
+# X-RateLimit-* headers per token and resource, paces requests so each
+# budget lasts until its reset, rotates to the token with the most quota,
+# and backs off with jitter on rate limit and server errors.
+class Scheduler:
+    def __init__(self, secrets: list[str]):
+        self.tokens: list[PoolToken] = [
+            PoolToken(i, secret) for i, secret in enumerate(secrets)
+        ]
+        self.lock: threading.Lock = threading.Lock()
+        self.waited: float = 0.0
+        self.retries: int = 0
+
+    def acquire(self, resource: str) -> PoolToken | None:
+        if len(self.tokens) == 0:
+            return None
+        while True:
+            with self.lock:
+                # soonest available first, then the most remaining quota
+                budgets: list[tuple[float, int, PoolToken]] = [
+                    (budget.wait(), -budget.remaining, token)
+                    for token in self.tokens
+                    for budget in [token.budget(resource)]
+                ]
+                delay, _, token = min(budgets, key=lambda b: b[:2])
+                if delay <= 0:
+                    budget: Budget = token.budget(resource)
+                    budget.tokens -= 1
+                    # until the response reports the real count
+                    budget.remaining -= 1
+                    return token
+            if delay > 1:
+                logger.warning(f"Waiting {delay:.1f}s for {resource} rate limit")
+            self.sleep(delay)
+
+    # Record the response's rate limit headers. Returns the seconds to wait
+    # before retrying, or None when the response should be returned as is.
+    def update(
+        self,
+        token: PoolToken | None,
+        resource: str,
+        status: int,
+        headers: dict[str, str],
+        body: str,
+        attempt: int,
+    ) -> float | None:
+        if token is not None:
+            with self.lock:
+                budget: Budget = token.budget(
+                    headers.get("x-ratelimit-resource", resource)
+                )
+                if "x-ratelimit-remaining" in headers:
+                    budget.remaining = int(headers["x-ratelimit-remaining"])
+                    budget.limit = int(headers.get("x-ratelimit-limit", budget.limit))
+                    budget.reset = float(
+                        headers.get("x-ratelimit-reset", budget.reset)
+                    )
+        if status not in RETRY_STATUSES or attempt >= MAX_ATTEMPTS:
+            return None
+        if status == 403 and "rate limit" not in body.lower():
+            return None  # a permission error, not a rate limit
+        self.retries += 1
+        retry_after: str | None = headers.get("retry-after")
+        if token is not None and status in (403, 429):
+            with self.lock:
+                budget = token.budget(resource)
+                if retry_after is not None:
+                    budget.blocked_until = time.time() + float(retry_after)
+                elif budget.remaining > 0:
+                    # secondary limit without a hint: rest this token a while
+                    budget.blocked_until = time.time() + self.backoff(attempt)
+            logger.warning(
+                f"Rate limited on {resource} with token #{token.index}, rotating"
+            )
+            return 0.0  # acquire waits for, or rotates away from, the token
+        return float(retry_after) if retry_after else self.backoff(attempt)
+
+    # Exponential backoff with full jitter
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+    def sleep(self, seconds: float):
+        if seconds <= 0:
+            return
+        with self.lock:
+            self.waited += seconds
+        time.sleep(seconds)
+
+    # resource -> (remaining, limit) summed over the pool
+    def usage(self) -> dict[str, tuple[int, int]]:
+        usage: dict[str, tuple[int, int]] = {}
+        with self.lock:
+            for token in self.tokens:
+                for resource, budget in token.budgets.items():
+                    remaining, limit = usage.get(resource, (0, 0))
+                    usage[resource] = (
+                        remaining + budget.remaining,
+                        limit + budget.limit,
+                    )
+        return usage
+
+    def counters(self) -> dict[str, float]:
+        return {"waited": self.waited, "retries": self.retries}
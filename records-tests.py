@@ -0,0 +1,60 @@
+import unittest
+from records import Loader, Record, Row, record_type
+
+
+IssueRecord = record_type(
+    "IssueRecord", ["number", "state", "labels", "closed_by"], {"state", "labels"}
+)
+
+
+class TestSlottedRecord(unittest.TestCase):
+    def setUp(self):
+        self.fetched: list[tuple[int, str]] = []
+        self.loader = Loader(self.fetch, {"closed_by"})
+
+    def fetch(self, record, column: str):
+        self.fetched.append((record.get("number"), column))
+        return "octocat"
+
+    def test_values(self):
+        record = IssueRecord({"number": 1, "state": "open"})
+        self.assertEqual(record["number"], 1)
+        self.assertIsNone(record.get("labels"))
+        self.assertIsNone(record.get("missing"))
+        self.assertNotIn("labels", record)
+        with self.assertRaises(KeyError):
+            record["labels"]
+        self.assertEqual(record.as_dict(), {"number": 1, "state": "open"})
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_detail_columns_load_once(self):
+        record = IssueRecord({"number": 7, "state": "open"}, self.loader)
+        self.assertIn("closed_by", record)
+        self.assertFalse(record.is_loaded("closed_by"))
+        self.assertEqual(record.keys(), ["number", "state", "closed_by"])
+        self.assertEqual(record["closed_by"], "octocat")
+        self.assertEqual(record.get("closed_by"), "octocat")
+        self.assertEqual(self.fetched, [(7, "closed_by")])
+
+    def test_strings_are_shared(self):
+        state: str = "".join(["cl", "osed"])
+        a = IssueRecord({"state": state, "labels": ["".join(["b", "ug"])]})
+        b = IssueRecord({"state": "closed", "labels": ["bug"]})
+        self.assertIs(a.state, b.state)
+        self.assertIs(a.labels[0], b.labels[0])
+
+    def test_both_row_types_read_alike(self):
+        rows: list[Row] = [
+            IssueRecord({"number": 7, "state": "open"}, self.loader),
+            Record({"number": 7, "state": "open"}, {"closed_by": lambda: "octocat"}),
+        ]
+        for row in rows:
+            self.assertIsInstance(row, Row)
+            self.assertEqual(row["number"], 7)
+            self.assertEqual(row.values(), [7, "open", "octocat"])
+            with self.assertRaises(KeyError):
+                row["missing"]
+
+
+if __name__ == "__main__":
+    unittest.main()
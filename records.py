@@ -0,0 +1,158 @@
+import sys
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+
+
+# What the rest of a query reads a row through, whether its columns sit in a
+# dict (Record) or in slots (SlottedRecord)
+class Row(ABC):
+    __slots__ = ()
+
+    @abstractmethod
+    def get(self, key: str, default=None):
+        pass
+
+    @abstractmethod
+    def __contains__(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def is_loaded(self, key: str) -> bool:
+        pass
+
+    @abstractmethod
+    def keys(self) -> list[str]:
+        pass
+
+    @abstractmethod
+    def as_dict(self) -> dict:
+        pass
+
+    def __getitem__(self, key: str):
+        if key not in self:
+            raise KeyError(key)
+        return self.get(key)
+
+    def values(self) -> list:
+        return [self.get(key) for key in self.keys()]
+
+
+# A row whose expensive columns are loaded on first access. Loaders usually
+# cost an extra API call, so they only run for rows that reach them.
+class Record(Row):
+    __slots__ = ("values_", "loaders")
+
+    def __init__(self, values: dict, loaders: dict[str, Callable] | None = None):
+        self.values_: dict = values
+        self.loaders: dict[str, Callable] = loaders or {}
+
+    def get(self, key: str, default=None):
+        if key in self.values_:
+            return self.values_[key]
+        loader: Callable | None = self.loaders.pop(key, None)
+        if loader is None:
+            return default
+        self.values_[key] = loader()
+        return self.values_[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.values_ or key in self.loaders
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self.values_
+
+    def keys(self) -> list[str]:
+        return list(self.values_.keys()) + list(self.loaders.keys())
+
+    def as_dict(self) -> dict:
+        return dict(self.values_)
+
+    def __repr__(self):
+        return f"Record({self.values_}, lazy={list(self.loaders.keys())})"
+
+
+# Fetches a record's detail columns on first access. One instance is shared
+# by every record of a query, so rows don't keep API objects alive.
+class Loader:
+    __slots__ = ("fetch", "columns")
+
+    def __init__(self, fetch: Callable[["SlottedRecord", str], object], columns):
+        self.fetch: Callable[[SlottedRecord, str], object] = fetch
+        self.columns: frozenset[str] = frozenset(columns)
+
+
+# Base of the per-source record types made by `record_type`: one slot per
+# column instead of a dict per row, unset slots being columns not fetched
+class SlottedRecord(Row):
+    __slots__ = ("_loader",)
+    COLUMNS: tuple[str, ...] = ()
+    FIELDS: frozenset[str] = frozenset()
+    INTERNED: frozenset[str] = frozenset()
+
+    def __init__(self, values: dict, loader: Loader | None = None):
+        self._loader: Loader | None = loader
+        interned: frozenset[str] = self.INTERNED
+        for key, value in values.items():
+            if key in interned:
+                value = _intern(value)
+            setattr(self, key, value)
+
+    def get(self, key: str, default=None):
+        if key not in self.FIELDS:
+            return default
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            pass
+        loader: Loader | None = self._loader
+        if loader is None or key not in loader.columns:
+            return default
+        value = loader.fetch(self, key)
+        setattr(self, key, value)
+        return value
+
+    # Store a detail column loaded ahead of access, see Context.load_details
+    def set(self, key: str, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return self.is_loaded(key) or (
+            self._loader is not None and key in self._loader.columns
+        )
+
+    def is_loaded(self, key: str) -> bool:
+        return key in self.FIELDS and hasattr(self, key)
+
+    def keys(self) -> list[str]:
+        return [key for key in self.COLUMNS if key in self]
+
+    # Loaded columns only, e.g. to store the row
+    def as_dict(self) -> dict:
+        return {key: getattr(self, key) for key in self.COLUMNS if hasattr(self, key)}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.as_dict()})"
+
+
+# Repeated strings (states, logins, label names) share one object
+def _intern(value):
+    if type(value) is str:
+        return sys.intern(value)
+    if type(value) is list:
+        return [sys.intern(v) if type(v) is str else v for v in value]
+    return value
+
+
+def record_type(
+    name: str, columns: list[str], interned: set[str] | None = None
+) -> type[SlottedRecord]:
+    return type(
+        name,
+        (SlottedRecord,),
+        {
+            "__slots__": tuple(columns),
+            "COLUMNS": tuple(columns),
+            "FIELDS": frozenset(columns),
+            "INTERNED": frozenset(interned or ()),
+        },
+    )
@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+from prefetch import Prefetcher
+from search import MAX_RESULTS, SearchCursor
+
+
+START: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+# Stand-in for the search API over issues created one per minute from START,
+# returning pages of `size` results newest first
+class FakeSearch:
+    def __init__(self, count: int, size: int = 100):
+        self.created: list[datetime] = [
+            START + timedelta(minutes=i) for i in range(count)
+        ]
+        self.size: int = size
+        self.queries: list[tuple[str, int]] = []
+
+    def __call__(self, query: str, page: int) -> tuple[int, list]:
+        self.queries.append((query, page))
+        bounds: str = query.split("created:")[1]
+        low, high = (
+            datetime.strptime(b, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+            for b in bounds.split("..")
+        )
+        matches: list[datetime] = sorted(
+            (c for c in self.created if low <= c <= high), reverse=True
+        )
+        readable: list[datetime] = matches[:MAX_RESULTS]
+        return len(matches), readable[(page - 1) * self.size : page * self.size]
+
+
+def read_all(cursor: SearchCursor) -> list:
+    rows: list = []
+    while cursor.has_next():
+        rows.extend(cursor.next_page())
+    return rows
+
+
+class TestSearchCursor(unittest.TestCase):
+    def test_small_result_in_one_range(self):
+        search = FakeSearch(250)
+        cursor = SearchCursor(search, "repo:a/b x", START, START + timedelta(days=1))
+        rows = read_all(cursor)
+        self.assertEqual(len(rows), 250)
+        self.assertEqual(cursor.splits, 0)
+        self.assertEqual([page for _, page in search.queries], [1, 2, 3])
+        self.assertTrue(search.queries[0][0].startswith("repo:a/b x created:"))
+
+    def test_cap_is_split_newest_first(self):
+        search = FakeSearch(2500)
+        cursor = SearchCursor(search, "q", START, START + timedelta(days=3))
+        rows = read_all(cursor)
+        self.assertEqual(len(rows), 2500)
+        self.assertEqual(len(set(rows)), 2500)
+        self.assertEqual(rows, sorted(rows, reverse=True))
+        self.assertGreater(cursor.splits, 0)
+        self.assertEqual(cursor.pages, len(search.queries))
+
+    def test_ascending_parts(self):
+        search = FakeSearch(1500)
+        cursor = SearchCursor(
+            search, "q", START, START + timedelta(days=2), ascending=True
+        )
+        rows = read_all(cursor)
+        # within a part results come in the API's order, parts oldest first
+        self.assertLess(rows[-1], rows[0] + timedelta(days=2))
+        self.assertLess(max(rows[:100]), min(rows[-100:]))
+
+    def test_prefetched_past_short_pages(self):
+        # the last page of every created range is short
+        search = FakeSearch(2500)
+        cursor = SearchCursor(search, "q", START, START + timedelta(days=3))
+        prefetcher = Prefetcher(lambda _: cursor.next_page(), depth=2, workers=1)
+        rows: list = []
+        while not prefetcher.exhausted:
+            rows.extend(prefetcher.next())
+        prefetcher.close()
+        self.assertEqual(len(rows), 2500)
+
+    def test_empty_page_reads_on(self):
+        search = FakeSearch(2500)
+        cursor = SearchCursor(search, "q", START, START + timedelta(days=3))
+        cursor.next_page()
+        # the rest of the first range was deleted since its first page
+        cursor.remaining = 50
+        cursor.page = 20
+        self.assertNotEqual(cursor.next_page(), [])
+
+    def test_no_results(self):
+        cursor = SearchCursor(FakeSearch(0), "q", START, START + timedelta(days=1))
+        self.assertEqual(cursor.next_page(), [])
+        self.assertFalse(cursor.has_next())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import logging
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+# Results the search API returns for one query, whatever its total_count
+MAX_RESULTS: int = 1000
+
+# Nothing on GitHub was created before
+EPOCH: datetime = datetime(2007, 10, 1, tzinfo=timezone.utc)
+
+
+def created_range(start: datetime, end: datetime) -> str:
+    return f"created:{start:%Y-%m-%dT%H:%M:%SZ}..{end:%Y-%m-%dT%H:%M:%SZ}"
+
+
+# Pages of an issue search read past the search API's 1000-result cap. A
+# created range matching more than that is split in halves until each part
+# fits. Results come sorted by creation date, and the parts are read newest
+# first (oldest first when ascending) so the order holds across parts.
+class SearchCursor:
+    def __init__(
+        self,
+        search: Callable[[str, int], tuple[int, list]],
+        query: str,
+        start: datetime,
+        end: datetime,
+        ascending: bool = False,
+    ):
+        # (query, page number) -> (total_count, items of the page)
+        self.search: Callable[[str, int], tuple[int, list]] = search
+        self.query: str = query
+        self.ascending: bool = ascending
+        # created ranges left to read, the next one last
+        self.ranges: list[tuple[datetime, datetime]] = [(start, end)]
+        self.range_query: str | None = None
+        self.page: int = 0
+        # results of the current range not read yet
+        self.remaining: int = 0
+        self.pages: int = 0
+        self.splits: int = 0
+
+    def has_next(self) -> bool:
+        return self.remaining > 0 or len(self.ranges) > 0
+
+    def _fetch(self, query: str, page: int) -> tuple[int, list]:
+        self.pages += 1
+        return self.search(query, page)
+
+    def _split(self, start: datetime, end: datetime):
+        middle: datetime = (start + (end - start) / 2).replace(microsecond=0)
+        older: tuple[datetime, datetime] = (start, middle)
+        newer: tuple[datetime, datetime] = (middle + timedelta(seconds=1), end)
+        self.ranges += [newer, older] if self.ascending else [older, newer]
+        self.splits += 1
+
+    def next_page(self) -> list:
+        if self.remaining > 0:
+            self.page += 1
+            _, items = self._fetch(self.range_query, self.page)
+            self.remaining = self.remaining - len(items) if items else 0
+            if items:
+                return items
+        # an empty page would end the scan, so read on to the next range
+        while self.ranges:
+            start, end = self.ranges.pop()
+            query: str = f"{self.query} {created_range(start, end)}"
+            total, items = self._fetch(query, 1)
+            if total > MAX_RESULTS:
+                if end - start > timedelta(seconds=1):
+                    logger.debug(f"{total} results from {start} to {end}, splitting")
+                    self._split(start, end)
+                    continue
+                logger.warning(
+                    f"{total} results created at {start}, "
+                    f"only the first {MAX_RESULTS} can be read"
+                )
+            if not items:
+                continue
+            self.range_query, self.page = query, 1
+            self.remaining = min(total, MAX_RESULTS) - len(items)
+            return items
+        return []
@@ -0,0 +1,125 @@
+import unittest
+from parser import Parser
+from planner import describe, split_conjuncts
+from records import Loader, record_type
+from selectivity import SelectivityStats
+from tokenizer import Tokenizer
+
+
+Issue = record_type("Issue", ["number", "state", "title", "closed_by"])
+
+EXPENSIVE: set[str] = {"closed_by"}
+
+
+def parse(where: str):
+    tokenizer: Tokenizer = Tokenizer(where)
+    parser: Parser = Parser()
+    while tokenizer.has_next():
+        parser.add_token(tokenizer.next_token())
+    return parser.parse()
+
+
+def order(expr) -> list[str]:
+    return [describe(conjunct) for conjunct in split_conjuncts(expr)]
+
+
+def issues(count: int) -> list:
+    return [
+        Issue(
+            {
+                "number": n,
+                "state": "open" if n % 2 else "closed",
+                "title": f"issue {n}",
+                "closed_by": "bot" if n % 10 == 0 else None,
+            },
+            Loader(lambda record, column: None, set()),
+        )
+        for n in range(count)
+    ]
+
+
+class TestReorder(unittest.TestCase):
+    def setUp(self):
+        self.stats = SelectivityStats()
+
+    def test_cheap_columns_first(self):
+        expr = parse("closed_by = 'bot' AND number > 3 AND state = 'open'")
+        self.assertEqual(
+            order(self.stats.reorder(expr, EXPENSIVE, "ISSUES")),
+            ["state = 'open'", "number > 3", "closed_by = 'bot'"],
+        )
+
+    def test_or_runs_the_likeliest_first(self):
+        expr = parse("state = 'open' OR number > 3")
+        self.assertEqual(
+            describe(self.stats.reorder(expr, EXPENSIVE, "ISSUES")),
+            "number > 3 OR state = 'open'",
+        )
+
+    def test_observed_selectivity_changes_the_order(self):
+        expr = parse("state = 'open' AND number > 3")
+        self.assertEqual(
+            order(self.stats.reorder(expr, EXPENSIVE, "ISSUES")),
+            ["state = 'open'", "number > 3"],
+        )
+        # state = 'open' passes half the rows, number > 3 almost none
+        predicate = self.stats.compile(parse("number > 3 AND state = 'open'"), "ISSUES")
+        self.assertEqual(len([r for r in issues(5) if predicate(r)]), 0)
+        predicate = self.stats.compile(expr, "ISSUES")
+        rows = [r for r in issues(200) if predicate(r)]
+        self.assertEqual(len(rows), 98)
+        self.assertEqual(
+            self.stats.observed("ISSUES", parse("state = 'open'")), (201, 100)
+        )
+        self.stats.counts[("ISSUES", "number > 3")] = [1000, 1]
+        self.assertEqual(
+            order(self.stats.reorder(expr, EXPENSIVE, "ISSUES")),
+            ["number > 3", "state = 'open'"],
+        )
+        # other sources keep their own stats
+        self.assertEqual(
+            order(self.stats.reorder(expr, EXPENSIVE, "PULL_REQUESTS")),
+            ["state = 'open'", "number > 3"],
+        )
+
+
+class TestObservedPredicates(unittest.TestCase):
+    def setUp(self):
+        self.stats = SelectivityStats()
+
+    def test_row_predicate_short_circuits(self):
+        expr = parse("state = 'open' AND number > 10")
+        predicate = self.stats.compile(expr, "ISSUES")
+        self.assertEqual(
+            [r.get("number") for r in issues(16) if predicate(r)], [11, 13, 15]
+        )
+        self.assertEqual(self.stats.observed("ISSUES", expr.left), (16, 8))
+        self.assertEqual(self.stats.observed("ISSUES", parse("number > 10")), (8, 3))
+
+    def test_batch_predicate_matches_row_predicate(self):
+        expr = parse("state = 'open' AND number > 10")
+        mask = self.stats.compile_batch(expr, "ISSUES")(issues(16))
+        self.assertEqual([i for i, keep in enumerate(mask) if keep], [11, 13, 15])
+        self.assertEqual(self.stats.observed("ISSUES", parse("number > 10")), (8, 3))
+
+    def test_empty_predicate(self):
+        self.assertIsNone(self.stats.compile(None, "ISSUES"))
+        self.assertIsNone(self.stats.compile_batch(None, "ISSUES"))
+
+    def test_least_recently_scanned_are_dropped(self):
+        self.stats = SelectivityStats(max_size=2)
+        for number in (1, 2, 1, 3):
+            self.stats.compile(parse(f"number > {number}"), "ISSUES")
+        self.assertEqual(
+            [predicate for _, predicate in self.stats.counts],
+            ["number > 1", "number > 3"],
+        )
+
+    def test_clear(self):
+        self.stats.compile(parse("state = 'open'"), "ISSUES")(issues(1)[0])
+        self.stats.clear()
+        self.assertIsNone(self.stats.observed("ISSUES", parse("state = 'open'")))
+
+
+if __name__ == "__main__":
+    unittest.main()
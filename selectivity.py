@@ -0,0 +1,206 @@
+import logging
+from collections import OrderedDict
+from batch import BatchCompiled, compile_batch, selected_indices
+from compiler import Compiled, compile_expression
+from expression import BinaryExpression, Expression, UnaryExpression
+from planner import describe, referenced_columns, split_conjuncts
+from records import Row
+from tokenizer import TokenType
+
+
+logger = logging.getLogger(__name__)
+
+
+# Relative cost of reading a column: detail columns take an API call per row,
+# every other column comes with the listed page
+COLUMN_COST: int = 1
+DETAIL_COST: int = 100
+
+# Share of rows a predicate is assumed to pass before any was observed
+DEFAULT_SELECTIVITY: dict[TokenType, float] = {
+    TokenType.EQUAL: 0.1,
+    TokenType.LIKE: 0.25,
+    TokenType.GREATER: 0.4,
+    TokenType.GEQ: 0.4,
+    TokenType.LESS: 0.4,
+    TokenType.LEQ: 0.4,
+}
+UNKNOWN_SELECTIVITY: float = 0.5
+
+# Rows the default estimate counts for when blended with observed rows, so a
+# handful of observations don't swing the order
+PRIOR_ROWS: int = 20
+
+# Keeps ordering keys finite for predicates passing all or no rows
+EPSILON: float = 1e-6
+
+# Predicates whose counts are kept; the least recently scanned go first
+MAX_PREDICATES: int = 1024
+
+
+def _and_or(expr: Expression) -> TokenType | None:
+    if isinstance(expr, BinaryExpression) and expr.operator in (
+        TokenType.AND,
+        TokenType.OR,
+    ):
+        return expr.operator
+    return None
+
+
+# Operands of a chain of one operator, e.g. [a, b, c] for a AND (b AND c)
+def _chain(expr: Expression, operator: TokenType) -> list[Expression]:
+    if isinstance(expr, BinaryExpression) and expr.operator == operator:
+        return _chain(expr.left, operator) + _chain(expr.right, operator)
+    return [expr]
+
+
+# Share of the rows each WHERE conjunct passed, observed while scanning and
+# kept for the session, so later queries order their predicates by what they
+# actually filter. Keyed by source and predicate text, literals included,
+# so only the `max_size` most recently scanned predicates are kept.
+class SelectivityStats:
+    def __init__(self, max_size: int = MAX_PREDICATES):
+        self.max_size: int = max_size
+        # (scope, predicate) -> [rows evaluated, rows passed]
+        self.counts: OrderedDict[tuple[str, str], list[int]] = OrderedDict()
+
+    def counter(self, scope: str, expr: Expression) -> list[int]:
+        key: tuple[str, str] = (scope, describe(expr))
+        counts: list[int] = self.counts.setdefault(key, [0, 0])
+        self.counts.move_to_end(key)
+        while len(self.counts) > self.max_size:
+            self.counts.popitem(last=False)
+        return counts
+
+    def observed(self, scope: str, expr: Expression) -> tuple[int, int] | None:
+        counts: list[int] | None = self.counts.get((scope, describe(expr)))
+        return tuple(counts) if counts else None
+
+    def estimate(self, scope: str, expr: Expression) -> float:
+        match _and_or(expr):
+            case TokenType.AND:
+                p: float = 1.0
+                for operand in _chain(expr, TokenType.AND):
+                    p *= self.selectivity(scope, operand)
+            case TokenType.OR:
+                p = 1.0
+                for operand in _chain(expr, TokenType.OR):
+                    p *= 1 - self.selectivity(scope, operand)
+                p = 1 - p
+            case _:
+                if isinstance(expr, UnaryExpression):
+                    p = 1 - self.selectivity(scope, expr.right)
+                elif isinstance(expr, BinaryExpression):
+                    p = DEFAULT_SELECTIVITY.get(expr.operator, UNKNOWN_SELECTIVITY)
+                else:
+                    p = UNKNOWN_SELECTIVITY
+        return p
+
+    # Observed pass rate blended with the estimate, the estimate alone for a
+    # predicate not seen yet
+    def selectivity(self, scope: str, expr: Expression) -> float:
+        prior: float = self.estimate(scope, expr)
+        counts: tuple[int, int] | None = self.observed(scope, expr)
+        if counts is None:
+            return prior
+        evaluated, passed = counts
+        return (passed + prior * PRIOR_ROWS) / (evaluated + PRIOR_ROWS)
+
+    def cost(self, expr: Expression, expensive: set[str]) -> int:
+        return sum(
+            DETAIL_COST if column in expensive else COLUMN_COST
+            for column in referenced_columns(expr)
+        ) or COLUMN_COST
+
+    # Rewrite AND and OR chains so the operands cheapest per row decided run
+    # first: for AND the ones failing most rows per unit of cost, for OR the
+    # ones passing most. Operands of equal rank keep the written order.
+    def reorder(
+        self, expr: Expression | None, expensive: set[str], scope: str
+    ) -> Expression | None:
+        if expr is None:
+            return None
+        if isinstance(expr, UnaryExpression):
+            return UnaryExpression(
+                expr.operator, self.reorder(expr.right, expensive, scope)
+            )
+        operator: TokenType | None = _and_or(expr)
+        if operator is None:
+            return expr
+        operands: list[Expression] = [
+            self.reorder(operand, expensive, scope)
+            for operand in _chain(expr, operator)
+        ]
+
+        def rank(operand: Expression) -> float:
+            p: float = self.selectivity(scope, operand)
+            decided: float = 1 - p if operator == TokenType.AND else p
+            return self.cost(operand, expensive) / max(decided, EPSILON)
+
+        operands.sort(key=rank)
+        result: Expression = operands[0]
+        for operand in operands[1:]:
+            result = BinaryExpression(result, operator, operand)
+        return result
+
+    # compile_expression for a WHERE predicate, counting the rows each of its
+    # conjuncts sees and passes. Conjuncts run in order and stop at the
+    # first one failing, like AND.
+    def compile(self, expr: Expression | None, scope: str) -> Compiled | None:
+        conjuncts: list[Expression] = split_conjuncts(expr)
+        if not conjuncts:
+            return None
+        steps: list[tuple[Compiled, list[int]]] = [
+            (compile_expression(c), self.counter(scope, c)) for c in conjuncts
+        ]
+
+        def evaluate(record: Row) -> bool:
+            for predicate, counts in steps:
+                counts[0] += 1
+                if not predicate(record):
+                    return False
+                counts[1] += 1
+            return True
+
+        return evaluate
+
+    # compile_batch counterpart of `compile`: each conjunct runs on the rows
+    # of the page the previous ones passed
+    def compile_batch(
+        self, expr: Expression | None, scope: str
+    ) -> BatchCompiled | None:
+        conjuncts: list[Expression] = split_conjuncts(expr)
+        if not conjuncts:
+            return None
+        steps: list[tuple[BatchCompiled, list[int]]] = [
+            (compile_batch(c), self.counter(scope, c)) for c in conjuncts
+        ]
+
+        def evaluate(records: list[Row]) -> list[bool]:
+            indices: list[int] = list(range(len(records)))
+            for predicate, counts in steps:
+                if not indices:
+                    break
+                counts[0] += len(indices)
+                passed = predicate([records[i] for i in indices])
+                indices = [indices[i] for i in selected_indices(passed)]
+                counts[1] += len(indices)
+            mask: list[bool] = [False] * len(records)
+            for i in indices:
+                mask[i] = True
+            return mask
+
+        return evaluate
+
+    # reorder, logging the resulting order
+    def plan(
+        self, expr: Expression | None, expensive: set[str], scope: str
+    ) -> Expression | None:
+        expr = self.reorder(expr, expensive, scope)
+        if expr is not None:
+            logger.debug(f"Predicate order: {describe(expr)}")
+        return expr
+
+    def clear(self):
+        self.counts.clear()
+
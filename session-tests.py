@@ -0,0 +1,73 @@
+import unittest
+from github import Github
+from session import ObjectCache, Session
+from stubapi import StubAPI, synthetic_repos
+
+
+class TestObjectCache(unittest.TestCase):
+    def test_hit(self):
+        cache = ObjectCache(60, 10)
+        loads = []
+        for _ in range(3):
+            value = cache.get("repo", "a/b", lambda: loads.append(1) or "repo a/b")
+            self.assertEqual(value, "repo a/b")
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(cache.counters(), {"hits": 2, "misses": 1})
+        # kinds don't share keys
+        self.assertEqual(cache.get("user", "a/b", lambda: "user"), "user")
+
+    def test_expiry(self):
+        cache = ObjectCache(60, 10)
+        cache.get("repo", "a/b", lambda: 1)
+        loaded_at, value = cache.entries[("repo", "a/b")]
+        cache.entries[("repo", "a/b")] = (loaded_at - 61, value)
+        self.assertEqual(cache.get("repo", "a/b", lambda: 2), 2)
+        self.assertEqual(cache.get("repo", "a/b", lambda: 3), 2)
+
+    def test_eviction(self):
+        cache = ObjectCache(60, 2)
+        cache.get("repo", "a", lambda: "a")
+        cache.get("repo", "b", lambda: "b")
+        cache.get("repo", "a", lambda: "stale")
+        cache.get("repo", "c", lambda: "c")
+        self.assertEqual(list(cache.entries), [("repo", "a"), ("repo", "c")])
+
+    def test_disabled(self):
+        cache = ObjectCache(0, 10)
+        cache.get("repo", "a", lambda: "a")
+        self.assertEqual(cache.get("repo", "a", lambda: "again"), "again")
+        self.assertEqual(cache.size(), 0)
+
+
+class TestSession(unittest.TestCase):
+    def setUp(self):
+        self.api = StubAPI(synthetic_repos("bench", 1, 20)).start()
+        git = Github(
+            base_url=self.api.url,
+            retry=None,
+            seconds_between_requests=None,
+        )
+        self.session = Session(git, ObjectCache(60, 100))
+
+    def tearDown(self):
+        self.api.stop()
+
+    def test_objects_are_reused(self):
+        repo = self.session.get_repo("bench/repo1")
+        self.assertIs(self.session.get_repo("bench/repo1"), repo)
+        self.assertIs(self.session.get_user("bench"), self.session.get_user("bench"))
+        self.assertEqual(
+            self.api.stats.snapshot()["endpoints"],
+            {"/repos/{owner}/{repo}": 1, "/users/{name}": 1},
+        )
+
+    def test_milestones(self):
+        self.assertEqual(self.session.get_milestone("bench/repo1", "v2").number, 2)
+        self.assertEqual(self.session.get_milestone("bench/repo1", "v1").number, 1)
+        self.assertIsNone(self.session.get_milestone("bench/repo1", "v9"))
+        endpoints = self.api.stats.snapshot()["endpoints"]
+        self.assertEqual(endpoints["/repos/{owner}/{repo}/milestones"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
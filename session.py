@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from github import Github, NamedUser, Repository
+from github.Milestone import Milestone
+
+
+logger = logging.getLogger(__name__)
+
+
+# Objects resolved by name, e.g. a repository by owner/name, kept for `ttl`
+# seconds. Past `max_size` entries the least recently used are evicted.
+# Concurrent misses on one key may both load it; the last load is kept.
+class ObjectCache:
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl: float = ttl
+        self.max_size: int = max_size
+        # (kind, key) -> (loaded at, object)
+        self.entries: OrderedDict[tuple[str, Hashable], tuple[float, object]] = (
+            OrderedDict()
+        )
+        self.hits: int = 0
+        self.misses: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def get(self, kind: str, key: Hashable, load: Callable[[], object]):
+        entry_key: tuple[str, Hashable] = (kind, key)
+        with self.lock:
+            entry: tuple[float, object] | None = self.entries.get(entry_key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self.hits += 1
+                self.entries.move_to_end(entry_key)
+                return entry[1]
+            self.misses += 1
+        value = load()
+        if self.ttl <= 0 or self.max_size <= 0:
+            return value
+        with self.lock:
+            self.entries[entry_key] = (time.monotonic(), value)
+            self.entries.move_to_end(entry_key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return value
+
+    def size(self) -> int:
+        return len(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def counters(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# State kept across the queries of a REPL session, while each query gets a
+# fresh Context: the GitHub client, whose requests share one pool of
+# keep-alive connections, and the repositories, users and milestones it
+# resolved, so follow-up queries skip those round trips
+class Session:
+    def __init__(self, git: Github, objects: ObjectCache):
+        self.git: Github = git
+        self.objects: ObjectCache = objects
+
+    def get_repo(self, repo_str: str) -> Repository:
+        def load() -> Repository:
+            logger.info(f"Fetching repository: {repo_str}")
+            return self.git.get_repo(repo_str)
+
+        return self.objects.get("repo", repo_str, load)
+
+    def get_user(self, username: str) -> NamedUser:
+        def load() -> NamedUser:
+            logger.info(f"Fetching user: {username}")
+            return self.git.get_user(username)
+
+        return self.objects.get("user", username, load)
+
+    # Milestones of a repository by title, all resolved by one listing
+    def get_milestones(self, repo_str: str) -> dict[str, Milestone]:
+        def load() -> dict[str, Milestone]:
+            logger.info(f"Listing milestones of {repo_str}")
+            return {
+                milestone.title: milestone
+                for milestone in self.get_repo(repo_str).get_milestones(state="all")
+            }
+
+        return self.objects.get("milestones", repo_str, load)
+
+    def get_milestone(self, repo_str: str, title: str) -> Milestone | None:
+        return self.get_milestones(repo_str).get(title)
@@ -0,0 +1,54 @@
+import unittest
+from compiler import compile_expression
+from expression import ExpressionType, LiteralExpression
+from records import Record
+from sorting import TopK
+
+
+def column(name: str):
+    return compile_expression(LiteralExpression(name, ExpressionType.CPH))
+
+
+class TestTopK(unittest.TestCase):
+    def setUp(self):
+        self.records = [
+            Record({"number": n, "user": user}, {})
+            for n, user in [(3, "b"), (1, "a"), (4, "b"), (1, "c"), (5, "a"), (9, None)]
+        ]
+
+    def top(self, keys, k: int) -> list:
+        sorter = TopK(keys, k)
+        for record in self.records:
+            sorter.push(record)
+        return [(r["number"], r["user"]) for r in sorter.result()]
+
+    def test_ascending(self):
+        self.assertEqual(
+            self.top([(column("number"), False)], 3), [(1, "a"), (1, "c"), (3, "b")]
+        )
+
+    def test_descending(self):
+        self.assertEqual(
+            self.top([(column("number"), True)], 2), [(9, None), (5, "a")]
+        )
+
+    def test_multiple_keys(self):
+        self.assertEqual(
+            self.top([(column("user"), False), (column("number"), True)], 4),
+            [(9, None), (5, "a"), (1, "a"), (4, "b")],
+        )
+
+    def test_ties_keep_input_order(self):
+        self.assertEqual(
+            self.top([(column("user"), False)], 6),
+            [(9, None), (1, "a"), (5, "a"), (3, "b"), (4, "b"), (1, "c")],
+        )
+
+    def test_mixed_types(self):
+        self.records.append(Record({"number": "x", "user": "a"}, {}))
+        with self.assertRaises(RuntimeError):
+            self.top([(column("number"), False)], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
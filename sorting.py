@@ -0,0 +1,79 @@
+import heapq
+from collections.abc import Callable, Iterable, Iterator
+from functools import cmp_to_key
+from records import Row
+
+
+# A compiled sort key: takes a record, returns the value to order by
+SortKey = Callable[[Row], object]
+
+
+# A row with its evaluated sort keys. Ordering is inverted (`a < b` when a
+# sorts after b) so the top of the heap is always the row to drop first.
+class _Row:
+    __slots__ = ("keys", "seq", "record", "descending")
+
+    def __init__(self, keys: tuple, seq: int, record: Row, descending: tuple):
+        self.keys: tuple = keys
+        self.seq: int = seq
+        self.record: Row = record
+        self.descending: tuple = descending
+
+    def precedes(self, other: "_Row") -> bool:
+        for a, b, desc in zip(self.keys, other.keys, self.descending):
+            if a != b:
+                return a > b if desc else a < b
+        return self.seq < other.seq  # keep API order between equal keys
+
+    def __lt__(self, other: "_Row") -> bool:
+        return other.precedes(self)
+
+
+# None sorts before every value, like "NULLS FIRST" in ascending order
+def _key(value):
+    return (0, 0) if value is None else (1, value)
+
+
+# Streaming ORDER BY ... LIMIT k: keeps only the best k rows seen so far in a
+# bounded heap, so memory is O(k) however many rows are scanned
+class TopK:
+    def __init__(self, keys: list[tuple[SortKey, bool]], k: int):
+        self.keys: list[SortKey] = [key for key, _ in keys]
+        self.descending: tuple = tuple(desc for _, desc in keys)
+        self.k: int = k
+        self.heap: list[_Row] = []
+        self.seen: int = 0
+
+    def push(self, record: Row):
+        if self.k <= 0:
+            return
+        try:
+            keys: tuple = tuple(_key(key(record)) for key in self.keys)
+            row: _Row = _Row(keys, self.seen, record, self.descending)
+            self.seen += 1
+            if len(self.heap) < self.k:
+                heapq.heappush(self.heap, row)
+            elif row.precedes(self.heap[0]):
+                heapq.heapreplace(self.heap, row)
+        except TypeError as e:
+            raise RuntimeError(f"Can't order values of different types: {e}")
+
+    def result(self) -> list[Row]:
+        rows: list[_Row] = sorted(
+            self.heap, key=cmp_to_key(lambda a, b: -1 if a.precedes(b) else 1)
+        )
+        return [row.record for row in rows]
+
+
+# Merge streams already in ORDER BY order into one, e.g. listings the API
+# sorted per repository. Only the head row of each stream is held.
+def merge_sorted(
+    streams: list[Iterable[Row]], keys: list[tuple[SortKey, bool]]
+) -> Iterator[Row]:
+    descending: tuple = tuple(desc for _, desc in keys)
+
+    def row(record: Row) -> _Row:
+        return _Row(tuple(_key(key(record)) for key, _ in keys), 0, record, descending)
+
+    # rows compare inverted, so streams in ORDER BY order are "descending"
+    return heapq.merge(*streams, key=row, reverse=True)
@@ -0,0 +1,195 @@
+import http.client
+import json
+import os
+import tempfile
+import unittest
+from github import Github
+from benchmark import regressions
+from stubapi import Commit, Issue, Pull, StubAPI, load_recordings, synthetic_repos
+
+
+class TestStubAPI(unittest.TestCase):
+    def setUp(self):
+        self.api = StubAPI(synthetic_repos("bench", 2, 250)).start()
+        self.git = Github(
+            base_url=self.api.url,
+            per_page=100,
+            retry=None,
+            seconds_between_requests=None,
+        )
+
+    def tearDown(self):
+        self.api.stop()
+
+    def get(self, path: str, headers: dict | None = None):
+        connection = http.client.HTTPConnection(self.api.url[len("http://") :])
+        connection.request("GET", path, headers=headers or {})
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, json.loads(body) if body else None
+
+    def test_listing(self):
+        repo = self.git.get_repo("bench/repo1")
+        issues = list(repo.get_issues(state="all"))
+        self.assertEqual([i.number for i in issues], list(range(250, 0, -1)))
+        self.assertEqual(issues[0].title, Issue(250).title)
+        closed = repo.get_issues(state="closed", creator="alice")
+        self.assertEqual(
+            [i.number for i in closed],
+            [n for n in range(250, 0, -1) if n % 3 == 0 and n % 7 == 0],
+        )
+        self.assertEqual(repo.get_issues(state="all").totalCount, 250)
+        self.assertEqual(len(list(repo.get_pulls(state="all"))), 62)
+        commits = list(repo.get_commits())
+        self.assertEqual(commits[0].sha, Commit("bench/repo1", 125).sha)
+        self.assertEqual(self.git.get_user("bench").get_repos().totalCount, 2)
+
+    def test_details(self):
+        repo = self.git.get_repo("bench/repo2")
+        self.assertEqual(repo.get_issue(3).closed_by.login, Issue(3).closed_by)
+        self.assertIsNone(repo.get_issue(4).closed_by)
+        self.assertEqual(repo.get_pull(4).merged_by.login, Pull(4).merged_by)
+        commit = repo.get_commit(Commit("bench/repo2", 7).sha)
+        self.assertEqual([f.filename for f in commit.files], Commit("x", 7).files)
+        self.assertEqual(self.get("/repos/bench/repo2/issues/999")[0].status, 404)
+
+    def test_search(self):
+        _, data = self.get(
+            "/search/issues?q=repo:bench/repo1+crash+in:title+state:open"
+            "+created:2015-01-01T00:00:00Z..2015-01-03T00:00:00Z&per_page=100"
+        )
+        expected = [
+            n
+            for n in range(96, 0, -1)
+            if n % 3 and "crash" in Issue(n).words(["title"])
+        ]
+        self.assertEqual([item["number"] for item in data["items"]], expected)
+        self.assertEqual(data["total_count"], len(expected))
+
+    def test_graphql(self):
+        _, data = self.git.requester.graphql_query(
+            "query { repository { connection: issues(first: $first) { } } }",
+            {"owner": "bench", "name": "repo1", "first": 100, "states": ["OPEN"]},
+        )
+        connection = data["data"]["repository"]["connection"]
+        self.assertEqual(len(connection["nodes"]), 100)
+        self.assertTrue(connection["pageInfo"]["hasNextPage"])
+        self.assertEqual(connection["nodes"][0]["number"], 250)
+        _, data = self.git.requester.graphql_query(
+            "query { repository { connection: issues(first: $first) { } } }",
+            {"owner": "bench", "name": "repo1", "first": 100, "after": "100"},
+        )
+        connection = data["data"]["repository"]["connection"]
+        self.assertEqual(connection["nodes"][0]["number"], 150)
+        self.assertEqual(connection["pageInfo"]["endCursor"], "200")
+
+    def test_etag(self):
+        response, _ = self.get("/repos/bench/repo1")
+        etag = response.getheader("ETag")
+        response, body = self.get("/repos/bench/repo1", {"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertIsNone(body)
+        self.assertEqual(self.api.stats.snapshot()["not_modified"], 1)
+
+    def test_stats(self):
+        self.get("/repos/bench/repo1/issues?page=2")
+        self.get("/repos/bench/repo1/issues/5")
+        stats = self.api.stats.snapshot()
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(
+            stats["endpoints"],
+            {
+                "/repos/{owner}/{repo}/issues": 1,
+                "/repos/{owner}/{repo}/issues/{number}": 1,
+            },
+        )
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_budget(self):
+        api = StubAPI(synthetic_repos("bench", 1, 10), rate_limit=2).start()
+        try:
+            connection = http.client.HTTPConnection(api.url[len("http://") :])
+            statuses, remaining = [], []
+            for _ in range(3):
+                connection.request("GET", "/repos/bench/repo1")
+                response = connection.getresponse()
+                response.read()
+                statuses.append(response.status)
+                remaining.append(response.getheader("x-ratelimit-remaining"))
+            connection.request("GET", "/search/issues?q=x")
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+        finally:
+            api.stop()
+        self.assertEqual(statuses, [200, 200, 403])
+        self.assertEqual(remaining, ["1", "0", "0"])
+        # every resource has a budget of its own
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("x-ratelimit-resource"), "search")
+
+
+class TestRecordings(unittest.TestCase):
+    def test_replay(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "recorded.jsonl")
+            with open(path, "w") as f:
+                f.write(
+                    json.dumps(
+                        {
+                            "path": "/repos/octo/cat",
+                            "status": 200,
+                            "body": {"full_name": "octo/cat"},
+                        }
+                    )
+                    + "\n"
+                )
+            api = StubAPI([], recordings=load_recordings(path)).start()
+        try:
+            connection = http.client.HTTPConnection(api.url[len("http://") :])
+            connection.request("GET", "/repos/octo/cat")
+            response = connection.getresponse()
+            self.assertEqual(json.loads(response.read()), {"full_name": "octo/cat"})
+            connection.close()
+        finally:
+            api.stop()
+
+
+class TestRegressions(unittest.TestCase):
+    def results(self, median: float, requests: int, per_second: float) -> dict:
+        return {
+            "queries": [
+                {
+                    "name": "scan",
+                    "latency_seconds": {"median": median},
+                    "requests": requests,
+                }
+            ],
+            "micro": [{"name": "tokenizer", "per_second": per_second}],
+        }
+
+    def test_regressions(self):
+        baseline = self.results(1.0, 10, 1000)
+        self.assertEqual(regressions(self.results(1.05, 10, 950), baseline, 0.1), [])
+        self.assertEqual(
+            regressions(self.results(1.5, 11, 800), baseline, 0.1),
+            [
+                "scan: median latency +50.0%",
+                "scan: requests 10 -> 11",
+                "tokenizer: throughput -20.0%",
+            ],
+        )
+
+    def test_startup_regressions(self):
+        baseline = {"queries": [], "micro": [], "startup": {"import_seconds": 0.2}}
+        results = {"queries": [], "micro": [], "startup": {"import_seconds": 0.3}}
+        self.assertEqual(
+            regressions(results, baseline, 0.1), ["startup import_seconds: +50.0%"]
+        )
+        self.assertEqual(regressions(results, {"queries": []}, 0.1), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
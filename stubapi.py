@@ -0,0 +1,974 @@
+import argparse
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+from ratelimit import resource_for
+from transport import endpoint
+
+
+logger = logging.getLogger(__name__)
+
+
+# Synthetic rows are a pure function of their number, so a repository of
+# 100k issues costs nothing until a page of it is asked for
+START: datetime = datetime(2015, 1, 1, tzinfo=timezone.utc)
+USERS: list[str] = ["alice", "bob", "carol", "dave", "erin", "frank", "grace"]
+LABELS: list[str] = ["bug", "enhancement", "docs", "question", "ui"]
+WORDS: list[str] = [
+    "crash",
+    "login",
+    "slow",
+    "memory",
+    "cache",
+    "build",
+    "docs",
+    "api",
+    "search",
+    "render",
+    "token",
+    "deploy",
+]
+MILESTONES: int = 3
+
+DEFAULT_PER_PAGE: int = 30
+MAX_PER_PAGE: int = 100
+MAX_SEARCH_RESULTS: int = 1000
+
+# Budget reported per token and resource when no rate limit is configured
+UNLIMITED: int = 1_000_000
+
+# `qualifier:value` or a bare word of a search query, values maybe quoted
+SEARCH_TERM_RE: re.Pattern = re.compile(r'(?:(\w+):)?("[^"]*"|\S+)')
+
+
+def _time(value: datetime | None) -> str | None:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ") if value is not None else None
+
+
+def _parse_time(value: str) -> datetime:
+    value = value.strip('"').rstrip("Z")
+    if len(value) == 10:
+        value += "T00:00:00"
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def _user(base: str, login: str | None) -> dict | None:
+    if login is None:
+        return None
+    return {
+        "login": login,
+        "id": USERS.index(login) + 1 if login in USERS else 0,
+        "node_id": f"U_{login}",
+        "type": "User",
+        "url": f"{base}/users/{login}",
+    }
+
+
+class Issue:
+    def __init__(self, number: int):
+        self.number: int = number
+        self.state: str = "closed" if number % 3 == 0 else "open"
+        self.user: str = USERS[number % len(USERS)]
+        self.assignee: str | None = (
+            USERS[number // 4 % len(USERS)] if number % 4 == 0 else None
+        )
+        self.labels: list[str] = list(
+            dict.fromkeys(
+                [LABELS[number % 5]] + ([LABELS[number // 5 % 5]] if number % 2 else [])
+            )
+        )
+        self.milestone: int | None = number % (MILESTONES + 1) or None
+        self.title: str = (
+            f"{WORDS[number % 12]} {WORDS[number // 12 % 12]} in module {number % 97}"
+        )
+        self.body: str = (
+            f"Steps to reproduce {number}: "
+            f"{WORDS[number * 5 % 12]} then {WORDS[number * 11 % 12]}."
+        )
+        self.created: datetime = START + timedelta(minutes=30 * number)
+        self.updated: datetime = self.created + timedelta(hours=number * 7919 % 1000)
+        self.closed: datetime | None = (
+            self.created + timedelta(days=1) if self.state == "closed" else None
+        )
+        self.closed_by: str | None = (
+            USERS[number * 3 % len(USERS)] if self.state == "closed" else None
+        )
+
+    def words(self, fields: list[str]) -> set[str]:
+        text: str = " ".join(getattr(self, field) for field in fields)
+        return set(re.findall(r"[^\W_]+", text.lower()))
+
+
+class Pull:
+    def __init__(self, number: int):
+        self.number: int = number
+        self.state: str = "closed" if number % 2 == 0 else "open"
+        self.merged: bool = number % 4 == 0
+        self.user: str = USERS[number % len(USERS)]
+        self.milestone: int | None = number % (MILESTONES + 1) or None
+        self.title: str = f"Fix {WORDS[number % 12]} {WORDS[number // 12 % 12]}"
+        self.base: str = "main"
+        self.head: str = f"feature-{number}"
+        self.created: datetime = START + timedelta(minutes=90 * number)
+        self.updated: datetime = self.created + timedelta(hours=number * 7919 % 1000)
+        self.closed: datetime | None = (
+            self.created + timedelta(days=2) if self.state == "closed" else None
+        )
+        self.changed_files: int = number % 17 + 1
+        self.merged_by: str | None = (
+            USERS[number * 5 % len(USERS)] if self.merged else None
+        )
+
+
+class Commit:
+    def __init__(self, full_name: str, number: int):
+        self.number: int = number
+        self.sha: str = hashlib.sha1(f"{full_name}:{number}".encode()).hexdigest()
+        self.author: str = USERS[number % len(USERS)]
+        self.date: datetime = START + timedelta(minutes=20 * number)
+        self.files: list[str] = [
+            f"src/{WORDS[number % 12]}.py",
+            f"tests/test_{WORDS[number // 12 % 12]}.py",
+        ][: number % 2 + 1]
+
+
+# One repository of synthetic issues, pull requests and commits, numbered
+# from 1 and listed newest first
+class Repo:
+    def __init__(self, full_name: str, issues: int, pulls: int, commits: int):
+        self.full_name: str = full_name
+        self.owner, self.name = full_name.split("/")
+        self.issues: int = issues
+        self.pulls: int = pulls
+        self.commits: int = commits
+        self.id: int = int(hashlib.sha1(full_name.encode()).hexdigest()[:8], 16)
+        # filter and sort parameters -> matching row numbers in listing order
+        self.listings: dict[tuple, list[int]] = {}
+        self.shas: dict[str, int] | None = None
+
+    def listing(self, key: tuple, build) -> list[int]:
+        numbers: list[int] | None = self.listings.get(key)
+        if numbers is None:
+            numbers = self.listings[key] = build()
+        return numbers
+
+    def commit_number(self, sha: str) -> int | None:
+        if self.shas is None:
+            self.shas = {
+                Commit(self.full_name, n).sha: n for n in range(1, self.commits + 1)
+            }
+        return self.shas.get(sha)
+
+    def json(self, base: str) -> dict:
+        return {
+            "id": self.id,
+            "node_id": f"R_{self.id}",
+            "name": self.name,
+            "full_name": self.full_name,
+            "owner": _user(base, self.owner),
+            "private": False,
+            "description": f"Synthetic repository with {self.issues} issues",
+            "fork": False,
+            "forks_count": self.id % 50,
+            "open_issues_count": self.issues - self.issues // 3,
+            "topics": ["benchmark"],
+            "created_at": _time(START),
+            "updated_at": _time(START),
+            "default_branch": "main",
+            "url": f"{base}/repos/{self.full_name}",
+        }
+
+    def issue_json(self, base: str, issue: Issue, detail: bool = False) -> dict:
+        url: str = f"{base}/repos/{self.full_name}/issues/{issue.number}"
+        data: dict = {
+            "id": self.id * 1_000_000 + issue.number,
+            "node_id": f"I_{self.id}_{issue.number}",
+            "number": issue.number,
+            "title": issue.title,
+            "body": issue.body,
+            "state": issue.state,
+            "user": _user(base, issue.user),
+            "assignee": _user(base, issue.assignee),
+            "assignees": [_user(base, issue.assignee)] if issue.assignee else [],
+            "labels": [{"name": label} for label in issue.labels],
+            "milestone": self.milestone_json(issue.milestone),
+            "comments": issue.number % 9,
+            "created_at": _time(issue.created),
+            "updated_at": _time(issue.updated),
+            "closed_at": _time(issue.closed),
+            "url": url,
+            "repository_url": f"{base}/repos/{self.full_name}",
+        }
+        if detail:
+            data["closed_by"] = _user(base, issue.closed_by)
+        return data
+
+    def pull_json(self, base: str, pull: Pull, detail: bool = False) -> dict:
+        data: dict = {
+            "id": self.id * 1_000_000 + 500_000 + pull.number,
+            "node_id": f"PR_{self.id}_{pull.number}",
+            "number": pull.number,
+            "title": pull.title,
+            "state": pull.state,
+            "user": _user(base, pull.user),
+            "milestone": self.milestone_json(pull.milestone),
+            "base": {"ref": pull.base, "label": f"{self.owner}:{pull.base}"},
+            "head": {"ref": pull.head, "label": f"{pull.user}:{pull.head}"},
+            "created_at": _time(pull.created),
+            "updated_at": _time(pull.updated),
+            "closed_at": _time(pull.closed),
+            "merged_at": _time(pull.closed) if pull.merged else None,
+            "url": f"{base}/repos/{self.full_name}/pulls/{pull.number}",
+        }
+        if detail:
+            data["merged"] = pull.merged
+            data["merged_by"] = _user(base, pull.merged_by)
+            data["changed_files"] = pull.changed_files
+        return data
+
+    def commit_json(self, base: str, commit: Commit, detail: bool = False) -> dict:
+        data: dict = {
+            "sha": commit.sha,
+            "node_id": f"C_{commit.sha}",
+            "commit": {
+                "author": {
+                    "name": commit.author,
+                    "email": f"{commit.author}@example.com",
+                    "date": _time(commit.date),
+                },
+                "message": f"Change {commit.number}",
+            },
+            "author": _user(base, commit.author),
+            "url": f"{base}/repos/{self.full_name}/commits/{commit.sha}",
+        }
+        if detail:
+            data["files"] = [
+                {"filename": name, "status": "modified"} for name in commit.files
+            ]
+        return data
+
+    def milestone_json(self, number: int | None) -> dict | None:
+        if number is None:
+            return None
+        return {"number": number, "title": f"v{number}", "state": "open"}
+
+
+# Requests served by kind, see StubAPI.stats
+class StubStats:
+    def __init__(self):
+        self.lock: threading.Lock = threading.Lock()
+        self.requests: int = 0
+        self.bytes: int = 0
+        self.not_modified: int = 0
+        self.rate_limited: int = 0
+        self.endpoints: dict[str, int] = {}
+
+    def add(self, path: str, status: int, size: int):
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+            self.not_modified += status == 304
+            self.rate_limited += status == 403
+            key: str = endpoint(path)
+            self.endpoints[key] = self.endpoints.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "bytes": self.bytes,
+                "not_modified": self.not_modified,
+                "rate_limited": self.rate_limited,
+                "endpoints": dict(self.endpoints),
+            }
+
+
+# Rate limit budget of one token for one resource, like GitHub's: `limit`
+# requests per window, refilled all at once at the reset
+class StubBudget:
+    def __init__(self, limit: int, window: float):
+        self.limit: int = limit
+        self.window: float = window
+        self.remaining: int = limit
+        self.reset: float = time.time() + window
+
+    def spend(self) -> bool:
+        now: float = time.time()
+        if now >= self.reset:
+            self.remaining = self.limit
+            self.reset = now + self.window
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
+
+
+# A local stand-in for the GitHub REST and GraphQL APIs, serving synthetic
+# repositories and recorded responses with configurable latency and rate
+# limits. Point GITQL_API_URL at `url` to run GitQL against it.
+class StubAPI:
+    def __init__(
+        self,
+        repos: list[Repo],
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rate_limit: int | None = None,
+        window: float = 3600.0,
+        recordings: dict[tuple[str, str], tuple[int, dict, str]] | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ):
+        self.repos: dict[str, Repo] = {repo.full_name: repo for repo in repos}
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.rate_limit: int | None = rate_limit
+        self.window: float = window
+        # (method, path with query) -> (status, headers, body)
+        self.recordings: dict[tuple[str, str], tuple[int, dict, str]] = (
+            recordings or {}
+        )
+        self.random: random.Random = random.Random(seed)
+        # search terms but date ranges -> matching issues, see `search`
+        self.searches: dict[tuple, list[tuple[Repo, Issue]]] = {}
+        self.budgets: dict[tuple[str, str], StubBudget] = {}
+        self.budgets_lock: threading.Lock = threading.Lock()
+        self.stats: StubStats = StubStats()
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(
+            (host, port), _handler(self)
+        )
+        self.server.daemon_threads = True
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubAPI":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info(f"Stub API serving {len(self.repos)} repositories at {self.url}")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def delay(self) -> float:
+        jitter: float = self.random.uniform(0, self.jitter) if self.jitter else 0.0
+        return self.latency + jitter
+
+    # Spend one request of the token's budget; the rate limit headers to send,
+    # and whether the request may be served
+    def charge(self, token: str, resource: str) -> tuple[dict[str, str], bool]:
+        limit: int = self.rate_limit if self.rate_limit is not None else UNLIMITED
+        with self.budgets_lock:
+            budget: StubBudget | None = self.budgets.get((token, resource))
+            if budget is None:
+                budget = StubBudget(limit, self.window)
+                self.budgets[(token, resource)] = budget
+            allowed: bool = self.rate_limit is None or budget.spend()
+            headers: dict[str, str] = {
+                "x-ratelimit-limit": str(budget.limit),
+                "x-ratelimit-remaining": str(budget.remaining),
+                "x-ratelimit-reset": str(int(budget.reset)),
+                "x-ratelimit-resource": resource,
+            }
+        return headers, allowed
+
+    # (status, headers, JSON body) for a request
+    def respond(
+        self, method: str, target: str, base: str, body: bytes
+    ) -> tuple[int, dict[str, str], object]:
+        recorded = self.recordings.get((method, target))
+        if recorded is not None:
+            status, headers, text = recorded
+            return status, dict(headers), json.loads(text) if text else None
+        parts = urlsplit(target)
+        path: str = parts.path.rstrip("/")
+        query: dict[str, str] = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        if method == "POST" and path == "/graphql":
+            return 200, {}, self.graphql(json.loads(body or b"{}"))
+        if method != "GET":
+            return 405, {}, {"message": "Method not allowed"}
+        return self.rest(path, query, base)
+
+    def rest(
+        self, path: str, query: dict[str, str], base: str
+    ) -> tuple[int, dict[str, str], object]:
+        segments: list[str] = path.strip("/").split("/")
+        match segments:
+            case ["rate_limit"]:
+                return 200, {}, {"resources": {}}
+            case ["search", "issues"]:
+                return self.search(query, base)
+            case ["users" | "orgs", login]:
+                return 200, {}, _user(base, login)
+            case ["users" | "orgs", login, "repos"]:
+                repos: list[Repo] = sorted(
+                    (r for r in self.repos.values() if r.owner == login),
+                    key=lambda r: r.full_name,
+                )
+                return self.page(
+                    path, query, base, [r.json(base) for r in repos], len(repos)
+                )
+        if len(segments) < 3 or segments[0] != "repos":
+            return 404, {}, {"message": "Not Found"}
+        repo: Repo | None = self.repos.get(f"{segments[1]}/{segments[2]}")
+        if repo is None:
+            return 404, {}, {"message": "Not Found"}
+        match segments[3:]:
+            case []:
+                return 200, {}, repo.json(base)
+            case ["issues"]:
+                numbers: list[int] = self.issue_numbers(repo, query)
+                return self.numbered_page(
+                    path,
+                    query,
+                    base,
+                    numbers,
+                    lambda n: repo.issue_json(base, Issue(n)),
+                )
+            case ["issues", number] if number.isdigit():
+                if not 1 <= int(number) <= repo.issues:
+                    return 404, {}, {"message": "Not Found"}
+                return 200, {}, repo.issue_json(base, Issue(int(number)), True)
+            case ["pulls"]:
+                numbers = self.pull_numbers(repo, query)
+                return self.numbered_page(
+                    path, query, base, numbers, lambda n: repo.pull_json(base, Pull(n))
+                )
+            case ["pulls", number] if number.isdigit():
+                if not 1 <= int(number) <= repo.pulls:
+                    return 404, {}, {"message": "Not Found"}
+                return 200, {}, repo.pull_json(base, Pull(int(number)), True)
+            case ["commits"]:
+                numbers = self.commit_numbers(repo, query)
+                return self.numbered_page(
+                    path,
+                    query,
+                    base,
+                    numbers,
+                    lambda n: repo.commit_json(base, Commit(repo.full_name, n)),
+                )
+            case ["commits", sha]:
+                found: int | None = repo.commit_number(sha)
+                if found is None:
+                    return 404, {}, {"message": "Not Found"}
+                commit: Commit = Commit(repo.full_name, found)
+                return 200, {}, repo.commit_json(base, commit, True)
+            case ["milestones"]:
+                milestones: list[dict] = [
+                    repo.milestone_json(n) for n in range(1, MILESTONES + 1)
+                ]
+                return self.page(path, query, base, milestones, MILESTONES)
+            case ["languages"]:
+                return 200, {}, {"Python": 1000 + repo.id % 1000, "Shell": 120}
+        return 404, {}, {"message": "Not Found"}
+
+    def issue_numbers(self, repo: Repo, query: dict[str, str]) -> list[int]:
+        state: str = query.get("state", "open")
+        labels: tuple[str, ...] = tuple(
+            label for label in query.get("labels", "").split(",") if label
+        )
+        creator: str | None = query.get("creator")
+        assignee: str | None = query.get("assignee")
+        milestone: str | None = query.get("milestone")
+        since: datetime | None = (
+            _parse_time(query["since"]) if "since" in query else None
+        )
+        sort: str = query.get("sort", "created")
+        descending: bool = query.get("direction", "desc") == "desc"
+
+        def build() -> list[int]:
+            issues: list[Issue] = [
+                issue
+                for issue in map(Issue, range(1, repo.issues + 1))
+                if (state == "all" or issue.state == state)
+                and all(label in issue.labels for label in labels)
+                and (creator is None or issue.user == creator)
+                and (assignee is None or issue.assignee == assignee)
+                and (milestone is None or str(issue.milestone) == milestone)
+                and (since is None or issue.updated >= since)
+            ]
+            if sort == "updated":
+                issues.sort(key=lambda issue: issue.updated)
+            numbers: list[int] = [issue.number for issue in issues]
+            return numbers[::-1] if descending else numbers
+
+        key: tuple = ("issues", state, labels, creator, assignee, milestone)
+        return repo.listing(key + (since, sort, descending), build)
+
+    def pull_numbers(self, repo: Repo, query: dict[str, str]) -> list[int]:
+        state: str = query.get("state", "open")
+        base_ref: str | None = query.get("base")
+        head: str | None = query.get("head")
+        sort: str = query.get("sort", "created")
+        descending: bool = query.get("direction", "desc") == "desc"
+
+        def build() -> list[int]:
+            pulls: list[Pull] = [
+                pull
+                for pull in map(Pull, range(1, repo.pulls + 1))
+                if (state == "all" or pull.state == state)
+                and (base_ref is None or pull.base == base_ref)
+                and (head is None or f"{pull.user}:{pull.head}" == head)
+            ]
+            if sort == "updated":
+                pulls.sort(key=lambda pull: pull.updated)
+            numbers: list[int] = [pull.number for pull in pulls]
+            return numbers[::-1] if descending else numbers
+
+        key: tuple = ("pulls", state, base_ref, head, sort, descending)
+        return repo.listing(key, build)
+
+    def commit_numbers(self, repo: Repo, query: dict[str, str]) -> list[int]:
+        since: datetime | None = (
+            _parse_time(query["since"]) if "since" in query else None
+        )
+        until: datetime | None = (
+            _parse_time(query["until"]) if "until" in query else None
+        )
+        author: str | None = query.get("author")
+
+        def build() -> list[int]:
+            return [
+                commit.number
+                for commit in (
+                    Commit(repo.full_name, n) for n in range(repo.commits, 0, -1)
+                )
+                if (since is None or commit.date >= since)
+                and (until is None or commit.date <= until)
+                and (author is None or commit.author == author)
+            ]
+
+        return repo.listing(("commits", since, until, author), build)
+
+    def numbered_page(
+        self,
+        path: str,
+        query: dict[str, str],
+        base: str,
+        numbers: list[int],
+        item: Callable[[int], dict],
+    ) -> tuple[int, dict[str, str], object]:
+        per_page, page = _paging(query)
+        start: int = (page - 1) * per_page
+        items: list[dict] = [item(n) for n in numbers[start : start + per_page]]
+        return self.page(path, query, base, items, len(numbers), sliced=True)
+
+    # A page of `items` with the Link header of a REST listing
+    def page(
+        self,
+        path: str,
+        query: dict[str, str],
+        base: str,
+        items: list,
+        total: int,
+        sliced: bool = False,
+    ) -> tuple[int, dict[str, str], object]:
+        per_page, page = _paging(query)
+        if not sliced:
+            items = items[(page - 1) * per_page : page * per_page]
+        last: int = max(1, -(-total // per_page))
+        links: list[str] = []
+        if page < last:
+            links.append(f'<{_page_url(base, path, query, page + 1)}>; rel="next"')
+            links.append(f'<{_page_url(base, path, query, last)}>; rel="last"')
+        if page > 1:
+            links.append(f'<{_page_url(base, path, query, page - 1)}>; rel="prev"')
+            links.append(f'<{_page_url(base, path, query, 1)}>; rel="first"')
+        headers: dict[str, str] = {"link": ", ".join(links)} if links else {}
+        return 200, headers, items
+
+    # Issue search over the synthetic repositories: repo, state, is, label,
+    # author, assignee, milestone and created/updated qualifiers, and words
+    # matched whole against the `in:` fields (title and body by default)
+    def search(
+        self, query: dict[str, str], base: str
+    ) -> tuple[int, dict[str, str], object]:
+        repos: list[Repo] = list(self.repos.values())
+        # matches of the terms but the date ranges are kept per query, as
+        # reading past 1000 results repeats it with ever narrower ranges
+        terms: list[tuple[str, str]] = []
+        dates: list[Callable[[Issue], bool]] = []
+        for qualifier, raw in SEARCH_TERM_RE.findall(query.get("q", "")):
+            value: str = raw.strip('"')
+            if qualifier in ("created", "updated"):
+                dates.append(_date_test(qualifier, value))
+            elif qualifier == "repo":
+                repos = [r for r in repos if r.full_name == value]
+            else:
+                terms.append((qualifier, value))
+        key: tuple = (tuple(r.full_name for r in repos), tuple(terms))
+        matches: list[tuple[Repo, Issue]] | None = self.searches.get(key)
+        if matches is None:
+            matches = self.searches[key] = _search_matches(repos, terms)
+        found: list[tuple[Repo, Issue]] = [
+            (repo, issue)
+            for repo, issue in matches
+            if all(test(issue) for test in dates)
+        ]
+        found.sort(
+            key=lambda pair: pair[1].created, reverse=query.get("order") != "asc"
+        )
+        per_page, page = _paging(query)
+        start: int = (page - 1) * per_page
+        window: list[tuple[Repo, Issue]] = found[:MAX_SEARCH_RESULTS][
+            start : start + per_page
+        ]
+        return (
+            200,
+            {},
+            {
+                "total_count": len(found),
+                "incomplete_results": False,
+                "items": [repo.issue_json(base, issue) for repo, issue in window],
+            },
+        )
+
+    # The connections GitQL's GraphQL cursors read, with every field they may
+    # select; nodes are paged by offset cursors
+    def graphql(self, request: dict) -> dict:
+        text: str = request.get("query", "")
+        variables: dict = request.get("variables") or {}
+        first: int = min(int(variables.get("first") or MAX_PER_PAGE), MAX_PER_PAGE)
+        offset: int = int(variables.get("after") or 0)
+        if "repositories(" in text:
+            owned: list[Repo] = sorted(
+                (r for r in self.repos.values() if r.owner == variables.get("owner")),
+                key=lambda r: r.name,
+            )
+            nodes: list[dict] = [_repo_node(r) for r in owned[offset : offset + first]]
+            connection: dict = _connection(nodes, offset, len(owned))
+            return {"data": {"repository": {"connection": connection}}}
+        repo: Repo | None = self.repos.get(
+            f"{variables.get('owner')}/{variables.get('name')}"
+        )
+        if repo is None:
+            return {"errors": [{"type": "NOT_FOUND", "message": "Not Found"}]}
+        order: dict = variables.get("orderBy") or {}
+        query: dict[str, str] = {
+            "sort": "updated" if order.get("field") == "UPDATED_AT" else "created",
+            "direction": str(order.get("direction", "DESC")).lower(),
+        }
+        if "history(" in text:
+            for bound in ("since", "until"):
+                if variables.get(bound):
+                    query[bound] = variables[bound]
+            author: dict = variables.get("author") or {}
+            if "id" in author:
+                query["author"] = author["id"].removeprefix("U_")
+            numbers: list[int] = self.commit_numbers(repo, query)
+            commits: list[dict] = [
+                _commit_node(Commit(repo.full_name, n))
+                for n in numbers[offset : offset + first]
+            ]
+            connection = _connection(commits, offset, len(numbers))
+            target: dict = {"target": {"connection": connection}}
+            return {"data": {"repository": {"defaultBranchRef": target}}}
+        states: list[str] = variables.get("states") or []
+        if "pullRequests(" in text:
+            if states == ["OPEN"]:
+                query["state"] = "open"
+            elif states:
+                query["state"] = "closed"
+            else:
+                query["state"] = "all"
+            if variables.get("base"):
+                query["base"] = variables["base"]
+            numbers = self.pull_numbers(repo, query)
+            if variables.get("head"):
+                # the GraphQL filter is on the bare ref name
+                numbers = [n for n in numbers if Pull(n).head == variables["head"]]
+            pulls: list[dict] = [
+                _pull_node(Pull(n)) for n in numbers[offset : offset + first]
+            ]
+            connection = _connection(pulls, offset, len(numbers))
+            return {"data": {"repository": {"connection": connection}}}
+        query["state"] = states[0].lower() if len(states) == 1 else "all"
+        filter_by: dict = variables.get("filterBy") or {}
+        if "createdBy" in filter_by:
+            query["creator"] = filter_by["createdBy"]
+        for name in ("assignee", "milestone", "since"):
+            if name in filter_by:
+                query[name] = filter_by[name]
+        numbers = self.issue_numbers(repo, query)
+        if variables.get("labels"):
+            # unlike REST's `labels`, matches issues with any of them
+            wanted: set[str] = set(variables["labels"])
+            numbers = [n for n in numbers if wanted & set(Issue(n).labels)]
+        issues: list[dict] = [
+            _issue_node(repo, Issue(n)) for n in numbers[offset : offset + first]
+        ]
+        connection = _connection(issues, offset, len(numbers))
+        return {"data": {"repository": {"connection": connection}}}
+
+
+def _search_matches(
+    repos: list[Repo], terms: list[tuple[str, str]]
+) -> list[tuple[Repo, Issue]]:
+    tests: list[Callable[[Issue], bool]] = []
+    words: set[str] = set()
+    fields: list[str] = ["title", "body"]
+    for qualifier, value in terms:
+        match qualifier:
+            case "":
+                words.add(value.lower())
+            case "in":
+                fields = value.split(",")
+            case "is" if value == "pr":
+                return []  # no synthetic pull request is searchable
+            case "is" | "state" if value in ("open", "closed"):
+                tests.append(lambda issue, v=value: issue.state == v)
+            case "label":
+                tests.append(lambda issue, v=value: v in issue.labels)
+            case "author":
+                tests.append(lambda issue, v=value: issue.user == v)
+            case "assignee":
+                tests.append(lambda issue, v=value: issue.assignee == v)
+            case "milestone":
+                tests.append(lambda issue, v=value: f"v{issue.milestone}" == v)
+    return [
+        (repo, issue)
+        for repo in repos
+        for issue in map(Issue, range(1, repo.issues + 1))
+        if all(test(issue) for test in tests)
+        and (not words or words <= issue.words(fields))
+    ]
+
+
+def _paging(query: dict[str, str]) -> tuple[int, int]:
+    per_page: int = min(int(query.get("per_page", DEFAULT_PER_PAGE)), MAX_PER_PAGE)
+    return max(per_page, 1), max(int(query.get("page", 1)), 1)
+
+
+def _page_url(base: str, path: str, query: dict[str, str], page: int) -> str:
+    return f"{base}{path}?{urlencode(dict(query, page=page))}"
+
+
+def _date_test(qualifier: str, value: str) -> Callable[[Issue], bool]:
+    attribute: str = "created" if qualifier == "created" else "updated"
+    if ".." in value:
+        low, high = value.split("..")
+        start, end = _parse_time(low), _parse_time(high)
+        return lambda issue: start <= getattr(issue, attribute) <= end
+    for operator, test in (
+        (">=", lambda a, b: a >= b),
+        ("<=", lambda a, b: a <= b),
+        (">", lambda a, b: a > b),
+        ("<", lambda a, b: a < b),
+    ):
+        if value.startswith(operator):
+            bound: datetime = _parse_time(value[len(operator) :])
+            return lambda issue: test(getattr(issue, attribute), bound)
+    return lambda issue: True
+
+
+# A page of a connection's nodes starting at `offset`, of `total` nodes
+def _connection(nodes: list[dict], offset: int, total: int) -> dict:
+    end: int = offset + len(nodes)
+    return {
+        "pageInfo": {"hasNextPage": end < total, "endCursor": str(end)},
+        "nodes": nodes,
+    }
+
+
+def _login(login: str | None) -> dict | None:
+    return {"login": login} if login is not None else None
+
+
+def _issue_node(repo: Repo, issue: Issue) -> dict:
+    return {
+        "databaseId": repo.id * 1_000_000 + issue.number,
+        "number": issue.number,
+        "title": issue.title,
+        "body": issue.body,
+        "state": issue.state.upper(),
+        "milestone": (
+            {"title": f"v{issue.milestone}"} if issue.milestone is not None else None
+        ),
+        "labels": {"nodes": [{"name": label} for label in issue.labels]},
+        "author": _login(issue.user),
+        "assignees": {"nodes": [_login(issue.assignee)] if issue.assignee else []},
+        "createdAt": _time(issue.created),
+        "updatedAt": _time(issue.updated),
+        "closedAt": _time(issue.closed),
+        "timelineItems": {
+            "nodes": [{"actor": _login(issue.closed_by)}] if issue.closed_by else []
+        },
+    }
+
+
+def _pull_node(pull: Pull) -> dict:
+    return {
+        "databaseId": 500_000 + pull.number,
+        "number": pull.number,
+        "title": pull.title,
+        "state": "MERGED" if pull.merged else pull.state.upper(),
+        "milestone": (
+            {"title": f"v{pull.milestone}"} if pull.milestone is not None else None
+        ),
+        "author": _login(pull.user),
+        "baseRefName": pull.base,
+        "headRefName": pull.head,
+        "headRepositoryOwner": _login(pull.user),
+        "createdAt": _time(pull.created),
+        "updatedAt": _time(pull.updated),
+        "merged": pull.merged,
+        "mergedAt": _time(pull.closed) if pull.merged else None,
+        "changedFiles": pull.changed_files,
+        "mergedBy": _login(pull.merged_by),
+    }
+
+
+def _commit_node(commit: Commit) -> dict:
+    return {
+        "oid": commit.sha,
+        "author": {"user": _login(commit.author)},
+        "authoredDate": _time(commit.date),
+    }
+
+
+def _repo_node(repo: Repo) -> dict:
+    return {
+        "databaseId": repo.id,
+        "name": repo.name,
+        "nameWithOwner": repo.full_name,
+        "issues": {"totalCount": repo.issues - repo.issues // 3},
+        "isPrivate": False,
+        "createdAt": _time(START),
+        "description": f"Synthetic repository with {repo.issues} issues",
+        "forkCount": repo.id % 50,
+        "languages": {
+            "edges": [
+                {"size": 1000 + repo.id % 1000, "node": {"name": "Python"}},
+                {"size": 120, "node": {"name": "Shell"}},
+            ]
+        },
+        "repositoryTopics": {"nodes": [{"topic": {"name": "benchmark"}}]},
+    }
+
+
+# Recorded responses, one JSON object per line with method, path (with its
+# query string), status, headers and body
+def load_recordings(path: str) -> dict[tuple[str, str], tuple[int, dict, str]]:
+    recordings: dict[tuple[str, str], tuple[int, dict, str]] = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry: dict = json.loads(line)
+            body = entry.get("body")
+            recordings[(entry.get("method", "GET"), entry["path"])] = (
+                entry.get("status", 200),
+                entry.get("headers", {}),
+                body if isinstance(body, str) or body is None else json.dumps(body),
+            )
+    return recordings
+
+
+def _handler(api: StubAPI) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        # keep-alive, like api.github.com
+        protocol_version: str = "HTTP/1.1"
+        # headers and body go out in separate writes; don't hold the body back
+        # waiting for the client's delayed ACK
+        disable_nagle_algorithm: bool = True
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+        def handle_request(self, method: str):
+            length: int = int(self.headers.get("Content-Length") or 0)
+            body: bytes = self.rfile.read(length) if length else b""
+            delay: float = api.delay()
+            if delay > 0:
+                time.sleep(delay)
+            path: str = urlsplit(self.path).path
+            token: str = self.headers.get("Authorization") or "anonymous"
+            resource: str = resource_for(path)
+            base: str = f"http://{self.headers.get('Host') or api.url[7:]}"
+            status, headers, data = api.respond(method, self.path, base, body)
+            text: bytes = json.dumps(data).encode() if data is not None else b""
+            etag: str = f'"{hashlib.sha1(text).hexdigest()}"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                # GitHub doesn't charge conditional requests answered with a 304
+                limits, _ = api.charge(token, resource)
+                status, text = 304, b""
+            else:
+                limits, allowed = api.charge(token, resource)
+                if not allowed:
+                    status = 403
+                    text = json.dumps(
+                        {"message": "API rate limit exceeded for this token."}
+                    ).encode()
+            api.stats.add(path, status, len(text))
+            self.send_response(status)
+            for name, value in {**headers, **limits}.items():
+                self.send_header(name, value)
+            if status in (200, 304):
+                self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(text)))
+            self.end_headers()
+            self.wfile.write(text)
+
+        def log_message(self, format: str, *args):
+            logger.debug("Stub API: " + format, *args)
+
+    return Handler
+
+
+# Repositories owner/repo1 .. owner/repoN with `issues` issues each, half as
+# many commits and a quarter as many pull requests
+def synthetic_repos(owner: str, count: int, issues: int) -> list[Repo]:
+    return [
+        Repo(f"{owner}/repo{i}", issues, issues // 4, issues // 2)
+        for i in range(1, count + 1)
+    ]
+
+
+# Serve the stand-in until interrupted, e.g. for GITQL_API_URL=http://127.0.0.1:8080
+def main():
+    parser = argparse.ArgumentParser(description="Local GitHub API stand-in")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--owner", default="bench")
+    parser.add_argument("--repos", type=int, default=1)
+    parser.add_argument("--issues", type=int, default=1000, help="issues per repo")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int)
+    parser.add_argument("--window", type=float, default=3600.0)
+    parser.add_argument("--replay", help="JSON lines of recorded responses")
+    args = parser.parse_args()
+    api: StubAPI = StubAPI(
+        synthetic_repos(args.owner, args.repos, args.issues),
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        window=args.window,
+        recordings=load_recordings(args.replay) if args.replay else None,
+        port=args.port,
+    )
+    print(f"Serving at {api.url}")
+    try:
+        api.server.serve_forever()
+    except KeyboardInterrupt:
+        api.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import unittest
+from telemetry import (
+    NOOP_SPAN,
+    OtlpFileExporter,
+    Registry,
+    Tracer,
+    configure_logging,
+    write_prometheus,
+)
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter(self):
+        registry = Registry()
+        hits = registry.counter("hits_total", "Hits")
+        hits.inc()
+        hits.inc(2, result="fresh")
+        hits.inc(result="fresh")
+        self.assertEqual(hits.value(), 1)
+        self.assertEqual(hits.value(result="fresh"), 3)
+        self.assertIs(registry.counter("hits_total", "Hits"), hits)
+        self.assertEqual(
+            registry.prometheus(),
+            "# HELP hits_total Hits\n"
+            "# TYPE hits_total counter\n"
+            "hits_total 1\n"
+            'hits_total{result="fresh"} 3\n',
+        )
+
+    def test_histogram(self):
+        registry = Registry()
+        latency = registry.histogram("latency_seconds", "Latency", (0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value, endpoint='/a"b')
+        lines = registry.prometheus().splitlines()
+        self.assertEqual(
+            lines[2:],
+            [
+                'latency_seconds_bucket{endpoint="/a\\"b",le="0.1"} 2',
+                'latency_seconds_bucket{endpoint="/a\\"b",le="1"} 3',
+                'latency_seconds_bucket{endpoint="/a\\"b",le="+Inf"} 4',
+                'latency_seconds_sum{endpoint="/a\\"b"} 3.65',
+                'latency_seconds_count{endpoint="/a\\"b"} 4',
+            ],
+        )
+        point = registry.otlp()["resourceMetrics"][0]["scopeMetrics"][0]["metrics"][0]
+        data = point["histogram"]["dataPoints"][0]
+        self.assertEqual(data["bucketCounts"], ["2", "1", "1"])
+        self.assertEqual(data["explicitBounds"], [0.1, 1.0])
+        self.assertEqual(data["count"], "4")
+
+    def test_write_prometheus(self):
+        registry = Registry()
+        registry.counter("rows_total", "Rows").inc(5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "gitql.prom")
+            write_prometheus(path, registry)
+            with open(path) as f:
+                self.assertIn("rows_total 5\n", f.read())
+            self.assertEqual(os.listdir(tmp), ["gitql.prom"])
+
+
+class TestTracer(unittest.TestCase):
+    def test_disabled(self):
+        tracer = Tracer()
+        with tracer.span("query") as span:
+            self.assertIs(span, NOOP_SPAN)
+            span.set("rows", 1)
+        self.assertEqual(tracer.drain(), [])
+
+    def test_nested_spans(self):
+        tracer = Tracer()
+        tracer.enabled = True
+        with tracer.span("query", query="SELECT 1") as query:
+            with tracer.span("populate", source="ISSUES") as populate:
+                populate.set("rows", 30)
+            with tracer.span("populate", source="ISSUES"):
+                pass
+        with tracer.span("query"):
+            pass
+        spans = tracer.drain()
+        self.assertEqual(
+            [s.name for s in spans], ["populate", "populate", "query", "query"]
+        )
+        self.assertEqual(spans[0].parent_id, query.span_id)
+        self.assertEqual(spans[0].trace_id, query.trace_id)
+        self.assertIsNone(query.parent_id)
+        self.assertNotEqual(spans[3].trace_id, query.trace_id)
+        self.assertLessEqual(query.start, spans[0].start)
+        self.assertGreaterEqual(query.end, spans[1].end)
+        self.assertEqual(tracer.drain(), [])
+
+    def test_bounded(self):
+        tracer = Tracer(max_spans=2)
+        tracer.enabled = True
+        for name in ("a", "b", "c"):
+            with tracer.span(name):
+                pass
+        self.assertEqual([s.name for s in tracer.drain()], ["b", "c"])
+
+    def test_otlp_file(self):
+        tracer = Tracer()
+        tracer.enabled = True
+        registry = Registry()
+        registry.counter("rows_total", "Rows").inc(3)
+        with tracer.span("query", query="SELECT 1", limit=5):
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "otlp.json")
+            exporter = OtlpFileExporter(path)
+            exporter.export(tracer, registry)
+            exporter.export(tracer, registry)
+            with open(path) as f:
+                lines = [json.loads(line) for line in f]
+        # spans once, metrics with every export
+        self.assertEqual(len(lines), 3)
+        spans = lines[0]["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual(spans[0]["name"], "query")
+        self.assertEqual(len(spans[0]["traceId"]), 32)
+        self.assertEqual(len(spans[0]["spanId"]), 16)
+        self.assertNotIn("parentSpanId", spans[0])
+        self.assertEqual(
+            spans[0]["attributes"],
+            [
+                {"key": "query", "value": {"stringValue": "SELECT 1"}},
+                {"key": "limit", "value": {"intValue": "5"}},
+            ],
+        )
+        metric = lines[1]["resourceMetrics"][0]["scopeMetrics"][0]["metrics"][0]
+        self.assertEqual(metric["name"], "rows_total")
+        self.assertTrue(metric["sum"]["isMonotonic"])
+        self.assertEqual(metric["sum"]["dataPoints"][0]["asDouble"], 3)
+        self.assertIn("resourceMetrics", lines[2])
+
+
+class TestLogging(unittest.TestCase):
+    def test_queued_records_are_written(self):
+        root = logging.getLogger()
+        saved = root.handlers[:]
+        root.handlers = []
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "test.log")
+            handler = logging.FileHandler(path)
+            try:
+                listener = configure_logging([handler])
+                logging.getLogger("telemetry-tests").info("row %s of %s", 1, 2)
+                listener.stop()
+                atexit.unregister(listener.stop)
+            finally:
+                handler.close()
+                root.handlers = saved
+            with open(path) as f:
+                self.assertIn("INFO - row 1 of 2", f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,382 @@
+import atexit
+import bisect
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Finished spans kept for the next export; older ones are dropped first
+MAX_SPANS: int = 10000
+
+SERVICE_NAME: str = "gitql"
+
+LOG_FORMAT: str = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Sorted label pairs identifying one series of a metric
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, str]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name: str = name
+        self.help: str = help
+        self.values: dict[Labels, float] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key: Labels = _labels(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self.lock:
+            return self.values.get(_labels(labels), 0)
+
+    def samples(self) -> list[tuple[Labels, float]]:
+        with self.lock:
+            return sorted(self.values.items())
+
+
+class HistogramSeries:
+    def __init__(self, buckets: int):
+        # observations per bucket, the last one past every bound
+        self.counts: list[int] = [0] * (buckets + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple[float, ...]):
+        self.name: str = name
+        self.help: str = help
+        self.buckets: tuple[float, ...] = buckets
+        self.series: dict[Labels, HistogramSeries] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key: Labels = _labels(labels)
+        index: int = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series: HistogramSeries | None = self.series.get(key)
+            if series is None:
+                series = self.series[key] = HistogramSeries(len(self.buckets))
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def samples(self) -> list[tuple[Labels, HistogramSeries]]:
+        with self.lock:
+            return sorted(self.series.items(), key=lambda item: item[0])
+
+
+# Counters and histograms of the process, exported as Prometheus text or
+# OTLP JSON. Values are cumulative since `started`.
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Counter | Histogram] = {}
+        self.started: int = time.time_ns()
+
+    def counter(self, name: str, help: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help))
+
+    def histogram(
+        self, name: str, help: str, buckets: tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help, buckets))
+
+    def prometheus(self) -> str:
+        lines: list[str] = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            if isinstance(metric, Counter):
+                lines.append(f"# TYPE {metric.name} counter")
+                for labels, value in metric.samples():
+                    lines.append(f"{metric.name}{_prometheus_labels(labels)} {value:g}")
+                continue
+            lines.append(f"# TYPE {metric.name} histogram")
+            for labels, series in metric.samples():
+                cumulative: int = 0
+                bounds: list[str] = [f"{b:g}" for b in metric.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, series.counts):
+                    cumulative += count
+                    bucket: Labels = labels + (("le", bound),)
+                    lines.append(
+                        f"{metric.name}_bucket{_prometheus_labels(bucket)} {cumulative}"
+                    )
+                text: str = _prometheus_labels(labels)
+                lines.append(f"{metric.name}_sum{text} {series.sum:g}")
+                lines.append(f"{metric.name}_count{text} {series.count}")
+        return "\n".join(lines) + "\n"
+
+    def otlp(self) -> dict:
+        now: int = time.time_ns()
+        metrics: list[dict] = []
+        for metric in self.metrics.values():
+            if isinstance(metric, Counter):
+                points: list[dict] = [
+                    {
+                        "attributes": _otlp_attributes(dict(labels)),
+                        "startTimeUnixNano": str(self.started),
+                        "timeUnixNano": str(now),
+                        "asDouble": value,
+                    }
+                    for labels, value in metric.samples()
+                ]
+                data: dict = {
+                    "sum": {
+                        "dataPoints": points,
+                        "aggregationTemporality": 2,
+                        "isMonotonic": True,
+                    }
+                }
+            else:
+                points = [
+                    {
+                        "attributes": _otlp_attributes(dict(labels)),
+                        "startTimeUnixNano": str(self.started),
+                        "timeUnixNano": str(now),
+                        "count": str(series.count),
+                        "sum": series.sum,
+                        "bucketCounts": [str(count) for count in series.counts],
+                        "explicitBounds": list(metric.buckets),
+                    }
+                    for labels, series in metric.samples()
+                ]
+                data = {
+                    "histogram": {"dataPoints": points, "aggregationTemporality": 2}
+                }
+            metrics.append({"name": metric.name, "description": metric.help, **data})
+        return {
+            "resourceMetrics": [
+                {
+                    "resource": _otlp_resource(),
+                    "scopeMetrics": [
+                        {"scope": {"name": SERVICE_NAME}, "metrics": metrics}
+                    ],
+                }
+            ]
+        }
+
+
+def _prometheus_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped: list[str] = [
+        name
+        + '="'
+        + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        + '"'
+        for name, value in labels
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict) -> list[dict]:
+    return [
+        {"key": key, "value": _otlp_value(value)} for key, value in attributes.items()
+    ]
+
+
+def _otlp_resource() -> dict:
+    return {"attributes": _otlp_attributes({"service.name": SERVICE_NAME})}
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "start",
+        "end",
+        "attributes",
+    )
+
+    def __init__(self, name: str, trace_id: str, parent_id: str | None, attributes):
+        self.name: str = name
+        self.trace_id: str = trace_id
+        self.span_id: str = os.urandom(8).hex()
+        self.parent_id: str | None = parent_id
+        self.start: int = time.time_ns()
+        self.end: int = 0
+        self.attributes: dict = attributes
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def otlp(self) -> dict:
+        span: dict = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": _otlp_attributes(self.attributes),
+        }
+        if self.parent_id is not None:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+# Stands in for a span while tracing is off
+class NoopSpan:
+    def set(self, key: str, value):
+        pass
+
+
+NOOP_SPAN: NoopSpan = NoopSpan()
+
+
+# Records spans of named operations, nested within the span open on the same
+# thread (or asyncio task). Off until an exporter is configured, when a span
+# costs a context manager and nothing else.
+class Tracer:
+    def __init__(self, max_spans: int = MAX_SPANS):
+        self.enabled: bool = False
+        self.spans: deque[Span] = deque(maxlen=max_spans)
+        self.current: ContextVar[Span | None] = ContextVar("span", default=None)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span | NoopSpan]:
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+        parent: Span | None = self.current.get()
+        span: Span = Span(
+            name,
+            parent.trace_id if parent is not None else os.urandom(16).hex(),
+            parent.span_id if parent is not None else None,
+            attributes,
+        )
+        token = self.current.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.time_ns()
+            self.current.reset(token)
+            self.spans.append(span)
+
+    # Finished spans since the last call
+    def drain(self) -> list[Span]:
+        spans: list[Span] = []
+        while self.spans:
+            spans.append(self.spans.popleft())
+        return spans
+
+    def otlp(self, spans: list[Span]) -> dict:
+        return {
+            "resourceSpans": [
+                {
+                    "resource": _otlp_resource(),
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": SERVICE_NAME},
+                            "spans": [span.otlp() for span in spans],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+# Appends spans and metrics to a file as OTLP JSON, one export request per
+# line, the format of the OpenTelemetry collector's file exporter
+class OtlpFileExporter:
+    def __init__(self, path: str):
+        self.path: str = path
+
+    def export(self, tracer: Tracer, registry: Registry):
+        spans: list[Span] = tracer.drain()
+        with open(self.path, "a") as out:
+            if spans:
+                out.write(json.dumps(tracer.otlp(spans)) + "\n")
+            out.write(json.dumps(registry.otlp()) + "\n")
+
+
+# Rewrites a file with the Prometheus text exposition of the metrics, e.g.
+# for node_exporter's textfile collector
+def write_prometheus(path: str, registry: Registry):
+    temporary: str = f"{path}.tmp"
+    with open(temporary, "w") as out:
+        out.write(registry.prometheus())
+    os.replace(temporary, path)
+
+
+# Route log records through a queue to `handlers` written on a background
+# thread, so a slow disk or terminal never blocks the query loop
+def configure_logging(handlers: list[logging.Handler]) -> QueueListener:
+    formatter: logging.Formatter = logging.Formatter(LOG_FORMAT)
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener: QueueListener = QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    handler: QueueHandler = QueueHandler(log_queue)
+    # the queued record carries the message only, formatted by `handlers`
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logging.basicConfig(level=logging.INFO, handlers=[handler])
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+registry: Registry = Registry()
+tracer: Tracer = Tracer()
+
+rows_scanned: Counter = registry.counter(
+    "gitql_rows_scanned_total", "Rows read from sources"
+)
+rows_selected: Counter = registry.counter(
+    "gitql_rows_selected_total", "Rows passing the WHERE clause of queries"
+)
+retries: Counter = registry.counter(
+    "gitql_retries_total", "API requests retried after a rate limit or server error"
+)
+cache_hits: Counter = registry.counter(
+    "gitql_cache_hits_total", "API responses served from the response cache"
+)
+request_seconds: Histogram = registry.histogram(
+    "gitql_http_request_duration_seconds", "Latency of API requests by endpoint"
+)
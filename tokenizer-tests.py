@@ -120,6 +120,50 @@ class TestTokenizer(unittest.TestCase):
         ]
         self.assertEqual(self.tokenizer.tokens, expected_tokens)
 
+    def test_source_list(self):
+        query = "SELECT title FROM (a.x, a.y).issues LIMIT 5;"
+        self.tokenizer.tokenize(query)
+        self.assertEqual(
+            self.tokenizer.tokens[3], Token(TokenType.SOURCE, 18, "(a.x,a.y).issues")
+        )
+        self.assertEqual(self.tokenizer.tokens[4], Token(TokenType.LIMIT, 36))
+
+    def test_unterminated_source_list(self):
+        with self.assertRaises(TokenizationException):
+            self.tokenizer.tokenize("SELECT title FROM (a.x, a.y.issues")
+
+    def test_join(self):
+        query = "SELECT p.title FROM a.b.pull_requests AS p JOIN a.b.issues i ON p.number = i.number"
+        self.tokenizer.tokenize(query)
+        types = [token.type for token in self.tokenizer.tokens]
+        self.assertEqual(
+            types[2:9],
+            [
+                TokenType.FROM,
+                TokenType.SOURCE,
+                TokenType.AS,
+                TokenType.COLUMN_PH,
+                TokenType.JOIN,
+                TokenType.SOURCE,
+                TokenType.COLUMN_PH,
+            ],
+        )
+        self.assertEqual(self.tokenizer.tokens[7].value, "a.b.issues")
+        self.assertEqual(self.tokenizer.tokens[9].type, TokenType.ON)
+
+    def test_explain(self):
+        self.tokenizer.tokenize("EXPLAIN ANALYZE SELECT title FROM a.b.issues")
+        types = [token.type for token in self.tokenizer.tokens[:4]]
+        self.assertEqual(
+            types,
+            [
+                TokenType.EXPLAIN,
+                TokenType.ANALYZE,
+                TokenType.SELECT,
+                TokenType.COLUMN_PH,
+            ],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
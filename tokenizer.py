@@ -4,12 +4,20 @@ from exceptions import TokenizationException
 
 # Enum representing the types of tokens the tokenizer can recognize
 class TokenType(Enum):
+    EXPLAIN = "EXPLAIN"
+    ANALYZE = "ANALYZE"
     SELECT = "SELECT"
     FROM = "FROM"
     WHERE = "WHERE"
     ORDER = "ORDER"
     BY = "BY"
     ORDER_BY = "ORDER BY"
+    GROUP = "GROUP"
+    GROUP_BY = "GROUP BY"
+    JOIN = "JOIN"
+    ON = "ON"
+    AS = "AS"
+    LIKE = "LIKE"
     LIMIT = "LIMIT"
     ASC = "ASC"
     DESC = "DESC"
@@ -29,6 +37,7 @@ class TokenType(Enum):
     NUMBER = "NUMBER"  # Numeric literal
     COLUMN_PH = "COLUMN PH"  # Column placeholder (e.g., identifiers like column names)
     SOURCE = "SOURCE"  # Source name (e.g., table or database)
+    PARAMETER = "PARAMETER"  # Prepared statement parameter (? or :name)
     SEMI_COLON = "SEMI_COLON"  # Semicolon (end of query)
     UNSPEC = ""  # Unspecified type for initial token processing
 
@@ -83,16 +92,33 @@ class Tokenizer:
         if len(token) == 0:
             return  # Ignore empty tokens
         if type == TokenType.UNSPEC:
+            # Trailing commas only separate list items (e.g. "DESC, id")
+            if token.endswith(","):
+                token = token[:-1]
             # Case-insensitive matching for keywords and symbols
             match token.casefold():
                 case "select":
                     self.tokens.append(Token(TokenType.SELECT, st_idx))
+                case "explain":
+                    self.tokens.append(Token(TokenType.EXPLAIN, st_idx))
+                case "analyze":
+                    self.tokens.append(Token(TokenType.ANALYZE, st_idx))
                 case "from":
                     self.tokens.append(Token(TokenType.FROM, st_idx))
                 case "where":
                     self.tokens.append(Token(TokenType.WHERE, st_idx))
                 case "order":
                     self.tokens.append(Token(TokenType.ORDER, st_idx))
+                case "group":
+                    self.tokens.append(Token(TokenType.GROUP, st_idx))
+                case "join":
+                    self.tokens.append(Token(TokenType.JOIN, st_idx))
+                case "on":
+                    self.tokens.append(Token(TokenType.ON, st_idx))
+                case "as":
+                    self.tokens.append(Token(TokenType.AS, st_idx))
+                case "like":
+                    self.tokens.append(Token(TokenType.LIKE, st_idx))
                 case "by":
                     self.tokens.append(Token(TokenType.BY, st_idx))
                 case "limit":
@@ -123,16 +149,16 @@ class Tokenizer:
                     self.tokens.append(Token(TokenType.ASTERISK, st_idx))
                 case ";":
                     self.tokens.append(Token(TokenType.SEMI_COLON, st_idx))
+                case "?":
+                    # positional, numbered when the query is planned
+                    self.tokens.append(Token(TokenType.PARAMETER, st_idx))
+                case _ if token.startswith(":") and len(token) > 1:
+                    self.tokens.append(
+                        Token(TokenType.PARAMETER, st_idx, value=token[1:])
+                    )
                 case _:
-                    # Handle column placeholders and trailing commas
-                    if token.endswith(","):
-                        self.tokens.append(
-                            Token(TokenType.COLUMN_PH, st_idx, value=token[:-1])
-                        )
-                    else:
-                        self.tokens.append(
-                            Token(TokenType.COLUMN_PH, st_idx, value=token)
-                        )
+                    # Handle column placeholders
+                    self.tokens.append(Token(TokenType.COLUMN_PH, st_idx, value=token))
         elif type == TokenType.STRING or type == TokenType.NUMBER:
             # Add a token with a specified type and value
             self.tokens.append(Token(type=type, index=st_idx, value=token))
@@ -156,6 +182,16 @@ class Tokenizer:
                     raise TokenizationException(
                         f"Token 'ORDER' must be followed by 'BY' at {self.tokens[i].index}"
                     )
+            elif self.tokens[i].type == TokenType.GROUP:
+                if i + 1 < sz and self.tokens[i + 1].type == TokenType.BY:
+                    # Combine 'GROUP BY' into a single token
+                    tokens.append(Token(TokenType.GROUP_BY, self.tokens[i].index))
+                    i += 2
+                    continue
+                else:
+                    raise TokenizationException(
+                        f"Token 'GROUP' must be followed by 'BY' at {self.tokens[i].index}"
+                    )
             elif self.tokens[i].type == TokenType.GREATER:
                 if i + 1 < sz and self.tokens[i + 1].type == TokenType.EQUAL:
                     # Combine '>=' into a single token
@@ -175,9 +211,9 @@ class Tokenizer:
             elif (
                 i - 1 >= 0
                 and self.tokens[i].type == TokenType.COLUMN_PH
-                and self.tokens[i - 1].type == TokenType.FROM
+                and self.tokens[i - 1].type in (TokenType.FROM, TokenType.JOIN)
             ):
-                # Treat column placeholders after 'FROM' as sources
+                # Treat column placeholders after 'FROM' and 'JOIN' as sources
                 self.tokens[i].type = TokenType.SOURCE
                 tokens.append(self.tokens[i])
             else:
@@ -230,6 +266,16 @@ class Tokenizer:
                     raise TokenizationException(f"Unterminated string at {st_idx}")
                 self._make_atomic_token(token, st_idx, TokenType.STRING)
                 token = ""
+            elif query[i] == "(":
+                # Source lists like "(a.x, a.y).issues" and aggregates like
+                # "COUNT( * )" stay one token
+                while i < len(query) and query[i] != ")":
+                    if query[i] not in " \n":
+                        token += query[i]
+                    i += 1
+                if i == len(query):
+                    raise TokenizationException(f"Unterminated list at {st_index}")
+                token += query[i]
             else:
                 token += query[i]
             i += 1
@@ -0,0 +1,226 @@
+import logging
+import re
+import threading
+import time
+from github.Requester import (
+    Requester,
+    HTTPRequestsConnectionClass,
+    HTTPSRequestsConnectionClass,
+)
+from cache import CacheEntry, ResponseCache
+from ratelimit import PoolToken, Scheduler, resource_for
+from telemetry import cache_hits, request_seconds, retries
+
+
+logger = logging.getLogger(__name__)
+
+
+# Listing, search and GraphQL requests read pages of a source's rows; every
+# other request fetches one object, e.g. a row's detail columns
+PAGE_PATH_RE: re.Pattern = re.compile(
+    r"^/(search/|graphql$|(users|orgs)/[^/]+/repos$"
+    r"|repos/[^/]+/[^/]+/(issues|pulls|commits)$)"
+)
+
+# Path segments replaced by a placeholder in endpoint(), so latency is kept per
+# kind of request rather than per repository or object
+ENDPOINT_PATTERNS: list[tuple[re.Pattern, str]] = [
+    (re.compile(r"^/repos/[^/]+/[^/]+"), "/repos/{owner}/{repo}"),
+    (re.compile(r"^/(users|orgs)/[^/]+"), r"/\1/{name}"),
+    (re.compile(r"/[0-9a-f]{40}(?=/|$)"), "/{sha}"),
+    (re.compile(r"/\d+(?=/|$)"), "/{number}"),
+]
+
+TRAFFIC_FIELDS: tuple[str, ...] = (
+    "requests",
+    "bytes",
+    "cache_hits",
+    "revalidations",
+    "charged",
+)
+
+
+def request_kind(url: str) -> str:
+    path: str = url.split("?", 1)[0].rstrip("/")
+    return "pages" if PAGE_PATH_RE.match(path) else "details"
+
+
+# Path template of a request, e.g. /repos/{owner}/{repo}/issues/{number}
+def endpoint(url: str) -> str:
+    path: str = url.split("?", 1)[0].rstrip("/")
+    for pattern, template in ENDPOINT_PATTERNS:
+        path = pattern.sub(template, path)
+    return path
+
+
+# Size of a response body as received
+def body_size(response) -> int:
+    # RequestsResponse wraps a requests.Response holding the raw bytes
+    raw = getattr(response, "response", None)
+    if raw is not None and isinstance(getattr(raw, "content", None), bytes):
+        return len(raw.content)
+    return len(response.read())
+
+
+# Requests by kind (see request_kind): sent, bytes received, served from the
+# cache, revalidated with a 304, and charged to the rate limit, which GitHub
+# does for every response but a 304
+class Traffic:
+    def __init__(self):
+        self.lock: threading.Lock = threading.Lock()
+        self.counts: dict[str, dict[str, int]] = {
+            kind: dict.fromkeys(TRAFFIC_FIELDS, 0) for kind in ("pages", "details")
+        }
+
+    def add(self, url: str, **counts: int):
+        kind: str = request_kind(url)
+        with self.lock:
+            for name, count in counts.items():
+                self.counts[kind][name] += count
+
+    def counters(self) -> dict[str, dict[str, int]]:
+        with self.lock:
+            return {kind: dict(counts) for kind, counts in self.counts.items()}
+
+
+# Stands in for PyGithub's RequestsResponse when the body comes from the cache
+class CachedResponse:
+    def __init__(self, entry: CacheEntry):
+        self.status: int = entry.status
+        self.headers: dict[str, str] = entry.headers
+        self.entry: CacheEntry = entry
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.entry.body
+
+
+# Connection behaviour shared by every Github client. GET responses are looked
+# up in the response cache and revalidated with If-None-Match / If-Modified-Since.
+# Requests that go out are paced and authorized by the rate limit scheduler.
+class CachingConnection:
+    cache: ResponseCache | None = None
+    scheduler: Scheduler | None = None
+    traffic: Traffic | None = None
+    sessions: dict = {}
+    sessions_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, host: str, port: int | None = None, *args, **kwargs):
+        super().__init__(host, port, *args, **kwargs)
+        # Requester builds a new connection per request once connection classes
+        # are injected, so share one session (and its keep-alive pool) per host
+        with self.sessions_lock:
+            shared = self.sessions.setdefault((self.host, self.port), self.session)
+        if shared is not self.session:
+            self.session.close()
+            self.session = shared
+
+    def getresponse(self):
+        cache: ResponseCache | None = self.cache
+        if cache is None or self.verb != "GET" or self.stream:
+            return self.send()
+
+        key: str = cache.key(self.url, self.headers.get("Authorization"))
+        entry: CacheEntry | None = cache.get(key)
+        if entry is not None and entry.is_fresh():
+            cache.count("hits")
+            cache_hits.inc(result="fresh")
+            if self.traffic is not None:
+                self.traffic.add(self.url, cache_hits=1)
+            logger.debug("Cache hit: %s", self.url)
+            return CachedResponse(entry)
+
+        if entry is not None:
+            self.headers = dict(self.headers)
+            if entry.etag:
+                self.headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                self.headers["If-Modified-Since"] = entry.last_modified
+
+        response = self.send()
+        if response.status == 304 and entry is not None:
+            cache.count("revalidations")
+            cache.refresh(key)
+            cache_hits.inc(result="revalidated")
+            logger.debug("Cache revalidated: %s", self.url)
+            return CachedResponse(entry)
+
+        cache.count("misses")
+        if response.status == 200:
+            headers: dict[str, str] = {
+                k.lower(): v for k, v in response.getheaders()
+            }
+            cache.put(key, self.url, response.status, headers, response.read())
+        return response
+
+    # Send the request with a token from the scheduler's pool, retrying on
+    # rate limits and server errors. The underlying connection re-issues the
+    # stored request on every call, so a retry is just another call.
+    def send(self):
+        scheduler: Scheduler | None = self.scheduler
+        if scheduler is None:
+            return self.request_once()
+        resource: str = resource_for(self.url)
+        attempt: int = 0
+        while True:
+            token: PoolToken | None = scheduler.acquire(resource)
+            if token is not None:
+                self.headers = dict(self.headers)
+                self.headers["Authorization"] = f"token {token.secret}"
+            response = self.request_once()
+            headers: dict[str, str] = {k.lower(): v for k, v in response.getheaders()}
+            body: str = response.read() if response.status == 403 else ""
+            delay: float | None = scheduler.update(
+                token, resource, response.status, headers, body, attempt
+            )
+            if delay is None:
+                return response
+            attempt += 1
+            retries.inc()
+            logger.debug("Retrying %s (attempt %s) in %.1fs", self.url, attempt, delay)
+            scheduler.sleep(delay)
+
+    # Send the request as is, counting it into the traffic stats and its
+    # latency into the histogram of its endpoint
+    def request_once(self):
+        start: float = time.perf_counter()
+        response = super().getresponse()
+        request_seconds.observe(
+            time.perf_counter() - start,
+            endpoint=endpoint(self.url),
+            status=str(response.status),
+        )
+        if self.traffic is not None:
+            revalidated: bool = response.status == 304
+            self.traffic.add(
+                self.url,
+                requests=1,
+                bytes=body_size(response),
+                revalidations=int(revalidated),
+                charged=int(not revalidated),
+            )
+        return response
+
+    def close(self):
+        pass  # the shared session outlives individual connections
+
+
+class CachingHTTPConnection(CachingConnection, HTTPRequestsConnectionClass):
+    pass
+
+
+class CachingHTTPSConnection(CachingConnection, HTTPSRequestsConnectionClass):
+    pass
+
+
+def install(
+    cache: ResponseCache | None,
+    scheduler: Scheduler | None = None,
+    traffic: Traffic | None = None,
+):
+    CachingConnection.cache = cache
+    CachingConnection.scheduler = scheduler
+    CachingConnection.traffic = traffic
+    Requester.injectConnectionClasses(CachingHTTPConnection, CachingHTTPSConnection)